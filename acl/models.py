@@ -101,6 +101,29 @@ class ActionControl(ActionControlFieldsMixin, models.Model):
     # OwnershipEditions create
     @staticmethod
     def set_acl_registree_edition(edition, user):
+        ActionControl.registree_edition_acl(edition, user).save()
+
+    @staticmethod
+    def set_acl_registree_editions(editions, user):
+        """
+        Bulk version of set_acl_registree_edition: writes the acls of all
+        editions with a single insert.
+        Editions created with bulk_create have no primary key yet, their ids
+        are resolved with one query on the indexed bitcoin address.
+        """
+        from piece.models import Edition
+        unsaved = [edition for edition in editions if edition.pk is None]
+        if unsaved:
+            ids = dict(Edition.objects.filter(bitcoin_address__in=[edition.bitcoin_address for edition in unsaved])
+                       .values_list('bitcoin_address', 'id'))
+            for edition in unsaved:
+                edition.pk = ids[edition.bitcoin_address]
+                edition._state.adding = False
+        ActionControl.objects.bulk_create([ActionControl.registree_edition_acl(edition, user)
+                                           for edition in editions])
+
+    @staticmethod
+    def registree_edition_acl(edition, user):
         acl = ActionControl(user=user, piece=edition.parent, edition=edition)
 
         acl.acl_view = True
@@ -118,7 +141,7 @@ class ActionControl(ActionControlFieldsMixin, models.Model):
         acl.acl_request_unconsign = False
         acl.acl_loan = True
         acl.acl_coa = True
-        acl.save()
+        return acl
 
     # OwnershipTransfer create
     @staticmethod
@@ -9,7 +9,7 @@ from ownership.signals import safe_delete, transfer_user_needs_to_register, cons
     share_delete
 from ownership.signals import consignment_withdraw, unconsignment_create
 from ownership.api import TransferEndpoint, ConsignEndpoint, UnConsignEndpoint
-from piece.models import PieceFactory, Edition
+from piece.models import PieceFactory
 from piece.signals import editions_bulk_create
 from acl.models import ActionControl
 
@@ -28,9 +28,7 @@ def on_ownership_piece_create(sender, instance, created, *args, **kwargs):
 @receiver(editions_bulk_create, sender=PieceFactory)
 def on_editions_create(sender, user_registered, editions, *args, **kwargs):
     logger.info('SIGNAL on_editions_create')
-    for edition in editions:
-        db_edition = Edition.objects.get(bitcoin_path=edition.bitcoin_path)
-        ActionControl.set_acl_registree_edition(user=user_registered, edition=db_edition)
+    ActionControl.set_acl_registree_editions(user=user_registered, editions=editions)
 
 
 # set the acl for the parent piece once the editions are created
@@ -38,10 +36,11 @@ def on_editions_create(sender, user_registered, editions, *args, **kwargs):
 def on_ownership_editions_create(sender, instance, created, *args, **kwargs):
     if created:
         logger.info('SIGNAL on_ownersip_editions_create')
-        for acl in ActionControl.objects.filter(piece=instance.piece, edition=None):
-            # NOTE: This could be redundant to ActionControl.set_acl_registree_edition
-            acl.acl_create_editions = False
-            acl.save()
+        # NOTE: This could be redundant to ActionControl.set_acl_registree_edition
+        ActionControl.objects \
+            .filter(piece=instance.piece,
+                    edition=None) \
+            .update(acl_create_editions=False)
 
 
 # set acl for transferee and prev owner on ownership transfer create
@@ -52,9 +51,9 @@ def on_ownership_transfer_create(sender, instance, created, *args, **kwargs):
         ActionControl.set_acl_transferee(edition=instance.edition, user=instance.new_owner)
         ActionControl.set_acl_prev_owner(edition=instance.edition, user=instance.prev_owner)
         # set edit to false
-        for acl in ActionControl.objects.filter(piece=instance.edition.parent):
-            acl.acl_edit = False
-            acl.save()
+        ActionControl.objects \
+            .filter(piece=instance.edition.parent) \
+            .update(acl_edit=False)
 
 
 # set acl for prev_owner on ownership transfer withdraw
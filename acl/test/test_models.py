@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import pytest
+
+
+pytestmark = pytest.mark.django_db
+
+
+def test_set_acl_registree_editions(alice_bitcoin_wallet, piece_alice, django_assert_num_queries):
+    from piece.models import Edition
+    from ..models import ActionControl
+    alice = alice_bitcoin_wallet.user
+    editions = [Edition(parent=piece_alice, edition_number=i + 1, owner=alice,
+                        bitcoin_path=address, bitcoin_address=address.split(':')[1])
+                for i, address in enumerate(alice_bitcoin_wallet.create_new_addresses(3))]
+    Edition.objects.bulk_create(editions)
+    # one query to resolve the edition ids and one bulk insert
+    with django_assert_num_queries(2):
+        ActionControl.set_acl_registree_editions(editions, alice)
+    acls = ActionControl.objects.filter(user=alice, piece=piece_alice, edition__isnull=False)
+    assert sorted(acl.edition.edition_number for acl in acls) == [1, 2, 3]
+    for acl in acls:
+        assert acl.acl_view is True
+        assert acl.acl_edit is True
+        assert acl.acl_transfer is True
+        assert acl.acl_create_editions is False
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Query-count and latency benchmarks of the REST API.
+
+The benchmarks are not part of the default test run (they are not in the testpaths of
+pytest.ini), run them explicitly:
+
+    py.test benchmarks/                                   # measure and print
+    py.test benchmarks/ --benchmark-save                  # (re)write the baseline
+    py.test benchmarks/ --benchmark-compare               # fail on regressions
+
+Each benchmark records the number of SQL queries, the best wall time over
+--benchmark-rounds runs and the number of objects left allocated by a run (gc tracked
+objects with the collector disabled, Python 2 has no tracemalloc).
+
+The query counts do not depend on the machine: they are kept in benchmarks/baseline.json, which
+is committed, so that they can be compared on any machine. The counts are those of the default
+options (e.g. --benchmark-pieces). The time and objects depend on the machine and stay in
+benchmarks/baseline.local.json, which is not committed. CI does not run the benchmarks.
+
+Comparing flags a benchmark whose query count grew, or whose time or objects grew by more than
+--benchmark-tolerance against the local baseline of the machine, when there is one. A
+benchmark without a recorded query count is reported, not failed.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import gc
+import json
+import os
+import time
+from collections import OrderedDict
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DEFAULT_LOCAL_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.local.json')
+
+QUERIES = ('queries',)
+TIMINGS = ('time', 'objects')
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('benchmark')
+    group.addoption('--benchmark-save', action='store_true', default=False,
+                    help='write the measures to the baseline file')
+    group.addoption('--benchmark-compare', action='store_true', default=False,
+                    help='fail the benchmarks that regressed against the baseline file')
+    group.addoption('--benchmark-baseline', default=DEFAULT_BASELINE,
+                    help='path of the baseline file of the query counts, default: %(default)s')
+    group.addoption('--benchmark-local-baseline', default=DEFAULT_LOCAL_BASELINE,
+                    help='path of the baseline file of the time and objects of this machine, '
+                         'default: %(default)s')
+    group.addoption('--benchmark-tolerance', type=float, default=0.25,
+                    help='relative increase of time and objects tolerated when comparing, '
+                         'default: %(default)s')
+    group.addoption('--benchmark-rounds', type=int, default=5,
+                    help='number of runs of each benchmark, default: %(default)s')
+    group.addoption('--benchmark-pieces', type=int, default=1000,
+                    help='number of pieces seeded, default: %(default)s')
+    group.addoption('--benchmark-editions', type=int, default=3,
+                    help='number of editions seeded per piece, default: %(default)s')
+    group.addoption('--benchmark-roles', type=int, default=10000,
+                    help='number of users_role rows seeded for the prize benchmarks, default: %(default)s')
+    group.addoption('--benchmark-submissions', type=int, default=10000,
+                    help='number of prize submissions seeded for the prize list benchmarks, default: %(default)s')
+    group.addoption('--benchmark-recipients', type=int, default=1000,
+                    help='number of recipients of the email benchmarks, default: %(default)s')
+
+
+def pytest_configure(config):
+    config._benchmark_results = OrderedDict()
+    config._benchmark_unrecorded = []
+
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    results = config._benchmark_results
+    if not results:
+        return
+    if config.getoption('--benchmark-save'):
+        save_baseline(config.getoption('--benchmark-baseline'), results, QUERIES)
+        save_baseline(config.getoption('--benchmark-local-baseline'), results, TIMINGS)
+
+
+def pytest_terminal_summary(terminalreporter):
+    results = terminalreporter.config._benchmark_results
+    if not results:
+        return
+    terminalreporter.write_sep('-', 'benchmarks')
+    terminalreporter.write_line('{:<40} {:>8} {:>10} {:>10}'.format('name', 'queries', 'time (ms)', 'objects'))
+    for name, measures in results.iteritems():
+        terminalreporter.write_line('{:<40} {:>8} {:>10.1f} {:>10}'.format(
+            name, measures['queries'], measures['time'] * 1000, measures['objects']))
+    unrecorded = terminalreporter.config._benchmark_unrecorded
+    if unrecorded:
+        terminalreporter.write_line('no recorded query count, run with --benchmark-save: {}'.format(
+            ', '.join(unrecorded)))
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, keys):
+    # keep the measures of the benchmarks that did not run
+    baseline = load_baseline(path)
+    for name, measures in results.iteritems():
+        baseline[name] = OrderedDict((key, measures[key]) for key in keys)
+    with open(path, 'w') as f:
+        json.dump(OrderedDict(sorted(baseline.items())), f, indent=2, separators=(',', ': '))
+        f.write('\n')
+
+
+def measure(func):
+    """
+    Runs func once and returns its result with the (queries, seconds, objects) it took.
+    """
+    gc.collect()
+    gc.disable()
+    try:
+        objects = len(gc.get_objects())
+        with CaptureQueriesContext(connection) as queries:
+            start = time.time()
+            result = func()
+            seconds = time.time() - start
+        objects = len(gc.get_objects()) - objects
+    finally:
+        gc.enable()
+    return result, (len(queries), seconds, objects)
+
+
+def regressions(measures, baseline, tolerance):
+    found = []
+    if 'queries' in baseline and measures['queries'] > baseline['queries']:
+        found.append('queries {} > {}'.format(measures['queries'], baseline['queries']))
+    for key in TIMINGS:
+        if key in baseline and measures[key] > baseline[key] * (1 + tolerance):
+            found.append('{} {} > {} (+{:.0%})'.format(key, measures[key], baseline[key], tolerance))
+    return found
+
+
+@pytest.fixture
+def seeded(db, pytestconfig):
+    from .seed import seed
+    return seed(pytestconfig.getoption('--benchmark-pieces'),
+                pytestconfig.getoption('--benchmark-editions'))
+
+
+@pytest.fixture
+def benchmark(pytestconfig):
+    """
+    Returns a function running `func` --benchmark-rounds times under the given name,
+    recording its measures and failing on a regression when comparing.
+    The first run warms up the caches, its timing is ignored.
+    """
+    config = pytestconfig
+    results = config._benchmark_results
+
+    def run(name, func):
+        func()
+        timings, objects = [], []
+        for _ in range(max(config.getoption('--benchmark-rounds'), 1)):
+            result, (queries, seconds, allocated) = measure(func)
+            timings.append(seconds)
+            objects.append(allocated)
+        measures = OrderedDict([
+            ('queries', queries),
+            ('time', min(timings)),
+            ('objects', min(objects)),
+        ])
+        results[name] = measures
+
+        if config.getoption('--benchmark-compare'):
+            baseline = load_baseline(config.getoption('--benchmark-baseline')).get(name, {})
+            if 'queries' not in baseline:
+                config._benchmark_unrecorded.append(name)
+            # the timings of another machine are not comparable
+            baseline.update(load_baseline(config.getoption('--benchmark-local-baseline')).get(name, {}))
+            found = regressions(measures, baseline, config.getoption('--benchmark-tolerance'))
+            if found:
+                pytest.fail('{} regressed: {}'.format(name, ', '.join(found)))
+        return result
+
+    return run
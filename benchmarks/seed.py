@@ -0,0 +1,142 @@
+"""
+Seeds the database with the volumes the benchmarks run against.
+
+Everything is written with bulk inserts on top of the dynamic fixtures, so that seeding
+thousands of rows stays fast; the bulk inserts skip Model.save, the indexed bitcoin addresses
+are therefore filled in here.
+"""
+from django.conf import settings
+from django.utils.datetime_safe import datetime
+
+from dynamicfixtures import _alice, _bob, _digital_work_alice, _license, _prize_juror
+
+
+def _bitcoin_path(address):
+    return 'benchmark:{}'.format(address)
+
+
+def seed_pieces(user, num_pieces, num_editions):
+    """
+    Registers `num_pieces` pieces of `num_editions` editions each for the user,
+    with the acls and the ownerships of a registration.
+    """
+    from acl.models import ActionControl
+    from blobs.models import Thumbnail
+    from ownership.models import OwnershipEditions, OwnershipPiece
+    from piece.models import Edition, Piece
+
+    digital_work = _digital_work_alice()
+    thumbnail = Thumbnail.objects.create(user=user, thumbnail_file=settings.THUMBNAIL_DEFAULT)
+    license = _license()
+    today = datetime.today().date()
+
+    Piece.objects.bulk_create([Piece(title='piece {}'.format(i),
+                                     artist_name=user.username,
+                                     date_created=today,
+                                     num_editions=num_editions,
+                                     user_registered=user,
+                                     digital_work=digital_work,
+                                     thumbnail=thumbnail,
+                                     license_type=license,
+                                     bitcoin_path=_bitcoin_path('piece{}'.format(i)),
+                                     bitcoin_address='piece{}'.format(i))
+                               for i in range(num_pieces)])
+    pieces = list(Piece.objects.filter(user_registered=user).order_by('id'))
+
+    Edition.objects.bulk_create([Edition(parent=piece,
+                                         edition_number=n,
+                                         owner=user,
+                                         bitcoin_path=_bitcoin_path('edition{}-{}'.format(piece.id, n)),
+                                         bitcoin_address='edition{}-{}'.format(piece.id, n))
+                                 for piece in pieces for n in range(1, num_editions + 1)])
+    editions = list(Edition.objects.filter(parent__in=pieces).select_related('parent').order_by('id'))
+
+    acls = []
+    for piece in pieces:
+        acls.append(ActionControl(user=user, piece=piece, edition=None, acl_view=True, acl_edit=True,
+                                  acl_download=True, acl_delete=True, acl_create_editions=True,
+                                  acl_share=True, acl_loan=True))
+    acls += [ActionControl.registree_edition_acl(edition, user) for edition in editions]
+    ActionControl.objects.bulk_create(acls)
+
+    ownerships = []
+    for piece in pieces:
+        ownerships.append(OwnershipPiece(piece=piece, prev_owner=user, new_owner=user,
+                                         type=OwnershipPiece.__name__))
+        ownerships.append(OwnershipEditions(piece=piece, prev_owner=user, new_owner=user,
+                                            type=OwnershipEditions.__name__))
+    OwnershipPiece.objects.bulk_create(ownerships)
+    return pieces, editions
+
+
+def seed_ownerships(editions, owner, new_owner):
+    """
+    Transfers the first and consigns the second edition of every piece, the ownerships
+    are left unconfirmed so that the latest ownerships of the editions stay empty.
+    """
+    from ownership.models import Consignment, OwnershipTransfer
+    ownerships = []
+    for edition in editions:
+        if edition.edition_number == 1:
+            model = OwnershipTransfer
+        elif edition.edition_number == 2:
+            model = Consignment
+        else:
+            continue
+        ownerships.append(model(piece=edition.parent,
+                                edition=edition,
+                                prev_owner=owner,
+                                new_owner=new_owner,
+                                prev_btc_address=edition.bitcoin_path,
+                                type=model.__name__))
+    OwnershipTransfer.objects.bulk_create(ownerships)
+
+
+def seed_prize(pieces, user):
+    """
+    Submits the pieces to a prize and has a juror rate all of them.
+    """
+    from prize.models import PrizePiece, Rating
+    prize_juror = _prize_juror()
+    PrizePiece.objects.bulk_create([PrizePiece(user=user, piece=piece, prize=prize_juror.prize)
+                                    for piece in pieces])
+    Rating.objects.bulk_create([Rating(user=prize_juror.user, piece=piece, note=str(i % 10 + 1),
+                                       type=Rating.__name__, round=1)
+                                for i, piece in enumerate(pieces)])
+    return prize_juror
+
+
+def seed_notes(pieces, user):
+    """
+    Has the user take a private note on every piece.
+    """
+    from note.models import PrivateNote
+    PrivateNote.objects.bulk_create([PrivateNote(user=user, piece=piece, note='note {}'.format(i),
+                                                 type=PrivateNote.__name__)
+                                     for i, piece in enumerate(pieces)])
+
+
+def seed_roles(user, num_roles):
+    """
+    Fills users_role with email validation tokens, the bulk of the table on production.
+    """
+    from users.models import UserValidateEmailRole
+    UserValidateEmailRole.objects.bulk_create([UserValidateEmailRole(user=user,
+                                                                     role_json=UserValidateEmailRole.generateToken(),
+                                                                     type=UserValidateEmailRole.__name__)
+                                               for _ in range(num_roles)])
+
+
+def seed(num_pieces, num_editions):
+    alice = _alice()
+    bob = _bob()
+    pieces, editions = seed_pieces(alice, num_pieces, num_editions)
+    seed_ownerships(editions, alice, bob)
+    prize_juror = seed_prize(pieces, alice)
+    return {
+        'alice': alice,
+        'bob': bob,
+        'pieces': pieces,
+        'editions': editions,
+        'prize_juror': prize_juror,
+    }
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from django.core.urlresolvers import reverse
+
+from rest_framework import status
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+import pytest
+
+
+pytestmark = pytest.mark.django_db
+
+
+def _request(view, url, user, **kwargs):
+    def run():
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, user)
+        response = view(request, **kwargs)
+        assert response.status_code == status.HTTP_200_OK
+        # the list views return lazy responses, render them as the middleware would
+        response.render()
+        return response
+    return run
+
+
+def test_piece_list(seeded, benchmark):
+    from piece.api import PieceEndpoint
+    view = PieceEndpoint.as_view({'get': 'list'})
+    response = benchmark('piece-list', _request(view, reverse('api:piece-list'), seeded['alice']))
+    assert response.data['count'] == len(seeded['pieces'])
+
+
+def test_piece_list_page(seeded, benchmark):
+    from piece.api import PieceEndpoint
+    view = PieceEndpoint.as_view({'get': 'list'})
+    url = '{}?page=2&page_size=50'.format(reverse('api:piece-list'))
+    response = benchmark('piece-list-page', _request(view, url, seeded['alice']))
+    assert len(response.data['pieces']) == 50
+
+
+def test_piece_retrieve(seeded, benchmark):
+    from piece.api import PieceEndpoint
+    view = PieceEndpoint.as_view({'get': 'retrieve'})
+    piece = seeded['pieces'][-1]
+    url = reverse('api:piece-detail', kwargs={'pk': piece.id})
+    benchmark('piece-retrieve', _request(view, url, seeded['alice'], pk=piece.id))
+
+
+def test_edition_list(seeded, benchmark):
+    from piece.api import EditionEndpoint
+    view = EditionEndpoint.as_view({'get': 'list'})
+    response = benchmark('edition-list', _request(view, reverse('api:edition-list'), seeded['alice']))
+    assert response.data['count'] == len(seeded['editions'])
+
+
+def test_edition_retrieve(seeded, benchmark):
+    from piece.api import EditionEndpoint
+    view = EditionEndpoint.as_view({'get': 'retrieve'})
+    edition = seeded['editions'][-1]
+    url = reverse('api:edition-detail', kwargs={'pk': edition.bitcoin_address})
+    benchmark('edition-retrieve', _request(view, url, seeded['alice'], pk=edition.bitcoin_address))
+
+
+def test_transfer_list(seeded, benchmark):
+    from ownership.api import TransferEndpoint
+    view = TransferEndpoint.as_view({'get': 'list'})
+    url = reverse('api:ownership:ownershiptransfer-list')
+    response = benchmark('transfer-list', _request(view, url, seeded['alice']))
+    assert response.data['count'] == len(seeded['pieces'])
+
+
+def test_consign_list(seeded, benchmark):
+    from ownership.api import ConsignEndpoint
+    view = ConsignEndpoint.as_view({'get': 'list'})
+    url = reverse('api:ownership:consignment-list')
+    response = benchmark('consign-list', _request(view, url, seeded['alice']))
+    assert response.data['count'] == len(seeded['pieces'])
+
+
+def test_rating_list(seeded, benchmark):
+    from prize.api import RatingEndpoint
+    prize_juror = seeded['prize_juror']
+    subdomain = prize_juror.prize.whitelabel_settings.subdomain
+    view = RatingEndpoint.as_view({'get': 'list'})
+    url = reverse('api:prize:rating-list', kwargs={'domain_pk': subdomain})
+    response = benchmark('rating-list', _request(view, url, prize_juror.user, domain_pk=subdomain))
+    assert len(response.data['ratings']) == len(seeded['pieces'])
+
+
+def test_prize_piece_list(seeded, benchmark):
+    from prize.api import PrizePieceEndpoint
+    prize_juror = seeded['prize_juror']
+    subdomain = prize_juror.prize.whitelabel_settings.subdomain
+    view = PrizePieceEndpoint.as_view({'get': 'list'})
+    url = reverse('api:prize:prize-pieces-list', kwargs={'domain_pk': subdomain})
+    benchmark('prize-piece-list', _request(view, url, prize_juror.user, domain_pk=subdomain))
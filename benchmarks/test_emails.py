@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from django.core import mail
+
+import pytest
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipients(db, pytestconfig):
+    """
+    --benchmark-recipients signed up users.
+    """
+    from django.contrib.auth.models import User
+    num_recipients = pytestconfig.getoption('--benchmark-recipients')
+    User.objects.bulk_create([User(username='recipient{}'.format(i), email='recipient{}@test.com'.format(i))
+                              for i in range(num_recipients)])
+    return list(User.objects.filter(username__startswith='recipient'))
+
+
+def _share(recipients):
+    from dynamicfixtures import _alice
+    from .seed import seed_pieces
+    alice = _alice()
+    _, editions = seed_pieces(alice, 1, 1)
+    return [dict(msg_cls='ShareEditionsEmailMessage',
+                 to=recipient.email,
+                 sender=alice,
+                 editions=editions,
+                 message='',
+                 subdomain='www') for recipient in recipients]
+
+
+def _sent(func, count):
+    def run():
+        mail.outbox = []
+        func()
+        assert len(mail.outbox) == count
+    return run
+
+
+def test_share_one_task_per_recipient(recipients, benchmark):
+    from emails.tasks import send_ascribe_email
+    emails = _share(recipients)
+
+    def send():
+        for kwargs in emails:
+            send_ascribe_email(**dict(kwargs))
+    benchmark('emails-share-one-task-per-recipient', _sent(send, len(recipients)))
+
+
+def test_share_bulk(recipients, benchmark):
+    from emails.tasks import send_ascribe_emails
+    emails = _share(recipients)
+    benchmark('emails-share-bulk', _sent(lambda: send_ascribe_emails(emails), len(recipients)))
+
+
+def test_invite_judges(recipients, benchmark):
+    from dynamicfixtures import _whitelabel_settings
+    from emails.tasks import email_invite_judge
+    _whitelabel_settings(subdomain='sluice')
+
+    def send():
+        for recipient in recipients:
+            email_invite_judge(recipient, 'sluice')
+    benchmark('emails-invite-judges', _sent(send, len(recipients)))
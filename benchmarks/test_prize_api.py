@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+import pytest
+
+from .test_api import _request
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def submissions(db, pytestconfig):
+    """
+    A prize with --benchmark-submissions submissions, all of them rated and noted by the juror.
+    """
+    from dynamicfixtures import _alice
+    from .seed import seed_notes, seed_pieces, seed_prize
+    alice = _alice()
+    pieces, _ = seed_pieces(alice, pytestconfig.getoption('--benchmark-submissions'), 0)
+    prize_juror = seed_prize(pieces, alice)
+    seed_notes(pieces, prize_juror.user)
+    return {'pieces': pieces, 'prize_juror': prize_juror}
+
+
+def _longest_query(func):
+    with CaptureQueriesContext(connection) as context:
+        func()
+    return max(len(query['sql']) for query in context.captured_queries)
+
+
+def _prize_list(endpoint, url_name, name, submissions, benchmark):
+    prize_juror = submissions['prize_juror']
+    subdomain = prize_juror.prize.whitelabel_settings.subdomain
+    view = endpoint.as_view({'get': 'list'})
+    url = reverse('api:prize:{}-list'.format(url_name), kwargs={'domain_pk': subdomain})
+    run = _request(view, url, prize_juror.user, domain_pk=subdomain)
+    response = benchmark('{}-{}'.format(name, len(submissions['pieces'])), run)
+    # the submissions are joined in the queries, not sent back to the database as a list of ids
+    assert _longest_query(run) < 5000
+    return response
+
+
+def test_prize_piece_list(submissions, benchmark):
+    from prize.api import PrizePieceEndpoint
+    response = _prize_list(PrizePieceEndpoint, 'prize-pieces', 'prize-piece-list', submissions, benchmark)
+    assert response.data['count'] == len(submissions['pieces'])
+
+
+def test_rating_list(submissions, benchmark):
+    from prize.api import RatingEndpoint
+    response = _prize_list(RatingEndpoint, 'rating', 'rating-list', submissions, benchmark)
+    assert len(response.data['ratings']) == len(submissions['pieces'])
+
+
+def test_prize_note_list(submissions, benchmark):
+    from prize.api import PrizeNoteEndpoint
+    response = _prize_list(PrizeNoteEndpoint, 'privatenote', 'prize-note-list', submissions, benchmark)
+    assert len(response.data['notes']) == len(submissions['pieces'])
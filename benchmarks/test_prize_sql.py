@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import pytest
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def roles(seeded, pytestconfig):
+    from .seed import seed_roles
+    seed_roles(seeded['bob'], pytestconfig.getoption('--benchmark-roles'))
+
+
+# the (prize, is_jury) index of PrizeUser, named by django after its columns
+JURY_INDEX = 'prize_prizeuser_prize_id_is_jury_'
+
+
+def _explain(sql_function, *args):
+    """
+    The plan of the last query of sql_function. Sequential scans are disabled, the seeded
+    tables are too small for the planner to prefer an index otherwise.
+    """
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+    with CaptureQueriesContext(connection) as context:
+        sql_function(*args)
+    with transaction.atomic():
+        cursor = connection.cursor()
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute('EXPLAIN {}'.format(context.captured_queries[-1]['sql']))
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+        cursor.close()
+    return plan
+
+
+def test_jury_count(seeded, roles, benchmark):
+    from prize import sql
+    prize_id = seeded['prize_juror'].prize_id
+    assert benchmark('prize-jury-count', lambda: sql.get_jury_count(prize_id)) == 1
+    assert JURY_INDEX in _explain(sql.get_jury_count, prize_id)
+
+
+def test_jury_pieces(seeded, roles, benchmark):
+    from prize import sql
+    prize_id = seeded['prize_juror'].prize_id
+    pieces = benchmark('prize-pieces', lambda: sql.get_pieces(prize_id, 1))
+    assert len(pieces) == len(seeded['pieces'])
+    # every piece is rated once by the juror
+    assert set(num_ratings for (_, _, _, _, _, _, _, _, _, num_ratings, _) in pieces) == {1}
+    assert JURY_INDEX in _explain(sql.get_pieces, prize_id, 1)
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import, unicode_literals
+
+import os
+
+from django.conf import settings
+
+import pytest
+
+
+# the benchmark fixture counts the queries
+pytestmark = pytest.mark.django_db
+
+def _large_image(tmpdir, ext, size=(6000, 4000)):
+    """
+    A photo-sized image with some detail for the encoders, a grid.
+    """
+    from PIL import Image, ImageDraw
+    image = Image.new('RGB', size, (120, 60, 200))
+    draw = ImageDraw.Draw(image)
+    for x in range(0, size[0], 50):
+        draw.line([(x, 0), (x, size[1])], fill=(255, 255, 255))
+    for y in range(0, size[1], 50):
+        draw.line([(0, y), (size[0], y)], fill=(0, 0, 0))
+    path = os.path.join(str(tmpdir), 'large.{}'.format(ext))
+    image.save(path)
+    return path
+
+
+@pytest.mark.parametrize('ext', ['jpeg', 'png'])
+def test_render_thumbnails(tmpdir, benchmark, ext):
+    from blobs.models import Thumbnail
+    path = _large_image(tmpdir, ext)
+    thumbnail_ext, thumbnails = benchmark('thumbnails-{}'.format(ext),
+                                          lambda: Thumbnail.render(path, ext, settings.THUMBNAIL_SIZES))
+    assert thumbnail_ext == 'jpeg'
+    assert sorted(thumbnails) == sorted(settings.THUMBNAIL_SIZES)
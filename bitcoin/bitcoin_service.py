@@ -23,3 +23,9 @@ class BitcoinService(object):
         return (EQ_TXSIZE[0] +
                 EQ_TXSIZE[1] * nb_inputs +
                 EQ_TXSIZE[2] * nb_outputs)
+
+    @staticmethod
+    def calc_mining_fee(nb_inputs, nb_outputs):
+        # minTransactionFee per started kB, the default relay fee of bitcoind
+        size = BitcoinService.calc_tx_size(nb_inputs, nb_outputs)
+        return BitcoinService.minTransactionFee * -(-size // 1000)
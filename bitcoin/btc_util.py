@@ -1,3 +1,5 @@
+import binascii
+
 from django.utils import timezone
 
 __author__ = 'dimi'
@@ -13,3 +15,16 @@ def _uniqueHierarchicalString():
     t = timezone.now()
     return '%s/%s/%s/%s/%s/%s/%s' % (
         t.year, t.month, t.day, t.hour, t.minute, t.second, t.microsecond)
+
+
+def op_return_hex(data):
+    """
+    The hex of the script of an OP_RETURN output carrying data (e.g. a spoolverb), at most 80 bytes
+    """
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    if len(data) > 80:
+        raise ValueError('OP_RETURN data is limited to 80 bytes')
+    # lengths above 75 bytes are pushed with OP_PUSHDATA1
+    push = '{:02x}'.format(len(data)) if len(data) < 76 else '4c{:02x}'.format(len(data))
+    return '6a' + push + binascii.hexlify(data)
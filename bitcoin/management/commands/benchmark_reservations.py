@@ -0,0 +1,71 @@
+"""
+Measure how many federation wallet claims per second N concurrent workers
+can make. Every worker claims the inputs of a spool transaction (1 fee and
+3 tokens) and consumes them, as the bitcoin tasks do after a push.
+Only the unspents seeded by the benchmark are claimed. It refuses to run
+with BTC_ENABLED, where the bitcoin workers would claim the seeded unspents.
+
+usage:
+    python manage.py benchmark_reservations --workers 1 2 4 8 --claims 200
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from bitcoin.models import FederationWallet
+
+BENCHMARK_TXID = 'benchmark_reservations'
+
+
+def _worker(nclaims, durations):
+    try:
+        for _ in xrange(nclaims):
+            start = time.time()
+            reservation, _ = FederationWallet.claim([(settings.BTC_FEE, 1), (settings.BTC_TOKEN, 3)],
+                                                    txid=BENCHMARK_TXID)
+            FederationWallet.consume(reservation)
+            durations.append(time.time() - start)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', nargs='+', type=int, default=[1, 2, 4, 8],
+                            help="number of concurrent workers for each run")
+        parser.add_argument('--claims', type=int, default=200,
+                            help="number of claims made by each worker")
+
+    def seed(self, nclaims):
+        FederationWallet.objects.bulk_create(
+            [FederationWallet(amount=settings.BTC_FEE, confirmations=1, vout=i, txid=BENCHMARK_TXID)
+             for i in xrange(nclaims)] +
+            [FederationWallet(amount=settings.BTC_TOKEN, confirmations=1, vout=i, txid=BENCHMARK_TXID)
+             for i in xrange(3 * nclaims)])
+
+    def handle(self, *args, **options):
+        if settings.BTC_ENABLED:
+            raise CommandError('The bitcoin workers would spend the seeded unspents, run with BTC_ENABLED = False')
+        nclaims = options['claims']
+        self.stdout.write('workers\tclaims/s\tavg latency (ms)')
+        try:
+            for nworkers in options['workers']:
+                self.seed(nworkers * nclaims)
+                durations = []
+                threads = [threading.Thread(target=_worker, args=(nclaims, durations)) for _ in xrange(nworkers)]
+                start = time.time()
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                elapsed = time.time() - start
+                self.stdout.write('{}\t{:.1f}\t{:.2f}'.format(nworkers, len(durations) / elapsed,
+                                                             1000 * sum(durations) / max(len(durations), 1)))
+        finally:
+            FederationWallet.objects.filter(txid=BENCHMARK_TXID).delete()
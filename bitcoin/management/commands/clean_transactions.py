@@ -1,6 +1,7 @@
 from django.core.management.base import NoArgsCommand
 from django.db.models import Q
 from bitcoin.models import BitcoinTransaction
+from bitcoin.reconciliation import Reconciler, transactions_confirmations
 from ownership.models import Ownership
 from util.celery import app
 
@@ -11,18 +12,12 @@ from transactions import Transactions
 def check_unconfirmed_transactions():
     # Check for unconfirmed transactions and set status to 2 if confirmed
 
-    transactions = Transactions()
-    count = 0
-    for t in BitcoinTransaction.objects.filter(Q(status=0) | Q(status=1), tx__isnull=False):
-        try:
-            conf = transactions.get(t.tx).get('confirmations', 0)
-        except Exception as e:
-            conf = 0
-
-        if conf > 0:
-            t.status = 2
-            t.save()
-            count += 1
+    def set_confirmed(btc_txs):
+        BitcoinTransaction.objects.filter(id__in=[t.id for t in btc_txs]).update(status=2)
+
+    reconciler = Reconciler('clean_transactions', transactions_confirmations(Transactions()))
+    _, count, _ = reconciler.run(BitcoinTransaction.objects.filter(Q(status=0) | Q(status=1), tx__isnull=False),
+                                 on_confirmed=set_confirmed)
     print "Set status of {} transactions to 2".format(count)
 
 
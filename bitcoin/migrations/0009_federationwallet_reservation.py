@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bitcoin', '0008_federationwallet_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='federationwallet',
+            name='reservation',
+            field=models.CharField(db_index=True, max_length=36, null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='federationwallet',
+            name='reserved_until',
+            field=models.DateTimeField(null=True, blank=True),
+        ),
+    ]
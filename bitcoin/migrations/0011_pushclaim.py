@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bitcoin', '0010_reconciliationcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PushClaim',
+            fields=[
+                ('btc_tx', models.OneToOneField(related_name='push_claim', primary_key=True, serialize=False, to='bitcoin.BitcoinTransaction')),
+                ('task_id', models.CharField(max_length=36, null=True, blank=True)),
+                ('claimed_until', models.DateTimeField()),
+            ],
+        ),
+    ]
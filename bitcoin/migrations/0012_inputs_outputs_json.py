@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import ast
+
+from django.db import models, migrations
+import util.fields
+
+
+def literal(value):
+    # the inputs and outputs were stored as str() of the python values
+    if not value or value == 'None':
+        return None
+    return ast.literal_eval(value)
+
+
+def forwards_func(apps, schema_editor):
+    BitcoinTransaction = apps.get_model('bitcoin', 'BitcoinTransaction')
+    for btc_tx in BitcoinTransaction.objects.only('id', 'inputs_str', 'outputs_str').iterator():
+        BitcoinTransaction.objects.filter(id=btc_tx.id).update(inputs_json=literal(btc_tx.inputs_str),
+                                                              outputs_json=literal(btc_tx.outputs_str))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bitcoin', '0011_pushclaim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bitcointransaction',
+            name='inputs_json',
+            field=util.fields.JSONBField(null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='bitcointransaction',
+            name='outputs_json',
+            field=util.fields.JSONBField(null=True, blank=True),
+        ),
+        migrations.RunPython(
+            forwards_func,
+        ),
+        migrations.RemoveField(
+            model_name='bitcointransaction',
+            name='inputs_str',
+        ),
+        migrations.RemoveField(
+            model_name='bitcointransaction',
+            name='outputs_str',
+        ),
+    ]
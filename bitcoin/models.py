@@ -1,16 +1,19 @@
 import ast
 import traceback
+import uuid
 
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
 from django.utils.datetime_safe import datetime
 
 from pycoin.key.BIP32Node import BIP32Node
 from pycoin.encoding import EncodingError
+from spool.spool import SpoolFundsError
 
 import pytz
 from util import crypto
 
+from util.fields import JSONBField
 from util.models import BackendException
 
 from util import util
@@ -37,6 +40,10 @@ class FederationWallet(models.Model):
     txid = models.TextField()
     type = models.CharField(max_length=100, default='')
 
+    # unspents claimed by a worker are leased instead of locking the whole table
+    reservation = models.CharField(max_length=36, blank=True, null=True, db_index=True)
+    reserved_until = models.DateTimeField(blank=True, null=True)
+
     # TODO seems to be unused - if so, remove
     @property
     def unspent(self):
@@ -45,6 +52,71 @@ class FederationWallet(models.Model):
                 'txid': self.txid,
                 'vout': self.vout}
 
+    @classmethod
+    def claim(cls, amounts, lease=None, txid=None):
+        """
+        Reserve unspents without locking the table.
+
+        `amounts` is a list of (amount, count) tuples. Rows locked by a
+        concurrent claim are skipped (SELECT ... FOR UPDATE SKIP LOCKED) so
+        that several workers can claim disjoint unspents at the same time.
+        The claimed rows are leased for `lease` seconds: they need to be
+        consumed once the transaction is pushed or released if the push
+        fails. Expired leases go back to the pool.
+        `txid` restricts the claim to the unspents of one transaction.
+
+        Returns a tuple (reservation, unspents).
+        """
+        lease = settings.BTC_RESERVATION_LEASE if lease is None else lease
+        reservation = str(uuid.uuid4())
+        amounts = [(amount, count) for amount, count in amounts if count > 0]
+        if not amounts:
+            return reservation, []
+
+        ctes, selects, params = [], [], []
+        for i, (amount, count) in enumerate(amounts):
+            ctes.append("""claim{i} AS (
+                SELECT id FROM bitcoin_federationwallet
+                WHERE amount = %s AND (reserved_until IS NULL OR reserved_until < now()){txid}
+                ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED)""".format(
+                i=i, txid=' AND txid = %s' if txid is not None else ''))
+            selects.append('SELECT id FROM claim{}'.format(i))
+            params += [amount] + ([txid] if txid is not None else []) + [count]
+
+        query = """
+        WITH {ctes}
+        UPDATE bitcoin_federationwallet
+        SET reservation = %s, reserved_until = now() + %s * interval '1 second'
+        WHERE id IN ({selects})
+        RETURNING id, amount, vout, txid
+        """.format(ctes=', '.join(ctes), selects=' UNION ALL '.join(selects))
+
+        cursor = connection.cursor()
+        cursor.execute(query, params + [reservation, lease])
+        desc = cursor.description
+        unspents = [dict(zip([col[0] for col in desc], row)) for row in cursor.fetchall()]
+
+        for amount, count in amounts:
+            if len([u for u in unspents if u['amount'] == amount]) != count:
+                cls.release(reservation)
+                raise SpoolFundsError('Not enough unspents for transaction')
+
+        return reservation, unspents
+
+    @classmethod
+    def consume(cls, reservation):
+        """
+        Remove the unspents of a reservation once they have been spent
+        """
+        return cls.objects.filter(reservation=reservation).delete()
+
+    @classmethod
+    def release(cls, reservation):
+        """
+        Return the unspents of a reservation to the pool
+        """
+        return cls.objects.filter(reservation=reservation).update(reservation=None, reserved_until=None)
+
 
 class BitcoinTransaction(models.Model):
     class Meta:
@@ -55,8 +127,8 @@ class BitcoinTransaction(models.Model):
     user = models.ForeignKey(User, blank=True, null=True, related_name='tx_created')
 
     from_address = models.CharField(max_length=100)
-    inputs_str = models.TextField(blank=True, null=True)
-    outputs_str = models.TextField(blank=True, null=True)
+    inputs_json = JSONBField(blank=True, null=True)
+    outputs_json = JSONBField(blank=True, null=True)
     mining_fee = models.IntegerField(blank=True, null=True)
     tx = models.TextField(max_length=100, blank=True, null=True)
 
@@ -367,6 +439,22 @@ class BitcoinTransaction(models.Model):
 
         return transaction
 
+    @staticmethod
+    def push_refills(refills, password):
+        """
+        Push the refills created by a bulk action. Refills are grouped in
+        batches of BTC_REFILL_BATCH_SIZE that are sent as one bitcoin
+        transaction each.
+        """
+        from bitcoin.tasks import refill, refill_batch
+        refill_ids = [r.id for r in refills]
+        for i in xrange(0, len(refill_ids), settings.BTC_REFILL_BATCH_SIZE):
+            batch = refill_ids[i:i + settings.BTC_REFILL_BATCH_SIZE]
+            if len(batch) == 1:
+                refill.delay(batch[0], password)
+            else:
+                refill_batch.delay(batch, password)
+
     @property
     def to_address(self):
         return self.outputs[-1][1]
@@ -427,8 +515,8 @@ class BitcoinTransaction(models.Model):
 
         transaction = cls(user=user,
                           from_address=from_address,
-                          inputs_str=str(inputs),
-                          outputs_str=str(outputs),
+                          inputs=inputs,
+                          outputs=outputs,
                           mining_fee=mining_fee,
                           tx=tx,
                           block_height=block_height,
@@ -438,21 +526,28 @@ class BitcoinTransaction(models.Model):
         transaction.service_str = "BitcoinDaemonMainnetService"
         return transaction
 
+    @staticmethod
+    def _as_tuples(io):
+        # json has no tuples: the (value, address) pairs are loaded as lists
+        if isinstance(io, list):
+            return [tuple(i) if isinstance(i, list) else i for i in io]
+        return io
+
     @property
     def inputs(self):
-        return ast.literal_eval(self.inputs_str) if (self.inputs_str and self.inputs_str != 'None') else None
+        return self._as_tuples(self.inputs_json)
 
     @inputs.setter
     def inputs(self, value):
-        self.inputs_str = str(value)
+        self.inputs_json = value
 
     @property
     def outputs(self):
-        return ast.literal_eval(self.outputs_str) if (self.outputs_str and self.outputs_str != 'None') else None
+        return self._as_tuples(self.outputs_json)
 
     @outputs.setter
     def outputs(self, value):
-        self.outputs_str = str(value)
+        self.outputs_json = value
 
     @property
     def from_wallet(self):
@@ -498,6 +593,76 @@ class BitcoinTransaction(models.Model):
         return [{'value': value, 'address': to_address} for (value, to_address) in io]
 
 
+class ReconciliationCheckpoint(models.Model):
+    """
+    Last transaction handled by a run of the reconciliation with the blockchain (see bitcoin.reconciliation),
+    an interrupted run resumes after it.
+    """
+    class Meta:
+        app_label = 'bitcoin'
+
+    name = models.CharField(max_length=100, unique=True)
+    last_id = models.IntegerField()
+    datetime = models.DateTimeField(auto_now=True)
+
+
+class PushClaim(models.Model):
+    """
+    Ledger of the pushes of the bitcoin transactions: a push task claims its transactions before calling
+    spool, so that a transaction enqueued several times is pushed only once.
+    """
+    class Meta:
+        app_label = 'bitcoin'
+
+    btc_tx = models.OneToOneField(BitcoinTransaction, primary_key=True, related_name='push_claim')
+    task_id = models.CharField(max_length=36, blank=True, null=True)
+    claimed_until = models.DateTimeField()
+
+    @classmethod
+    def claim(cls, btc_tx_ids, task_id, lease=None):
+        """
+        Claim the push of the transactions for the task `task_id`.
+
+        A transaction already claimed is only claimed again by the same task (a retry) or once the
+        lease of the previous claim expired (e.g. the worker was lost): the UPDATE re-checks its
+        condition on the locked rows, so concurrent tasks cannot both take over a claim. The
+        transactions never claimed are inserted, the primary key lets a single task insert each of
+        them. The claims are kept after the push: the tasks skip the transactions that are no
+        longer pending.
+
+        Returns the ids of the claimed transactions.
+        """
+        lease = settings.BTC_PUSH_CLAIM_LEASE if lease is None else lease
+        if not btc_tx_ids:
+            return []
+
+        update = """
+        UPDATE bitcoin_pushclaim
+        SET task_id = %s, claimed_until = now() + %s * interval '1 second'
+        WHERE btc_tx_id = ANY(%s::integer[]) AND (claimed_until < now() OR task_id = %s)
+        RETURNING btc_tx_id
+        """
+        insert = """
+        INSERT INTO bitcoin_pushclaim (btc_tx_id, task_id, claimed_until)
+        VALUES (%s, %s, now() + %s * interval '1 second')
+        """
+
+        cursor = connection.cursor()
+        cursor.execute(update, [task_id, lease, list(btc_tx_ids), task_id])
+        claimed = [row[0] for row in cursor.fetchall()]
+        existing = set(cls.objects.filter(btc_tx_id__in=btc_tx_ids).values_list('btc_tx_id', flat=True))
+        for btc_tx_id in sorted(set(btc_tx_ids) - existing):
+            try:
+                with transaction.atomic():
+                    cursor.execute(insert, [btc_tx_id, task_id, lease])
+            except IntegrityError:
+                # inserted by a concurrent task meanwhile
+                continue
+            claimed.append(btc_tx_id)
+        cursor.close()
+        return claimed
+
+
 class BitcoinWallet(models.Model):
     """
     Implements an HD-wallet (BIP0032) based upon the pycoin library
@@ -587,8 +752,13 @@ class BitcoinWallet(models.Model):
         """
         Creates a number of bitcoin addresses in a non-blocking fashion, without importing them into
         the bitcoin daemon.
+        The public wallet is parsed and derived down to a unique path once; every address is a
+        child of that path (e.g. '2014/2/23/15/26/8/9877978/12'), which also avoids duplicate
+        paths when addresses are created within the same microsecond.
         """
-        return [self.create_new_address() for _ in xrange(num_addresses)]
+        path = btc_util._uniqueHierarchicalString()
+        node = BitcoinWallet.pycoinWallet(public_key=self.public_key).subkey_for_path(path)
+        return ['%s/%d:%s' % (path, i, node.subkey(i).bitcoin_address()) for i in xrange(num_addresses)]
 
     @staticmethod
     def import_address(address, user):
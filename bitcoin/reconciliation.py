@@ -0,0 +1,144 @@
+"""
+Reconciliation of the status of the bitcoin transactions with the blockchain.
+
+The states of the transactions are fetched concurrently by a bounded pool of threads, at no more than
+`rate` requests per second, and the statuses are written in bulk chunk by chunk. The id of the last
+transaction of every chunk is stored in a ReconciliationCheckpoint, so that a run interrupted (e.g. by a
+restart of the worker) resumes where it stopped instead of starting over.
+"""
+import logging
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+
+import blocktrail
+
+from bitcoin.models import BitcoinTransaction, ReconciliationCheckpoint, TX_REJECTED
+
+logger = logging.getLogger(__name__)
+
+
+# returned by a fetch function for a transaction unknown to the blockchain
+NOT_FOUND = None
+
+
+class RateLimiter(object):
+    """
+    Spaces the calls to `wait` of all threads by at least 1 / rate seconds.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_call = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.time()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def blocktrail_confirmations(client):
+    """
+    Fetch function on the blocktrail api
+    """
+    def fetch(txid):
+        try:
+            return client.transaction(txid).get('confirmations', 0)
+        except blocktrail.exceptions.ObjectNotFound:
+            return NOT_FOUND
+    return fetch
+
+
+def transactions_confirmations(transactions):
+    """
+    Fetch function on a transactions.Transactions service
+    """
+    def fetch(txid):
+        confirmations = transactions.get(txid).get('confirmations', 0)
+        return 0 if confirmations == '' else confirmations
+    return fetch
+
+
+class Reconciler(object):
+    """
+    Fetches the number of confirmations of the transactions of a queryset with `fetch(txid)`,
+    which returns NOT_FOUND for unknown transactions.
+
+    `run` calls `on_confirmed(btc_txs)` with the confirmed transactions of every chunk and
+    `on_not_found(btc_txs)` with the unknown ones, the fetched number of confirmations is set
+    on the transactions. The transactions without confirmations are left as they are, and so
+    are the ones whose fetch failed.
+    """
+
+    def __init__(self, name, fetch, workers=None, rate=None, chunk_size=None):
+        self.name = name
+        self.fetch = fetch
+        self.workers = workers or settings.BTC_RECONCILE_WORKERS
+        self.rate_limiter = RateLimiter(settings.BTC_RECONCILE_RATE if rate is None else rate)
+        self.chunk_size = chunk_size or settings.BTC_RECONCILE_CHUNK_SIZE
+
+    def _fetch(self, txid):
+        self.rate_limiter.wait()
+        try:
+            return txid, self.fetch(txid)
+        except Exception as e:
+            logger.warning('Could not fetch transaction {}: {}'.format(txid, e))
+            return txid, 0
+
+    def run(self, queryset, on_confirmed, on_not_found=None, restart=False):
+        """
+        Returns the number of (checked, confirmed, not found) transactions.
+        """
+        checkpoint, _ = ReconciliationCheckpoint.objects.get_or_create(name=self.name, defaults={'last_id': 0})
+        if restart:
+            checkpoint.last_id = 0
+        elif checkpoint.last_id:
+            logger.info('Resuming {} after transaction {}'.format(self.name, checkpoint.last_id))
+
+        checked, confirmed, not_found = 0, 0, 0
+        pool = ThreadPool(self.workers)
+        try:
+            while True:
+                chunk = list(queryset.filter(id__gt=checkpoint.last_id).exclude(tx=None).order_by('id')
+                             [:self.chunk_size])
+                if not chunk:
+                    break
+                # the refills of a batch share their txid
+                txids = set(btc_tx.tx for btc_tx in chunk)
+                confirmations = dict(pool.map(self._fetch, txids))
+                for btc_tx in chunk:
+                    btc_tx.confirmations = confirmations[btc_tx.tx]
+
+                chunk_confirmed = [btc_tx for btc_tx in chunk if btc_tx.confirmations > 0]
+                chunk_not_found = [btc_tx for btc_tx in chunk if btc_tx.confirmations is NOT_FOUND]
+                if chunk_confirmed:
+                    on_confirmed(chunk_confirmed)
+                if chunk_not_found and on_not_found is not None:
+                    on_not_found(chunk_not_found)
+
+                checked += len(chunk)
+                confirmed += len(chunk_confirmed)
+                not_found += len(chunk_not_found)
+                checkpoint.last_id = chunk[-1].id
+                checkpoint.save()
+                logger.info('{}: checked {} transactions'.format(self.name, checked))
+        finally:
+            pool.close()
+            pool.join()
+
+        # the run is complete, the next one starts over
+        checkpoint.delete()
+        return checked, confirmed, not_found
+
+
+def reject_not_found(btc_txs):
+    BitcoinTransaction.objects.filter(id__in=[btc_tx.id for btc_tx in btc_txs])\
+        .update(status=TX_REJECTED, error_msg='Transaction not found')
+    for btc_tx in btc_txs:
+        logger.info('Transaction {} not found.'.format(btc_tx.tx))
@@ -3,11 +3,13 @@ import logging
 from pycoin.key.BIP32Node import BIP32Node
 
 from django.apps import apps
+from django.db import transaction as db_transaction
 from django.db.models.signals import post_save
 from django.core.exceptions import ObjectDoesNotExist
 from django.dispatch import receiver
 from django.conf import settings
 from acl.models import ActionControl
+from blobs.models import DigitalWork
 
 from ownership import models as ownership_models
 from ownership.signals import consignment_confirmed, unconsignment_create, loan_edition_confirm, loan_piece_confirm
@@ -66,16 +68,52 @@ def check_migration(instance):
     return None
 
 
+# the ownerships registering a piece or its number of editions, in the order they are pushed,
+# with the bitcoin transaction and the task pushing it
+PIECE_REGISTRATIONS = ((ownership_models.OwnershipPiece, BitcoinTransaction.register_piece, tasks.register_piece),
+                       (ownership_models.ConsignedRegistration, BitcoinTransaction.consigned_registration,
+                        tasks.consigned_registration),
+                       (ownership_models.OwnershipEditions, BitcoinTransaction.editions, tasks.editions))
+
+
+def register_piece(ownership):
+    """
+    Creates and pushes the bitcoin transaction of a registration in PIECE_REGISTRATIONS.
+    The transaction hashes the digital work of the piece, so it is held while the digital
+    work is uploaded by DigitalWork.ingest, see register_ingested_piece.
+    Returns the transaction, None when it is held or already created.
+    """
+    create, task = [(create, task) for model, create, task in PIECE_REGISTRATIONS
+                    if model.__name__ == ownership.type][0]
+    with db_transaction.atomic():
+        # blobs.tasks.ingest_digital_work cannot store the hash while the digital work is locked
+        digital_work = DigitalWork.objects.select_for_update().get(id=ownership.piece.digital_work_id)
+        if digital_work.is_ingesting:
+            return None
+        if ownership_models.Ownership.objects.filter(id=ownership.id, btc_tx__isnull=False).exists():
+            return None
+        ownership.piece.digital_work = digital_work
+        transaction = create(ownership)
+    task.delay(transaction.id, util.mainAdminPassword())
+    return transaction
+
+
+def register_ingested_piece(digital_work):
+    """
+    Pushes the registrations held by register_piece while digital_work was uploaded
+    """
+    for model, create, task in PIECE_REGISTRATIONS:
+        for ownership in model.objects.filter(piece__digital_work=digital_work, btc_tx=None).order_by('id'):
+            register_piece(ownership)
+
+
 # TODO use dispatch_uid='bitcoin_on_ownership_piece_create' -- see
 # https://docs.djangoproject.com/en/1.9/topics/signals/#preventing-duplicate-signals
 @receiver(post_save, sender=ownership_models.OwnershipPiece)
 def on_ownership_piece_create(sender, instance, created, *args, **kwargs):
     if created:
-        # Create bitcoin transaction
-        transaction = BitcoinTransaction.register_piece(instance)
-
         # register piece
-        tasks.register_piece.delay(transaction.id, util.mainAdminPassword())
+        register_piece(instance)
 
 
 # TODO use dispatch_uid='bitcoin_on_ownership_editions_create' -- see
@@ -83,11 +121,8 @@ def on_ownership_piece_create(sender, instance, created, *args, **kwargs):
 @receiver(post_save, sender=ownership_models.OwnershipEditions)
 def on_ownership_editions_create(sender, instance, created, *args, **kwargs):
     if created:
-        # Create bitcoin transaction
-        transaction = BitcoinTransaction.editions(instance)
-
         # register number of editions
-        tasks.editions.delay(transaction.id, util.mainAdminPassword())
+        register_piece(instance)
 
 
 @receiver(post_save, sender=ownership_models.OwnershipRegistration)
@@ -101,7 +136,7 @@ def on_ownership_registration_create(sender, instance, created, *args, **kwargs)
 
 
 @receiver(transfer_created, sender=TransferEndpoint)
-def on_ownership_transfer_create(sender, instance, password, *args, **kwargs):
+def on_ownership_transfer_create(sender, instance, password, refills=None, *args, **kwargs):
     # Create bitcoin transfer transaction
     transfer = BitcoinTransaction.transfer(instance)
 
@@ -139,7 +174,11 @@ def on_ownership_transfer_create(sender, instance, password, *args, **kwargs):
         # transaction_monitor
         refill.dependent_tx = transfer
         refill.save()
-        tasks.refill.delay(refill.id, util.mainAdminPassword())
+        if refills is not None:
+            # bulk transfer: the refills are pushed together by the caller
+            refills.append(refill)
+        else:
+            tasks.refill.delay(refill.id, util.mainAdminPassword())
 
 
 @receiver(consignment_created, sender=ConsignEndpoint)
@@ -305,11 +344,8 @@ def on_loan_piece_confirmed(sender, instance, *args, **kwargs):
 @receiver(post_save, sender=ownership_models.ConsignedRegistration)
 def on_consigned_registration_create(sender, instance, created, *args, **kwargs):
     if created:
-        # Create bitcoin transaction
-        transaction = BitcoinTransaction.consigned_registration(instance)
-
         # consigned registeration of a piece
-        tasks.consigned_registration.delay(transaction.id, util.mainAdminPassword())
+        register_piece(instance)
 
 
 @receiver(post_save, sender=ownership_models.OwnershipMigration)
@@ -331,40 +367,45 @@ def execute_pending_actions(sender, user, *args, **kwargs):
     # check for pending actions when a user logins for the first time
     ownership_transfers = ownership_models.OwnershipTransfer.objects.filter(new_owner=user)
 
-    for ownership_transfer in ownership_transfers:
-        ownership_transfer.edition.pending_new_owner = None
-        ownership_transfer.edition.owner = ownership_transfer.new_owner
-        ownership_transfer.edition.save()
-        ownership_transfer.save()
-        acl = ActionControl.objects.get(user=ownership_transfer.prev_owner,
-                                        piece=ownership_transfer.edition.parent,
-                                        edition=ownership_transfer.edition)
-        acl.acl_withdraw_transfer = False
-        acl.acl_unshare = True
-        acl.save()
-
-        # create the transaction
-        transfer = BitcoinTransaction.transfer(ownership_transfer)
-
-        # before pushing the transaction we need to check:
-        # 1. the edition is already registered (because of lazy editions)
-        # 2. the edition address is refilled
-
-        # check if edition is registered
-        registration = ownership_models.OwnershipRegistration.objects.filter(edition=ownership_transfer.edition)
-        if not registration:
-            registration = ownership_models.OwnershipRegistration.create(edition=ownership_transfer.edition,
-                                                                         new_owner=ownership_transfer.edition.owner)
-            registration.save()
-
-        # refill the edition address
-        # create the transaction
-        refill = BitcoinTransaction.refill(ownership_transfer)
-        # set the transfer as the dependent transaction so that it is sent after the refill by the
-        # transaction_monitor
-        refill.dependent_tx = transfer
-        refill.save()
-        tasks.refill.delay(refill.id, util.mainAdminPassword())
+    refills = []
+    # the transfers executed before a failure wait for their refills as well
+    try:
+        for ownership_transfer in ownership_transfers:
+            ownership_transfer.edition.pending_new_owner = None
+            ownership_transfer.edition.owner = ownership_transfer.new_owner
+            ownership_transfer.edition.save()
+            ownership_transfer.save()
+            acl = ActionControl.objects.get(user=ownership_transfer.prev_owner,
+                                            piece=ownership_transfer.edition.parent,
+                                            edition=ownership_transfer.edition)
+            acl.acl_withdraw_transfer = False
+            acl.acl_unshare = True
+            acl.save()
+
+            # create the transaction
+            transfer = BitcoinTransaction.transfer(ownership_transfer)
+
+            # before pushing the transaction we need to check:
+            # 1. the edition is already registered (because of lazy editions)
+            # 2. the edition address is refilled
+
+            # check if edition is registered
+            registration = ownership_models.OwnershipRegistration.objects.filter(edition=ownership_transfer.edition)
+            if not registration:
+                registration = ownership_models.OwnershipRegistration.create(edition=ownership_transfer.edition,
+                                                                             new_owner=ownership_transfer.edition.owner)
+                registration.save()
+
+            # refill the edition address
+            # create the transaction
+            refill = BitcoinTransaction.refill(ownership_transfer)
+            # set the transfer as the dependent transaction so that it is sent after the refill by the
+            # transaction_monitor
+            refill.dependent_tx = transfer
+            refill.save()
+            refills.append(refill)
+    finally:
+        BitcoinTransaction.push_refills(refills, util.mainAdminPassword())
 
 
 def get_pubkey():
@@ -1,5 +1,5 @@
-import re
 import logging
+import threading
 
 import blocktrail
 
@@ -16,10 +16,12 @@ from celery import Task, chain
 from celery.task import periodic_task
 from random import randint
 from spool import Spool
-from spool.spool import SpoolFundsError
 
-from bitcoin.models import BitcoinTransaction, BitcoinWallet, FederationWallet
+from bitcoin.bitcoin_service import BitcoinService
+from bitcoin.btc_util import op_return_hex
+from bitcoin.models import BitcoinTransaction, BitcoinWallet, FederationWallet, PushClaim
 from bitcoin.models import TX_UNCONFIRMED, TX_CONFIRMED, TX_PENDING, TX_REJECTED
+from bitcoin.reconciliation import Reconciler, blocktrail_confirmations, reject_not_found
 from ownership.models import Ownership
 from piece.models import Piece, Edition
 from util.celery import app
@@ -32,40 +34,55 @@ logger = logging.getLogger(__name__)
 
 TIMEOUT = 60
 
-# Select and delete the unspents with a locked table
-query_sql_main = """
-LOCK TABLE bitcoin_federationwallet IN ACCESS EXCLUSIVE MODE;
-DELETE FROM bitcoin_federationwallet
-WHERE (id, amount, vout, txid) IN ((
-SELECT id, amount, vout, txid FROM bitcoin_federationwallet WHERE amount={} LIMIT %d)
-UNION (SELECT id, amount, vout, txid FROM bitcoin_federationwallet WHERE amount={} LIMIT %d))
-RETURNING id, amount, vout, txid
-""".format(settings.BTC_TOKEN, settings.BTC_FEE)
-
-query_sql_refill = """
-LOCK TABLE bitcoin_federationwallet IN ACCESS EXCLUSIVE MODE;
-DELETE FROM bitcoin_federationwallet
-WHERE (id, amount, vout, txid) IN (
-SELECT id, amount, vout, txid FROM bitcoin_federationwallet WHERE amount={} LIMIT 1)
-RETURNING id, amount, vout, txid
-""".format(settings.BTC_CHUNK)
-
 
 class BackendSpool(Spool):
     # Spool with custom input selection to prevent double spents
 
+    def __init__(self, *args, **kwargs):
+        super(BackendSpool, self).__init__(*args, **kwargs)
+        self._local = threading.local()
+        # every push of the spool and of the tasks goes through self._t
+        push = self._t.push
+
+        def push_and_consume(*args, **kwargs):
+            txid = push(*args, **kwargs)
+            # the unspents are spent on-chain: they must not go back to the pool even if
+            # the task fails afterwards
+            self.settle_reservations(spent=True)
+            return txid
+        self._t.push = push_and_consume
+
+    @property
+    def reservations(self):
+        # reservations of federation wallet unspents made by the current task
+        if not hasattr(self._local, 'reservations'):
+            self._local.reservations = []
+        return self._local.reservations
+
+    def claim(self, amounts):
+        reservation, unspents = FederationWallet.claim(amounts)
+        self.reservations.append(reservation)
+        return unspents
+
+    def settle_reservations(self, spent):
+        """
+        Consume the unspents claimed by the current task if the transaction
+        was pushed, otherwise return them to the pool. The unspents of a
+        pushed transaction are consumed by the push itself.
+        """
+        while self.reservations:
+            reservation = self.reservations.pop()
+            if spent:
+                FederationWallet.consume(reservation)
+            else:
+                FederationWallet.release(reservation)
+
     def select_inputs(self, address, nfees, ntokens, min_confirmations=6):
         # select inputs from the federation wallet
         if address == BitcoinWallet.mainAdminBtcAddress():
-            cursor = connection.cursor()
-            cursor.execute(query_sql_main % (ntokens, nfees))
-            desc = cursor.description
-            unspents = [dict(zip([col[0] for col in desc], row)) for row in cursor.fetchall()]
+            unspents = self.claim([(settings.BTC_FEE, nfees), (settings.BTC_TOKEN, ntokens)])
             fees = filter(lambda d: d['amount'] == settings.BTC_FEE, unspents)
             tokens = filter(lambda d: d['amount'] == settings.BTC_TOKEN, unspents)
-            if len(fees) != nfees or len(tokens) != ntokens:
-                raise SpoolFundsError('Not enough unspents for transaction')
-
             return fees + tokens
         else:
             # select inputs from the user HD wallet
@@ -97,13 +114,18 @@ class SpoolAction(Task):
         try:
             # call only if btc is enabled
             if settings.BTC_ENABLED:
-                return super(SpoolAction, self).__call__(*args, **kwargs)
+                result = super(SpoolAction, self).__call__(*args, **kwargs)
+                self.spool.settle_reservations(spent=True)
+                return result
             else:
                 logger.info('BTC_ENABLED is False. Skipping: {}'.format(self.name))
 
         except Exception as e:
             # TODO: Log exception
             print e
+            # the task failed before pushing: return the claimed unspents to the federation wallet
+            if self.spool is not None:
+                self.spool.settle_reservations(spent=False)
             if super(SpoolAction, self).__name__ not in ['monitor', 'do_transaction', 'monitor_refill',
                                                          'transaction_monitor', 'initialize']:
                 countdown = randint(100, 120)
@@ -130,7 +152,9 @@ class SpoolAction(Task):
                                                       'bitcoin.tasks.initialize_federation_wallet',
                                                       'bitcoin.tasks.import_addresses',
                                                       'bitcoin.tasks.import_address',
-                                                      'bitcoin.tasks.create_refill_chunks']:
+                                                      'bitcoin.tasks.import_address_batch',
+                                                      'bitcoin.tasks.create_refill_chunks'] \
+                and retval is not None:
             self.blocktrail_subscribe(retval)
 
     def blocktrail_subscribe(self, txid):
@@ -146,20 +170,11 @@ class SpoolAction(Task):
 
     def select_chunk(self):
         """
-        Select chunk to refill_main_wallet with a locked table to avoid race conditions
+        Claim a chunk to refill_main_wallet. Concurrent claims skip each other's rows
         """
 
         print 'selecting chunks'
-        cursor = connection.cursor()
-        cursor.execute(query_sql_refill)
-        desc = cursor.description
-        unspents = [dict(zip([col[0] for col in desc], row)) for row in cursor.fetchall()]
-
-        if len(unspents) == 0:
-            raise SpoolFundsError('Not enough unspents for transaction')
-
-        chunks = filter(lambda d: d['amount'] == settings.BTC_CHUNK, unspents)
-        return chunks
+        return self.spool.claim([(settings.BTC_CHUNK, 1)])
 
 
 # Initialize federation wallet here
@@ -205,45 +220,71 @@ def transaction_monitor(txid, confirmations):
     logger.info('{} {}'.format(txid, confirmations))
     if confirmations > 0:
         # set transaction status to confirmed
-        btc_tx = BitcoinTransaction.objects.get(tx=txid)
-        btc_tx.status = TX_CONFIRMED
-        btc_tx.save()
+        # a batched refill shares its txid with the refills of every edition in the batch
+        btc_txs = list(BitcoinTransaction.objects.filter(tx=txid).select_related('dependent_tx'))
+        BitcoinTransaction.objects.filter(tx=txid).update(status=TX_CONFIRMED)
 
         # unsibscribe from blocktrail event
         transaction_monitor.blocktrail_unsubscribe(txid)
 
-        # check for dependent transactions
-        logger.info('Checking for dependent transactions...')
-        if btc_tx.dependent_tx:
-            ownership = btc_tx.dependent_tx.ownership.get(btc_tx=btc_tx.dependent_tx)
-            password = crypto.decode(settings.SECRET_KEY, ownership.ciphertext_wif)
-
-            if 'TRANSFER' in btc_tx.dependent_tx.spoolverb:
-                # get the password
-                transfer.delay(btc_tx.dependent_tx.id, password)
-            elif 'UNCONSIGN' in btc_tx.dependent_tx.spoolverb:
-                # get the password
-                unconsign.delay(btc_tx.dependent_tx.id, password)
-            elif 'CONSIGN' in btc_tx.dependent_tx.spoolverb:
-                # get the password
-                consign.delay(btc_tx.dependent_tx.id, password)
-            elif 'LOAN' in btc_tx.dependent_tx.spoolverb:
-                # get the password
-                if ownership.edition:
-                    loan.delay(btc_tx.dependent_tx.id, password)
-                else:
-                    loan_piece.delay(btc_tx.dependent_tx.id, password)
-
-        # check if password is set in the ownership and remove it
-        # this is inside of a try except block because some transactions don't have a ownership mapping
-        # e.g. refill transaction
-        try:
-            ownership = btc_tx.ownership.get(btc_tx=btc_tx)
-            if ownership:
-                ownership.ciphertext_wif = None
-                ownership.save()
-        except ObjectDoesNotExist:
-            pass
+        for btc_tx in btc_txs:
+            # check for dependent transactions
+            logger.info('Checking for dependent transactions...')
+            if btc_tx.dependent_tx:
+                push_dependent_tx(btc_tx.dependent_tx)
+
+            # check if password is set in the ownership and remove it
+            # this is inside of a try except block because some transactions don't have a ownership mapping
+            # e.g. refill transaction
+            try:
+                ownership = btc_tx.ownership.get(btc_tx=btc_tx)
+                if ownership:
+                    ownership.ciphertext_wif = None
+                    ownership.save()
+            except ObjectDoesNotExist:
+                pass
+
+
+def monitor_confirmed(btc_txs):
+    # the monitor handles all the transactions sharing a txid
+    for txid, confirmations in set((btc_tx.tx, btc_tx.confirmations) for btc_tx in btc_txs):
+        transaction_monitor.delay(txid, confirmations)
+
+
+def push_dependent_tx(dependent_tx):
+    ownership = dependent_tx.ownership.get(btc_tx=dependent_tx)
+    # get the password
+    password = crypto.decode(settings.SECRET_KEY, ownership.ciphertext_wif)
+
+    if 'TRANSFER' in dependent_tx.spoolverb:
+        transfer.delay(dependent_tx.id, password)
+    elif 'UNCONSIGN' in dependent_tx.spoolverb:
+        unconsign.delay(dependent_tx.id, password)
+    elif 'CONSIGN' in dependent_tx.spoolverb:
+        consign.delay(dependent_tx.id, password)
+    elif 'LOAN' in dependent_tx.spoolverb:
+        if ownership.edition:
+            loan.delay(dependent_tx.id, password)
+        else:
+            loan_piece.delay(dependent_tx.id, password)
+
+
+def claim_pushes(task, btc_tx_ids):
+    """
+    Claim the pending transactions pushed by the task. A transaction enqueued more than once is
+    pushed by the first task claiming it, the others skip it
+    """
+    claimed = PushClaim.claim(btc_tx_ids, task.request.id)
+    btc_txs = list(BitcoinTransaction.objects.filter(id__in=claimed, status=TX_PENDING).order_by('id'))
+    skipped = sorted(set(btc_tx_ids) - set(btc_tx.id for btc_tx in btc_txs))
+    if skipped:
+        logger.info('Skipping transactions {}: already pushed or claimed by another task'.format(skipped))
+    return btc_txs
+
+
+def claim_push(task, btc_tx_id):
+    btc_txs = claim_pushes(task, [btc_tx_id])
+    return btc_txs[0] if btc_txs else None
 
 
 # TODO: Check if we can remove this
@@ -259,7 +300,9 @@ def do_transaction(list_signatures):
 @app.task(base=SpoolAction)
 def register(btc_tx_id, password):
     logger.info('register task {}'.format(btc_tx_id))
-    btc_tx = BitcoinTransaction.objects.get(id=btc_tx_id)
+    btc_tx = claim_push(register, btc_tx_id)
+    if btc_tx is None:
+        return
     txid = register.spool.register(('', btc_tx.from_address), btc_tx.to_address, btc_tx.file_hash, password,
                                     btc_tx.edition_num, min_confirmations=1, sync=False, ownership=False)
     logger.info('Registering: {}'.format(txid))
@@ -273,7 +316,9 @@ def register(btc_tx_id, password):
 @app.task(base=SpoolAction)
 def consigned_registration(btc_tx_id, password):
     logger.info('consigned registration task')
-    btc_tx = BitcoinTransaction.objects.get(id=btc_tx_id)
+    btc_tx = claim_push(consigned_registration, btc_tx_id)
+    if btc_tx is None:
+        return
     txid = consigned_registration.spool.consigned_registration(('', btc_tx.from_address), btc_tx.to_address,
                                                                btc_tx.file_hash, password,
                                                                min_confirmations=1, sync=False, ownership=False)
@@ -288,7 +333,9 @@ def consigned_registration(btc_tx_id, password):
 @app.task(base=SpoolAction)
 def register_piece(btc_tx_id, password):
     logger.info('register_piece task {}'.format(btc_tx_id))
-    btc_tx = BitcoinTransaction.objects.get(id=btc_tx_id)
+    btc_tx = claim_push(register_piece, btc_tx_id)
+    if btc_tx is None:
+        return
     txid = register_piece.spool.register_piece(('', btc_tx.from_address), btc_tx.to_address, btc_tx.file_hash, password,
                                                min_confirmations=1, sync=False, ownership=False)
     logger.info('Registering piece: {} {}'.format(btc_tx.id, txid))
@@ -301,7 +348,9 @@ def register_piece(btc_tx_id, password):
 
 @app.task(base=SpoolAction)
 def editions(btc_tx_id, password):
-    btc_tx = BitcoinTransaction.objects.get(id=btc_tx_id)
+    btc_tx = claim_push(editions, btc_tx_id)
+    if btc_tx is None:
+        return
     txid = editions.spool.editions(('', btc_tx.from_address), btc_tx.to_address, btc_tx.file_hash, password,
                                     btc_tx.num_editions, min_confirmations=1, sync=False, ownership=False)
     logger.info('Registering number of editions: {}'.format(txid))
@@ -315,7 +364,9 @@ def editions(btc_tx_id, password):
 @app.task(base=SpoolAction)
 def refill(btc_tx_id, password):
     logger.info('refill task')
-    btc_tx = BitcoinTransaction.objects.get(id=btc_tx_id)
+    btc_tx = claim_push(refill, btc_tx_id)
+    if btc_tx is None:
+        return
     ntokens = len(btc_tx.outputs) - 1
     txid = refill.spool.refill(('', btc_tx.from_address), btc_tx.to_address, 1, ntokens, password,
                                 min_confirmations=1, sync=False)
@@ -327,10 +378,52 @@ def refill(btc_tx_id, password):
     return txid
 
 
+@app.task(base=SpoolAction)
+def refill_batch(btc_tx_ids, password):
+    """
+    Push the refills of a bulk action as a single bitcoin transaction.
+
+    Every refill keeps its own BitcoinTransaction row (and with it the
+    dependent transfer/consign of its edition) but all of them share the txid,
+    so the batch costs one push and one set of federation wallet inputs.
+    """
+    logger.info('refill batch task {}'.format(btc_tx_ids))
+    btc_txs = claim_pushes(refill_batch, btc_tx_ids)
+    if not btc_txs:
+        return
+    btc_tx_ids = [btc_tx.id for btc_tx in btc_txs]
+
+    # the outputs stored with every refill: the tokens and the fee of its edition address
+    outputs = [{'address': address, 'value': value} for btc_tx in btc_txs for value, address in btc_tx.outputs]
+    outputs += [{'script': op_return_hex(btc_txs[0].spoolverb), 'value': 0}]
+
+    # a token unspent funds every output a token covers, fee unspents fund the others and the
+    # mining fee, the remainder of the inputs goes to the miners as in spool.refill
+    token_values = [o['value'] for o in outputs if 0 < o['value'] <= settings.BTC_TOKEN]
+    fee_values = [o['value'] for o in outputs if o['value'] > settings.BTC_TOKEN]
+    ntokens = len(token_values)
+    nfees = -(-sum(fee_values) // settings.BTC_FEE)
+    while (nfees * settings.BTC_FEE + ntokens * settings.BTC_TOKEN - sum(token_values) - sum(fee_values) <
+           BitcoinService.calc_mining_fee(nfees + ntokens, len(outputs))):
+        nfees += 1
+
+    inputs = refill_batch.spool.claim([(settings.BTC_FEE, nfees), (settings.BTC_TOKEN, ntokens)])
+    unsigned_tx = refill_batch.transactions.build_transaction(inputs, outputs)
+    signed_tx = refill_batch.transactions.sign_transaction(unsigned_tx, password)
+    txid = refill_batch.transactions.push(signed_tx)
+    logger.info('Refill batch {} {}'.format(btc_tx_ids, txid))
+
+    BitcoinTransaction.objects.filter(id__in=btc_tx_ids).update(
+        status=TX_UNCONFIRMED, tx=txid, service_str=refill_batch.transactions._service.name)
+    return txid
+
+
 @app.task(base=SpoolAction)
 def transfer(btc_tx_id, password):
     logger.info('transfer task')
-    btc_tx = BitcoinTransaction.objects.get(id=btc_tx_id)
+    btc_tx = claim_push(transfer, btc_tx_id)
+    if btc_tx is None:
+        return
     from_address = tuple(btc_tx.from_address.split(':'))
     txid = transfer.spool.transfer(from_address, btc_tx.to_address, btc_tx.file_hash, password,
                                    btc_tx.edition_num, min_confirmations=1, sync=False, ownership=False)
@@ -345,7 +438,9 @@ def transfer(btc_tx_id, password):
 @app.task(base=SpoolAction)
 def consign(btc_tx_id, password):
     logger.info('consign task')
-    btc_tx = BitcoinTransaction.objects.get(id=btc_tx_id)
+    btc_tx = claim_push(consign, btc_tx_id)
+    if btc_tx is None:
+        return
     from_address = tuple(btc_tx.from_address.split(':'))
     txid = consign.spool.consign(from_address, btc_tx.to_address, btc_tx.file_hash, password,
                                  btc_tx.edition_num, min_confirmations=1, sync=False, ownership=False)
@@ -360,7 +455,9 @@ def consign(btc_tx_id, password):
 @app.task(base=SpoolAction)
 def unconsign(btc_tx_id, password):
     logger.info('unconsign task')
-    btc_tx = BitcoinTransaction.objects.get(id=btc_tx_id)
+    btc_tx = claim_push(unconsign, btc_tx_id)
+    if btc_tx is None:
+        return
     from_address = tuple(btc_tx.from_address.split(':'))
     txid = unconsign.spool.unconsign(from_address, btc_tx.to_address, btc_tx.file_hash, password,
                                      btc_tx.edition_num, min_confirmations=1, sync=False, ownership=False)
@@ -375,7 +472,9 @@ def unconsign(btc_tx_id, password):
 @app.task(base=SpoolAction)
 def loan(btc_tx_id, password):
     logger.info('loan task')
-    btc_tx = BitcoinTransaction.objects.get(id=btc_tx_id)
+    btc_tx = claim_push(loan, btc_tx_id)
+    if btc_tx is None:
+        return
     from_address = tuple(btc_tx.from_address.split(':'))
     txid = loan.spool.loan(from_address, btc_tx.to_address, btc_tx.file_hash, password,
                            btc_tx.edition_num, btc_tx.loan_start, btc_tx.loan_end,
@@ -391,7 +490,9 @@ def loan(btc_tx_id, password):
 @app.task(base=SpoolAction)
 def loan_piece(btc_tx_id, password):
     logger.info('loan_piece task')
-    btc_tx = BitcoinTransaction.objects.get(id=btc_tx_id)
+    btc_tx = claim_push(loan_piece, btc_tx_id)
+    if btc_tx is None:
+        return
     from_address = tuple(btc_tx.from_address.split(':'))
     txid = loan.spool.loan(from_address, btc_tx.to_address, btc_tx.file_hash, password,
                            btc_tx.edition_num, btc_tx.loan_start, btc_tx.loan_end,
@@ -407,7 +508,9 @@ def loan_piece(btc_tx_id, password):
 @app.task(base=SpoolAction)
 def migrate(btc_tx_id, password):
     logger.info('migrate task')
-    btc_tx = BitcoinTransaction.objects.get(id=btc_tx_id)
+    btc_tx = claim_push(migrate, btc_tx_id)
+    if btc_tx is None:
+        return
     txid = migrate.spool.migrate(('', btc_tx.from_address), btc_tx.old_address, btc_tx.to_address,
                                  btc_tx.file_hash, password, btc_tx.edition_num, min_confirmations=1,
                                  sync=False, ownership=False)
@@ -436,9 +539,7 @@ def monitor(self, txid):
         raise self.retry(countdown=TIMEOUT)
     logger.info('BTC registered {}'.format(txid))
     for tx in txid:
-        btc_tx = BitcoinTransaction.objects.get(tx=tx)
-        btc_tx.status = TX_CONFIRMED
-        btc_tx.save()
+        BitcoinTransaction.objects.filter(tx=tx).update(status=TX_CONFIRMED)
 
 
 @app.task(base=SpoolAction)
@@ -566,62 +667,18 @@ def initialize():
 
     # Check unconfirmed transactions
     logger.info('Checking unconfirmed transactions...')
-    for tx in BitcoinTransaction.objects.filter(status=TX_UNCONFIRMED, datetime__gt=from_datetime)\
-            .filter(from_address__regex=regex).order_by('datetime'):
-        try:
-            logger.info('Checking transaction {}'.format(tx.id))
-            response = initialize.blocktrail_client.transaction(tx.tx)
-            confirmations = response.get('confirmations', 0)
-            if confirmations > 0:
-                transaction_monitor.delay(tx.tx, confirmations)
-        except blocktrail.exceptions.ObjectNotFound:
-            tx.error_msg = 'Transaction not found'
-            tx.status = TX_REJECTED
-            tx.save()
-            logger.info('Transaction {} not found.'.format(tx.tx))
+    reconciler = Reconciler('initialize', blocktrail_confirmations(initialize.blocktrail_client))
+    reconciler.run(BitcoinTransaction.objects.filter(status=TX_UNCONFIRMED, datetime__gt=from_datetime)
+                   .filter(from_address__regex=regex),
+                   on_confirmed=monitor_confirmed,
+                   on_not_found=reject_not_found)
 
     # Push passed transactions
     logger.info('Checking unpushed transactions...')
-    # First we need get pending transactions in the queue and exclude them or else we are
-    # going to send duplicate transactions
-    tx_id_regex = r'^\((\d+),\s\S+?\)'
-    tx_ids_exclude = []
-
-    scheduled_tasks = app.control.inspect().scheduled()
-    scheduled_tasks = scheduled_tasks if scheduled_tasks else {}
-    active_tasks = app.control.inspect().active()
-    active_tasks = active_tasks if active_tasks else {}
-    reserved_tasks = app.control.inspect().reserved()
-    reserved_tasks = reserved_tasks if reserved_tasks else {}
-    for queue, tasks in scheduled_tasks.iteritems():
-        for task in tasks:
-            request = task.get('request', None)
-            if request:
-                match = re.match(tx_id_regex, request.get('args', ''))
-                if match:
-                    logger.info('Found transaction {} in the queue'.format(match.groups()[0]))
-                    tx_ids_exclude.append(int(match.groups()[0]))
-
-    for queue, tasks in active_tasks.iteritems():
-        for task in tasks:
-            request = task.get('request', None)
-            if request:
-                match = re.match(tx_id_regex, request.get('args', ''))
-                if match:
-                    logger.info('Found transaction {} in the queue'.format(match.groups()[0]))
-                    tx_ids_exclude.append(int(match.groups()[0]))
-
-    for queue, tasks in reserved_tasks.iteritems():
-        for task in tasks:
-            request = task.get('request', None)
-            if request:
-                match = re.match(tx_id_regex, request.get('args', ''))
-                if match:
-                    logger.info('Found transaction {} in the queue'.format(match.groups()[0]))
-                    tx_ids_exclude.append(int(match.groups()[0]))
-
+    # Transactions that are still in the queue are enqueued again: the push tasks claim their
+    # transactions (see PushClaim) so only one of the tasks pushes them
     for tx in BitcoinTransaction.objects.filter(status=TX_PENDING, datetime__gt=from_datetime)\
-            .filter(from_address__regex=regex).exclude(id__in=tx_ids_exclude).order_by('datetime'):
+            .filter(from_address__regex=regex).order_by('datetime'):
 
         logger.info('Pushing unpushed transaction {}'.format(tx.id))
         # Get the ownership action
@@ -734,3 +791,22 @@ def import_address(address, account):
         else:
             raise
     return address
+
+
+@app.task(base=SpoolAction, ignore_result=False)
+def import_address_batch(addresses, account):
+    """
+    Imports newly created addresses in one task. New addresses have no
+    history so the blockchain does not need to be rescanned.
+    """
+    for address in addresses:
+        try:
+            import_address_batch.transactions.import_address(address.split(':')[-1], account=account,
+                                                              rescan=False)
+        except Exception as e:
+            # see import_address
+            if e.message == {u'message': u'Invalid Bitcoin address or script', u'code': -5}:
+                logger.info('Invalid address in import_address_batch {} {}'.format(address, account))
+            else:
+                raise
+    return addresses
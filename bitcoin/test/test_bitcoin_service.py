@@ -6,3 +6,9 @@ from __future__ import unicode_literals
 def test_calc_tx_size():
     from ..bitcoin_service import BitcoinService
     assert BitcoinService.calc_tx_size(2, 3) == 408
+
+
+def test_calc_mining_fee():
+    from ..bitcoin_service import BitcoinService
+    assert BitcoinService.calc_mining_fee(2, 3) == BitcoinService.minTransactionFee
+    assert BitcoinService.calc_mining_fee(8, 7) == 2 * BitcoinService.minTransactionFee
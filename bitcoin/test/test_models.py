@@ -20,6 +20,83 @@ class TestFederationWallet(object):
         assert unspent['vout'] == attrs['vout']
         assert unspent['txid'] == attrs['txid']
 
+    @pytest.mark.django_db
+    def test_claim_reserves_disjoint_unspents(self):
+        from ..models import FederationWallet
+        for vout in range(4):
+            FederationWallet.objects.create(amount=10000, confirmations=1, vout=vout, txid='fee')
+            FederationWallet.objects.create(amount=3000, confirmations=1, vout=vout, txid='token')
+        reservation_a, unspents_a = FederationWallet.claim([(10000, 1), (3000, 2)])
+        reservation_b, unspents_b = FederationWallet.claim([(10000, 1), (3000, 2)])
+        assert len(unspents_a) == len(unspents_b) == 3
+        assert not set(u['id'] for u in unspents_a) & set(u['id'] for u in unspents_b)
+        assert FederationWallet.objects.filter(reservation=reservation_a).count() == 3
+        assert FederationWallet.objects.filter(reservation__isnull=True).count() == 2
+
+    @pytest.mark.django_db
+    def test_claim_not_enough_unspents(self):
+        from spool.spool import SpoolFundsError
+        from ..models import FederationWallet
+        FederationWallet.objects.create(amount=10000, confirmations=1, vout=0, txid='fee')
+        with pytest.raises(SpoolFundsError):
+            FederationWallet.claim([(10000, 1), (3000, 1)])
+        assert not FederationWallet.objects.filter(reservation__isnull=False).exists()
+
+    @pytest.mark.django_db
+    def test_consume_and_release(self):
+        from ..models import FederationWallet
+        for vout in range(2):
+            FederationWallet.objects.create(amount=3000, confirmations=1, vout=vout, txid='token')
+        spent, _ = FederationWallet.claim([(3000, 1)])
+        failed, _ = FederationWallet.claim([(3000, 1)])
+        FederationWallet.consume(spent)
+        FederationWallet.release(failed)
+        assert FederationWallet.objects.count() == 1
+        unspent = FederationWallet.objects.get()
+        assert unspent.reservation is None
+        assert unspent.reserved_until is None
+
+    @pytest.mark.django_db
+    def test_claim_expired_lease(self):
+        from ..models import FederationWallet
+        FederationWallet.objects.create(amount=3000, confirmations=1, vout=0, txid='token')
+        FederationWallet.claim([(3000, 1)], lease=-1)
+        reservation, unspents = FederationWallet.claim([(3000, 1)])
+        assert len(unspents) == 1
+        assert FederationWallet.objects.get().reservation == reservation
+
+    @pytest.mark.django_db
+    def test_claim_of_a_txid(self):
+        from ..models import FederationWallet
+        FederationWallet.objects.create(amount=3000, confirmations=1, vout=0, txid='live')
+        benchmark = FederationWallet.objects.create(amount=3000, confirmations=1, vout=0, txid='benchmark')
+        reservation, unspents = FederationWallet.claim([(3000, 1)], txid='benchmark')
+        assert [u['id'] for u in unspents] == [benchmark.id]
+        FederationWallet.consume(reservation)
+        assert FederationWallet.objects.get().txid == 'live'
+
+
+class TestPushClaim(object):
+
+    @pytest.mark.django_db
+    def test_claim_once(self):
+        from ..models import BitcoinTransaction, PushClaim
+        a = BitcoinTransaction.objects.create(from_address='from')
+        b = BitcoinTransaction.objects.create(from_address='from')
+        assert PushClaim.claim([a.id], 'task-1') == [a.id]
+        assert sorted(PushClaim.claim([a.id, b.id], 'task-2')) == [b.id]
+        # retries keep their task id
+        assert PushClaim.claim([a.id], 'task-1') == [a.id]
+        assert PushClaim.objects.get(btc_tx=b).task_id == 'task-2'
+
+    @pytest.mark.django_db
+    def test_claim_expired_lease(self):
+        from ..models import BitcoinTransaction, PushClaim
+        btc_tx = BitcoinTransaction.objects.create(from_address='from')
+        PushClaim.claim([btc_tx.id], 'lost-task', lease=-1)
+        assert PushClaim.claim([btc_tx.id], 'task') == [btc_tx.id]
+        assert PushClaim.objects.get().task_id == 'task'
+
 
 @pytest.mark.django_db
 def test_register_piece(ownership_piece_alice,
@@ -175,6 +252,18 @@ def test_loan_end(loan_piece):
     assert tx.loan_end == loan_piece.datetime_to.strftime('%y%m%d')
 
 
+@pytest.mark.django_db
+def test_outputs_stored_as_json():
+    from ..models import BitcoinTransaction
+    outputs = [(600, '1MDqUXj9uSNQmAY1k8SZDMjFtenBgNTPG9'),
+               (600, 'mgcyZY4K1sN11ULPxe2355SpfvXWm6a38P')]
+    tx = BitcoinTransaction.objects.create(outputs=outputs)
+    assert BitcoinTransaction.objects.get(id=tx.id).outputs == outputs
+    # the outputs can be queried in sql
+    assert BitcoinTransaction.objects.extra(where=["outputs_json->0->>1 = %s"],
+                                            params=[outputs[0][1]]).get() == tx
+
+
 @pytest.mark.django_db
 def test_inputs_getter():
     from ..models import BitcoinTransaction
@@ -211,3 +300,33 @@ def test_from_wallet(djroot_bitcoin_wallet):
     address = djroot_bitcoin_wallet.address
     tx = BitcoinTransaction.objects.create(from_address=address)
     assert tx.from_wallet == djroot_bitcoin_wallet
+
+
+@pytest.mark.django_db
+def test_create_new_addresses(alice_bitcoin_wallet, alice_password):
+    alice = alice_bitcoin_wallet.user
+    addresses = alice_bitcoin_wallet.create_new_addresses(3)
+    assert len(set(addresses)) == 3
+    private_wallet = BIP32Node.from_master_secret(alice_password + alice.email, netcode='XTN')
+    for address in addresses:
+        path, address = address.split(':')
+        assert private_wallet.subkey_for_path(path).address() == address
+
+
+@pytest.mark.django_db
+def test_push_refills_in_batches(settings):
+    from mock import patch
+    from ..models import BitcoinTransaction
+    settings.BTC_REFILL_BATCH_SIZE = 2
+    refills = []
+    for _ in range(3):
+        refill = BitcoinTransaction(from_address='from',
+                                    outputs=[(600, 'to'), (600, 'to'), (10000, 'to')],
+                                    spoolverb='ASCRIBESPOOL01FUEL')
+        refill.save()
+        refills.append(refill)
+    with patch('bitcoin.tasks.refill') as mock_refill, \
+            patch('bitcoin.tasks.refill_batch') as mock_refill_batch:
+        BitcoinTransaction.push_refills(refills, 'password')
+    mock_refill_batch.delay.assert_called_once_with([refills[0].id, refills[1].id], 'password')
+    mock_refill.delay.assert_called_once_with(refills[2].id, 'password')
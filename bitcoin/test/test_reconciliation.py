@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import threading
+import time
+
+import pytest
+
+
+class FakeBlockchain(object):
+    """
+    Local stand-in for the blockchain api: maps txids to their number of confirmations.
+    """
+
+    def __init__(self, confirmations, fail=()):
+        self.confirmations = confirmations
+        self.fail = fail
+        self.fetched = []
+        self.lock = threading.Lock()
+
+    def fetch(self, txid):
+        from ..reconciliation import NOT_FOUND
+        with self.lock:
+            self.fetched.append(txid)
+        if txid in self.fail:
+            raise IOError('connection reset')
+        return self.confirmations.get(txid, NOT_FOUND)
+
+
+def _btc_txs(*txids):
+    from ..models import BitcoinTransaction, TX_UNCONFIRMED
+    return [BitcoinTransaction.objects.create(from_address='from', tx=txid, status=TX_UNCONFIRMED)
+            for txid in txids]
+
+
+@pytest.mark.django_db
+def test_run_updates_the_statuses():
+    from ..models import BitcoinTransaction, ReconciliationCheckpoint, TX_REJECTED, TX_UNCONFIRMED
+    from ..reconciliation import Reconciler, reject_not_found
+    # the first two transactions are refills batched in one bitcoin transaction
+    _btc_txs('batch', 'batch', 'confirmed', 'unconfirmed', 'missing', 'failing')
+    blockchain = FakeBlockchain({'batch': 3, 'confirmed': 1, 'unconfirmed': 0}, fail=('failing',))
+    confirmed = []
+
+    reconciler = Reconciler('test', blockchain.fetch, workers=4, rate=0, chunk_size=4)
+    counts = reconciler.run(BitcoinTransaction.objects.filter(status=TX_UNCONFIRMED),
+                            on_confirmed=confirmed.extend, on_not_found=reject_not_found)
+
+    assert counts == (6, 3, 1)
+    assert sorted(blockchain.fetched) == ['batch', 'confirmed', 'failing', 'missing', 'unconfirmed']
+    assert [(btc_tx.tx, btc_tx.confirmations) for btc_tx in confirmed] == \
+        [('batch', 3), ('batch', 3), ('confirmed', 1)]
+    assert BitcoinTransaction.objects.get(tx='missing').status == TX_REJECTED
+    assert BitcoinTransaction.objects.get(tx='failing').status == TX_UNCONFIRMED
+    assert not ReconciliationCheckpoint.objects.exists()
+
+
+@pytest.mark.django_db
+def test_run_resumes_after_the_checkpoint():
+    from ..models import BitcoinTransaction, ReconciliationCheckpoint
+    from ..reconciliation import Reconciler
+    btc_txs = _btc_txs('a', 'b', 'c', 'd')
+    blockchain = FakeBlockchain({'a': 1, 'b': 1, 'c': 1, 'd': 1})
+
+    def crash_on_second_chunk(chunk):
+        if chunk[0].tx == 'c':
+            raise RuntimeError('worker lost')
+
+    reconciler = Reconciler('test', blockchain.fetch, workers=2, rate=0, chunk_size=2)
+    with pytest.raises(RuntimeError):
+        reconciler.run(BitcoinTransaction.objects.all(), on_confirmed=crash_on_second_chunk)
+    assert ReconciliationCheckpoint.objects.get(name='test').last_id == btc_txs[1].id
+
+    blockchain.fetched = []
+    confirmed = []
+    assert reconciler.run(BitcoinTransaction.objects.all(), on_confirmed=confirmed.extend) == (2, 2, 0)
+    assert sorted(blockchain.fetched) == ['c', 'd']
+    assert [btc_tx.tx for btc_tx in confirmed] == ['c', 'd']
+
+
+def test_rate_limiter_spaces_the_calls():
+    from ..reconciliation import RateLimiter
+    limiter = RateLimiter(rate=50)
+    start = time.time()
+    for _ in range(5):
+        limiter.wait()
+    assert time.time() - start >= 4 / 50.0
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import pytest
+
+
+def _backend_spool(push_error=None):
+    """
+    A BackendSpool pushing through a mocked transactions client
+    """
+    from mock import MagicMock, patch
+    from spool import Spool
+    from ..tasks import BackendSpool
+
+    def init(self, *args, **kwargs):
+        self._t = MagicMock(**{'push.return_value': 'txid', 'push.side_effect': push_error})
+
+    with patch.object(Spool, '__init__', init):
+        return BackendSpool()
+
+
+def _spool_task(task, spool, monkeypatch, settings):
+    settings.BTC_ENABLED = True
+    monkeypatch.setattr(task, 'spool', spool)
+    monkeypatch.setattr(task, 'transactions', spool._t)
+
+
+@pytest.mark.django_db
+def test_unspents_of_a_pushed_transaction_are_consumed_when_the_task_fails(settings, monkeypatch):
+    from ..models import BitcoinTransaction, FederationWallet
+    from ..tasks import register
+    for vout in range(2):
+        FederationWallet.objects.create(amount=settings.BTC_FEE, confirmations=1, vout=vout, txid='fee')
+    btc_tx = BitcoinTransaction.objects.create(from_address='from')
+    spool = _backend_spool()
+
+    def spool_register(*args, **kwargs):
+        spool.claim([(settings.BTC_FEE, 1)])
+        return spool._t.push('signed tx')
+    monkeypatch.setattr(spool, 'register', spool_register)
+    _spool_task(register, spool, monkeypatch, settings)
+
+    def save(*args, **kwargs):
+        raise IOError('database gone')
+    monkeypatch.setattr(BitcoinTransaction, 'save', save)
+
+    with pytest.raises(IOError):
+        register(btc_tx.id, 'password')
+    # the claimed unspent is spent on-chain, it does not go back to the pool
+    assert FederationWallet.objects.count() == 1
+    assert FederationWallet.objects.get().reservation is None
+
+
+@pytest.mark.django_db
+def test_unspents_are_released_when_the_push_fails(settings, monkeypatch):
+    from ..models import BitcoinTransaction, FederationWallet
+    from ..tasks import register
+    FederationWallet.objects.create(amount=settings.BTC_FEE, confirmations=1, vout=0, txid='fee')
+    btc_tx = BitcoinTransaction.objects.create(from_address='from')
+    spool = _backend_spool(push_error=IOError('rejected'))
+
+    def spool_register(*args, **kwargs):
+        spool.claim([(settings.BTC_FEE, 1)])
+        return spool._t.push('signed tx')
+    monkeypatch.setattr(spool, 'register', spool_register)
+    _spool_task(register, spool, monkeypatch, settings)
+
+    with pytest.raises(IOError):
+        register(btc_tx.id, 'password')
+    assert FederationWallet.objects.get().reservation is None
+
+
+@pytest.mark.django_db
+def test_refill_batch(settings, monkeypatch):
+    from ..btc_util import op_return_hex
+    from ..models import BitcoinTransaction, FederationWallet, TX_UNCONFIRMED
+    from ..tasks import refill_batch
+    for vout in range(5):
+        FederationWallet.objects.create(amount=settings.BTC_FEE, confirmations=1, vout=vout, txid='fee')
+        FederationWallet.objects.create(amount=settings.BTC_TOKEN, confirmations=1, vout=vout, txid='token')
+    refills = [BitcoinTransaction.objects.create(from_address='from',
+                                                 outputs=[(600, address), (600, address), (10000, address)],
+                                                 spoolverb='ASCRIBESPOOL01FUEL')
+               for address in ('edition1', 'edition2')]
+    spool = _backend_spool()
+    _spool_task(refill_batch, spool, monkeypatch, settings)
+
+    assert refill_batch([refill.id for refill in refills], 'password') == 'txid'
+
+    inputs, outputs = spool._t.build_transaction.call_args[0]
+    assert outputs == [
+        {'address': 'edition1', 'value': 600},
+        {'address': 'edition1', 'value': 600},
+        {'address': 'edition1', 'value': 10000},
+        {'address': 'edition2', 'value': 600},
+        {'address': 'edition2', 'value': 600},
+        {'address': 'edition2', 'value': 10000},
+        {'script': op_return_hex('ASCRIBESPOOL01FUEL'), 'value': 0},
+    ]
+    # a token per dust output, the fees of the editions and a 2 kB mining fee
+    assert len([i for i in inputs if i['amount'] == settings.BTC_TOKEN]) == 4
+    assert len([i for i in inputs if i['amount'] == settings.BTC_FEE]) == 4
+    # the inputs are spent
+    assert FederationWallet.objects.count() == 2
+    assert not FederationWallet.objects.filter(reservation__isnull=False).exists()
+    assert set(BitcoinTransaction.objects.values_list('tx', 'status')) == {('txid', TX_UNCONFIRMED)}
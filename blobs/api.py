@@ -104,6 +104,7 @@ class DigitalWorkEndpoint(FileEndpoint):
 
     def perform_create(self, serializer):
         instance = serializer.save()
+        instance.set_s3_metadata()
         instance.digital_work_hash = instance.hash
         instance.save()
 
@@ -150,6 +151,8 @@ class OtherDataEndpoint(FileEndpoint):
 
     def perform_create(self, serializer):
         instance = serializer.save()
+        instance.set_s3_metadata()
+        instance.save()
         piece = Piece.objects.get(id=serializer.initial_data['piece_id'])
         if piece:
             piece.other_data.add(instance)
@@ -184,7 +187,9 @@ class ContractBlobEndpoint(OtherDataEndpoint):
     json_name = 'contractblobs'
 
     def perform_create(self, serializer):
-        serializer.save()
+        instance = serializer.save()
+        instance.set_s3_metadata()
+        instance.save()
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blobs', '0004_auto_20151021_1912'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='digitalwork',
+            name='s3_content_type',
+            field=models.CharField(default='', max_length=255, blank=True),
+        ),
+        migrations.AddField(
+            model_name='digitalwork',
+            name='s3_etag',
+            field=models.CharField(default='', max_length=100, blank=True),
+        ),
+        migrations.AddField(
+            model_name='digitalwork',
+            name='s3_size',
+            field=models.BigIntegerField(null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='otherdata',
+            name='s3_content_type',
+            field=models.CharField(default='', max_length=255, blank=True),
+        ),
+        migrations.AddField(
+            model_name='otherdata',
+            name='s3_etag',
+            field=models.CharField(default='', max_length=100, blank=True),
+        ),
+        migrations.AddField(
+            model_name='otherdata',
+            name='s3_size',
+            field=models.BigIntegerField(null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='thumbnail',
+            name='s3_content_type',
+            field=models.CharField(default='', max_length=255, blank=True),
+        ),
+        migrations.AddField(
+            model_name='thumbnail',
+            name='s3_etag',
+            field=models.CharField(default='', max_length=100, blank=True),
+        ),
+        migrations.AddField(
+            model_name='thumbnail',
+            name='s3_size',
+            field=models.BigIntegerField(null=True, blank=True),
+        ),
+    ]
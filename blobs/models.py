@@ -1,6 +1,11 @@
 import logging
 import os
+import shutil
+import tempfile
+import urllib2
+import urlparse
 import uuid
+from multiprocessing.pool import ThreadPool
 
 from django.conf import settings
 from django.contrib.auth.models import User
@@ -11,11 +16,10 @@ from django.utils.http import urlquote_plus
 
 from cStringIO import StringIO
 
-import urllib
 from boto.s3.key import Key
 
 from s3 import aws
-from util.image import rotate_jpg_from_exif, resize_single_image_with_ratio, resize_gif_with_ratio
+from util.image import rotate_jpg_from_exif, resize_cascade, resize_gif_with_ratio
 from util.celery import app
 from util.models import JobMonitor
 from util.util import hash_string
@@ -28,6 +32,22 @@ logger = logging.getLogger(__name__)
 JPEG_FILE_EXTENSION = 'jpeg'
 GIF_FILE_EXTENSION = 'gif'
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def download(url, suffix=''):
+    """
+    Streams the file at url to a named temporary file, removed when it is closed
+    """
+    f = tempfile.NamedTemporaryFile(suffix=suffix)
+    response = urllib2.urlopen(url)
+    try:
+        shutil.copyfileobj(response, f, DOWNLOAD_CHUNK_SIZE)
+    finally:
+        response.close()
+    f.seek(0)
+    return f
+
 
 class File(object):
     key = None
@@ -84,7 +104,7 @@ class File(object):
         return File.url_safe_from_key(self.key)
 
     def upload(self, from_url):
-        aws.upload(from_url, key=self.key)
+        self.set_s3_metadata(aws.upload(from_url, key=self.key))
 
     @staticmethod
     def url_safe_from_key(key):
@@ -96,13 +116,23 @@ class File(object):
     def url_from_key(key):
         return '%s/%s' % (aws.get_host(secure=True), key)
 
-    @property
-    def s3_file(self):
-        return aws.get_files(self.key)[0]
+    def set_s3_metadata(self, metadata=None):
+        """
+        Sets the size, etag and content type of the S3 object of the file, read with a HEAD
+        request when the metadata is not given (see aws.get_metadata). Does not save.
+        """
+        if metadata is None:
+            metadata = aws.get_metadata(self.key)
+        if metadata is not None:
+            self.s3_size, self.s3_etag, self.s3_content_type = metadata
+        return metadata
 
     @property
     def size(self):
-        return self.s3_file.size
+        if self.s3_size is None and self.set_s3_metadata() is not None and self.id:
+            # files uploaded before the metadata was stored are looked up once
+            self.save(update_fields=['s3_size', 's3_etag', 's3_content_type'])
+        return self.s3_size
 
     @property
     def mime(self):
@@ -134,7 +164,20 @@ class File(object):
         return unicode(self.url)
 
 
-class Thumbnail(models.Model, File):
+class S3Object(models.Model):
+    """
+    The metadata of the S3 object of a File, captured when its upload completes so that it
+    is never looked up by listing the bucket
+    """
+    s3_size = models.BigIntegerField(null=True, blank=True)
+    s3_etag = models.CharField(max_length=100, blank=True, default='')
+    s3_content_type = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        abstract = True
+
+
+class Thumbnail(S3Object, File):
     user = models.ForeignKey(User, related_name='thumbnails_at_user', null=True)
     thumbnail_file = models.CharField(max_length=2000)
     thumbnail_sizes = HStoreField(null=True)
@@ -150,51 +193,70 @@ class Thumbnail(models.Model, File):
     @staticmethod
     @app.task
     def thumbnail_from_url(url, key, thumbnail, sizes=settings.THUMBNAIL_SIZES):
+        ext = os.path.splitext(urlparse.urlparse(url).path)[1].lower()
+        original = download(url, suffix=ext)
+        try:
+            ext, thumbnails = Thumbnail.render(original.name, ext[1:], sizes)
+        finally:
+            original.close()
+
+        # upload the sizes concurrently on the same connection, public from the start
+        bucket = aws.get_bucket()
+        aws_keys = {label: Thumbnail.build_aws_key(key, label, ext) for label in thumbnails}
+
+        def upload(label):
+            aws_key = Key(bucket)
+            aws_key.key = aws_keys[label]
+            aws_key.set_contents_from_string(thumbnails[label], policy='public-read')
 
-        # download the file
-        filename, _ = urllib.urlretrieve(url)
-        # TODO use os.path.splitext:
-        # https://docs.python.org/2/library/os.path.html#os.path.splitext
-        ext = filename.rpartition('.')[2]
+        pool = ThreadPool(len(thumbnails))
+        try:
+            pool.map(upload, thumbnails.keys())
+        finally:
+            pool.close()
+            pool.join()
+
+        # update thumbnail
+        if settings.THUMBNAIL_SIZE_DEFAULT in aws_keys and thumbnail.thumbnail_file == settings.THUMBNAIL_DEFAULT:
+            thumbnail.thumbnail_file = aws_keys[settings.THUMBNAIL_SIZE_DEFAULT]
+        thumbnail_sizes = dict(thumbnail.thumbnail_sizes or {})
+        thumbnail_sizes.update({label: File.url_safe_from_key(aws_key) for label, aws_key in aws_keys.iteritems()})
+        thumbnail.thumbnail_sizes = thumbnail_sizes
+        thumbnail.save()
+
+        logger.info('Thumbnails created and uploaded to: \n{}'.format('\n'.join(thumbnail_sizes.values())))
+        return thumbnail
+
+    @staticmethod
+    def render(filename, ext, sizes=settings.THUMBNAIL_SIZES):
+        """
+        Returns the extension and the {label: data} of the thumbnails of the image file
+        for the sizes {label: (width, height)}.
+        """
         image = Image.open(filename)
+        if ext == GIF_FILE_EXTENSION:
+            # NOTE: resize_gif_with_ratio is calling save on img internally, from the file
+            return ext, {label: resize_gif_with_ratio(image, size, StringIO()).getvalue()
+                         for label, size in sizes.iteritems()}
 
-        # jpegs are rotated according to their exif data
         if ext in ['jpeg', 'jpg']:
+            # decode at the smallest scale of the jpeg (1/2, 1/4 or 1/8) that is
+            # still larger than the largest size
+            largest = max(max(size) for size in sizes.values())
+            image.draft(image.mode, (largest, largest))
+            # jpegs are rotated according to their exif data
             image = rotate_jpg_from_exif(image)
-            ext = JPEG_FILE_EXTENSION
-
-        # create a thumbnail for size
-        for label, size in sizes.iteritems():
-            if ext == GIF_FILE_EXTENSION:
-                # NOTE: resize_gif_with_ratio is calling save on img internally
-                thumb_image = resize_gif_with_ratio(image, size, StringIO())
-            else:
-                thumb_image = StringIO()
-                # NOTE: while we're calling it manually here
-                _thumb_image = resize_single_image_with_ratio(image, size)
-                # NOTE: For thumbnails, we want to convert all supported image
-                #       formats (with the exception of gif) to jpeg, as it
-                #       generally does the best job in compression for all types
-                #       of images.
-                ext = JPEG_FILE_EXTENSION
-                _thumb_image.format = ext
-                _thumb_image.save(thumb_image, ext)
-
-            # upload to aws
-            aws_key = Key(aws.get_bucket())
-            aws_key.key = Thumbnail.build_aws_key(key, label, ext)
-            aws_key.set_contents_from_string(thumb_image.getvalue())
-            aws_key.make_public()
-
-            # update thumbnail
-            if label == settings.THUMBNAIL_SIZE_DEFAULT and thumbnail.thumbnail_file == settings.THUMBNAIL_DEFAULT:
-                thumbnail.thumbnail_file = aws_key.key
-            thumbnail.thumbnail_sizes[label] = File.url_safe_from_key(aws_key.key)
-            thumbnail.save()
-
-            logger.info('Thumbnail created and uploaded to: \n{}'.format(thumbnail.thumbnail_sizes[label]))
 
-        return thumbnail
+        # NOTE: For thumbnails, we want to convert all supported image
+        #       formats (with the exception of gif) to jpeg, as it
+        #       generally does the best job in compression for all types
+        #       of images.
+        thumbnails = {}
+        for label, thumb_image in resize_cascade(image, sizes):
+            data = StringIO()
+            thumb_image.save(data, JPEG_FILE_EXTENSION)
+            thumbnails[label] = data.getvalue()
+        return JPEG_FILE_EXTENSION, thumbnails
 
     @staticmethod
     def build_aws_key(key, label, extension):
@@ -202,7 +264,7 @@ class Thumbnail(models.Model, File):
             key, label, str(uuid.uuid4()), extension)
 
 
-class OtherData(models.Model, File):
+class OtherData(S3Object, File):
     user = models.ForeignKey(User, related_name='other_datas_at_user', null=True)
     other_data_file = models.CharField(max_length=2000)
 
@@ -215,7 +277,7 @@ class OtherData(models.Model, File):
         self.other_data_file = value
 
 
-class DigitalWork(models.Model, File):
+class DigitalWork(S3Object, File):
     user = models.ForeignKey(User, related_name='digital_works_at_user', null=True)
     digital_work_file = models.CharField(max_length=2000)
     digital_work_hash = models.CharField(max_length=2000)
@@ -230,6 +292,9 @@ class DigitalWork(models.Model, File):
 
     @property
     def hash(self):
+        if self.digital_work_hash in [None, ''] and self.s3_etag:
+            self.digital_work_hash = self.s3_etag
+            self.save()
         if self.digital_work_hash in [None, '']:
             try:
                 self.digital_work_hash = aws.etag_hash(self.key)
@@ -250,7 +315,39 @@ class DigitalWork(models.Model, File):
 
         return self.digital_work_hash
 
-    def create_thumbnail(self):
+    def ingest(self, url):
+        """
+        Uploads the file at url to the key of the digital work in the background, the progress
+        of the upload can be followed through a JobMonitor. The hash of the digital work is set
+        when the upload completes, the registrations of its pieces on the blockchain are then
+        pushed and a video is encoded.
+        """
+        from blobs.tasks import ingest_digital_work
+        job = JobMonitor.objects.create(description=settings.JOB_UPLOAD_AWS,
+                                        object_id=self.id,
+                                        percent_done=0,
+                                        user=self.user)
+        ingest_digital_work.delay(job.id, url)
+        return job
+
+    @property
+    def is_ingested(self):
+        """
+        Whether the file of the digital work is uploaded by a job (see ingest)
+        """
+        return JobMonitor.objects.filter(object_id=self.id, description=settings.JOB_UPLOAD_AWS).exists()
+
+    @property
+    def is_ingesting(self):
+        """
+        Whether the file of the digital work is still being uploaded by a job, its hash is not known yet
+        """
+        return self.digital_work_hash in [None, ''] and self.is_ingested
+
+    def create_thumbnail(self, url=None):
+        """
+        url: where to read the image from, the file of the digital work by default
+        """
         if self.mime == 'image':
             try:
                 basename = self.associated_key('thumbnail', '', unique=False)
@@ -258,7 +355,7 @@ class DigitalWork(models.Model, File):
                                       thumbnail_file=settings.THUMBNAIL_DEFAULT,
                                       thumbnail_sizes={k: self.url for k, v in settings.THUMBNAIL_SIZES.iteritems()})
                 thumbnail.save()
-                Thumbnail.thumbnail_from_url.delay(self.url, basename, thumbnail)
+                Thumbnail.thumbnail_from_url.delay(url or self.url, basename, thumbnail)
                 return thumbnail
             except Exception as e:
                 logger.error(e.message)
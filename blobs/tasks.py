@@ -0,0 +1,48 @@
+from __future__ import absolute_import
+
+import logging
+import urllib2
+
+from boto.exception import S3ResponseError
+
+from blobs.models import DigitalWork
+from s3 import aws
+from util.celery import app
+from util.models import JobMonitor
+
+
+logger = logging.getLogger(__name__)
+
+
+@app.task(bind=True, ignore_result=True, max_retries=3, default_retry_delay=60)
+def ingest_digital_work(self, job_id, url):
+    """
+    Streams the file at url to the key of the digital work of the JobMonitor, see DigitalWork.ingest
+    """
+    job = JobMonitor.objects.get(id=job_id)
+    digital_work = DigitalWork.objects.get(id=int(job.object_id))
+
+    def on_progress(uploaded, size):
+        if size:
+            # 100 is left for the end of the upload
+            JobMonitor.objects.filter(id=job_id).update(percent_done=min(99, 100 * uploaded / size))
+
+    try:
+        metadata = aws.upload(url, digital_work.key, on_progress=on_progress)
+    except (urllib2.URLError, IOError, S3ResponseError) as e:
+        logger.warning('Could not upload {} to {}: {}'.format(url, digital_work.key, e))
+        raise self.retry(exc=e)
+    digital_work.set_s3_metadata(metadata)
+    digital_work.digital_work_hash = metadata.etag
+    digital_work.save()
+    JobMonitor.objects.filter(id=job_id).update(percent_done=100)
+    logger.info('Uploaded {} to {}'.format(url, digital_work.key))
+
+    # the registrations of the pieces on the blockchain waited for the hash
+    from bitcoin.signals import register_ingested_piece
+    register_ingested_piece(digital_work)
+
+    # the encoding of the video waited for the file
+    if digital_work.mime == 'video':
+        from encoder import zencoder_api
+        zencoder_api.encode(digital_work.user, digital_work)
@@ -21,6 +21,21 @@ pytestmark = pytest.mark.django_db
 Application = get_application_model()
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # the caches outlive the rollback of the test database, where ids are reused
+    from django.core.cache import caches
+    caches['default'].clear()
+    caches[settings.HISTORY_CACHE].clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_s3_client():
+    # the connection of the process would keep the sockets of a previous S3 mock
+    from s3 import aws
+    aws.reset()
+
+
 @pytest.fixture
 def s3_bucket(request):
     mock = mock_s3()
@@ -1,12 +1,21 @@
+import json
+import operator
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from collections import OrderedDict
-from rest_framework.pagination import PageNumberPagination
+
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination, _positive_int
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class NamedPageNumberPagination(PageNumberPagination):
     page_size = 1000
     page_size_query_param = 'page_size'
     max_page_size = 1000
+    display_counts = True
 
     def get_paginated_response(self, data, name='results', unfiltered_count=0, success=True):
         return Response(OrderedDict([
@@ -16,4 +25,127 @@ class NamedPageNumberPagination(PageNumberPagination):
             ('next', self.get_next_link()),
             ('previous', self.get_previous_link()),
             (name, data)
-        ]))
\ No newline at end of file
+        ]))
+
+
+class NamedCursorPagination(BasePagination):
+    """
+    Keyset pagination: a cursor holds the ordering values of the first or last row of a page
+    and the neighbouring page is selected with a WHERE on those values instead of an OFFSET,
+    so that deep pages cost the same as the first one.
+
+    The ordering is the one of the queryset (or the default ordering of the model), the
+    primary key is appended to it to keep the cursors stable when values are repeated.
+    The ordering fields are expected to be non null.
+
+    Use ?cursor= (empty) to get the first page, ?count=false to skip the counts.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    page_size = 1000
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.display_counts = request.query_params.get(self.count_query_param, 'true').lower() != 'false'
+        self.ordering = self.get_ordering(queryset)
+        self.count = queryset.count() if self.display_counts else None
+
+        reverse, position = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        if reverse:
+            queryset = queryset.order_by(*[self._reverse(field) for field in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position, reverse))
+
+        # fetch one more row to know whether there is a page following this one
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_following = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_following
+        else:
+            self.has_next, self.has_previous = has_following, position is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(request.query_params[self.page_size_query_param],
+                                 strict=True,
+                                 cutoff=self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_ordering(self, queryset):
+        ordering = tuple(queryset.query.order_by) or tuple(queryset.model._meta.ordering)
+        if not any(field.lstrip('-') in ('pk', 'id') for field in ordering):
+            ordering += ('pk',)
+        return ordering
+
+    def get_keyset_filter(self, position, reverse):
+        # (a, b, pk) > (x, y, z) <=> a > x or (a = x and b > y) or (a = x and b = y and pk > z)
+        clauses = []
+        for i, field in enumerate(self.ordering):
+            descending = field.startswith('-') != reverse
+            lookup = {'{}__{}'.format(field.lstrip('-'), 'lt' if descending else 'gt'): position[i]}
+            lookup.update({previous.lstrip('-'): value for previous, value in zip(self.ordering[:i], position[:i])})
+            clauses.append(Q(**lookup))
+        return reduce(operator.or_, clauses)
+
+    def get_position(self, instance):
+        position = []
+        for field in self.ordering:
+            value = instance
+            for attr in field.lstrip('-').split('__'):
+                value = getattr(value, attr)
+            position.append(value)
+        return position
+
+    def encode_cursor(self, reverse, position):
+        # unicode keeps the microseconds of the datetimes, the database parses them back
+        return urlsafe_b64encode(json.dumps([reverse, position], default=unicode))
+
+    def decode_cursor(self, encoded):
+        if not encoded:
+            return False, None
+        try:
+            reverse, position = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+        except (TypeError, ValueError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return bool(reverse), position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # paged backwards past the first row, start over
+            return replace_query_param(self.base_url, self.cursor_query_param, '')
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   self.encode_cursor(False, self.get_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   self.encode_cursor(True, self.get_position(self.page[0])))
+
+    def get_paginated_response(self, data, name='results', unfiltered_count=0, success=True):
+        return Response(OrderedDict([
+            ('success', True),
+            ('count', self.count),
+            ('unfiltered_count', unfiltered_count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            (name, data)
+        ]))
+
+    @staticmethod
+    def _reverse(field):
+        return field[1:] if field.startswith('-') else '-' + field
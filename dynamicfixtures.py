@@ -410,6 +410,7 @@ def _rating_piece_alice(subdomain='whitelabel'):
         piece=piece,
         note='9',
         type=Rating.__name__,
+        round=1,
     )[0]
 
 
@@ -422,6 +423,7 @@ def _rating_piece_bob(subdomain='whitelabel'):
         piece=piece,
         note='7',
         type=Rating.__name__,
+        round=1,
     )[0]
 
 
@@ -434,6 +436,7 @@ def _rating_one_piece_alice(subdomain='whitelabel'):
         piece=piece,
         note='3',
         type=Rating.__name__,
+        round=1,
     )[0]
 
 
@@ -446,6 +449,7 @@ def _rating_two_piece_alice(subdomain='whitelabel'):
         piece=piece,
         note='5',
         type=Rating.__name__,
+        round=1,
     )[0]
 
 
@@ -458,6 +462,7 @@ def _rating_three_piece_alice(subdomain='whitelabel'):
         piece=piece,
         note='7',
         type=Rating.__name__,
+        round=1,
     )[0]
 
 
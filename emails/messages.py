@@ -17,16 +17,20 @@ related usage.
 """
 from __future__ import unicode_literals
 
-from functools import wraps
+import hashlib
 import logging
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.utils.functional import cached_property
 from django.utils.http import urlquote_plus
 from django.utils.translation import ugettext as _
 
+import requests
+from lxml import etree
 from mailviews.messages import TemplatedHTMLEmailMessageView
+from inlinestyler.cssselect import CSSSelector
 from inlinestyler.utils import inline_css
 
 from .utils import get_signup_or_login_link
@@ -49,11 +53,44 @@ def is_blacklisted(recipients):
     return True
 
 
-def inlinecss(html_renderer_function):
-    @wraps(html_renderer_function)
-    def wrapper(*args, **kwargs):
-        return inline_css(html_renderer_function(*args, **kwargs))
-    return wrapper
+LINKS = CSSSelector('link[rel=stylesheet],link[rel=StyleSheet],link[rel=STYLESHEET]')
+STYLES = CSSSelector('style,Style')
+
+
+def _stylesheet(href):
+    """
+    The text of the stylesheet at href, kept in the default cache for EMAIL_STYLESHEET_CACHE_TIMEOUT
+    """
+    key = 'email-stylesheet:{}'.format(hashlib.md5(href.encode('utf-8')).hexdigest())
+    css = cache.get(key)
+    if css is None:
+        try:
+            response = requests.get(href, timeout=settings.EMAIL_STYLESHEET_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException:
+            raise IOError('The stylesheet {} could not be found'.format(href))
+        css = response.text
+        cache.set(key, css, settings.EMAIL_STYLESHEET_CACHE_TIMEOUT)
+    return css
+
+
+def inline_css_cached(html_message):
+    """
+    Inlines the CSS of an html document with inlinestyler.utils.inline_css. The linked
+    stylesheets are fetched once per EMAIL_STYLESHEET_CACHE_TIMEOUT instead of once per
+    message: they are put in the document as a style element, ahead of its own styles, which
+    is the order in which inline_css applies them.
+    """
+    document = etree.HTML(html_message)
+    links = LINKS(document)
+    if links:
+        style = etree.Element('style')
+        style.text = u''.join(_stylesheet(link.get('href')) for link in links)
+        (STYLES(document) or links)[0].addprevious(style)
+        for link in links:
+            link.getparent().remove(link)
+        html_message = etree.tostring(document, method='html', encoding='unicode')
+    return inline_css(html_message)
 
 
 # TODO This could perhaps be made into an abstract or meta class.
@@ -71,9 +108,8 @@ class AscribeEmailMessage(TemplatedHTMLEmailMessageView):
     def email_safe(self):
         return urlquote_plus(self.to)
 
-    @inlinecss
     def render_html_body(self, context):
-        return super(AscribeEmailMessage, self).render_html_body(context)
+        return inline_css_cached(super(AscribeEmailMessage, self).render_html_body(context))
 
     def render_to_message(self, extra_context=None, *args, **kwargs):
         assert 'to' not in kwargs  # this should only be sent to the user
@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
+import logging
 import urllib
+from collections import OrderedDict
 
 from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import get_connection
 from django.template import Context
 from django.template.loader import get_template
 from django.utils.translation import activate, ugettext as _
@@ -15,6 +19,19 @@ from util.celery import app
 from util.util import send_mail, insert_or_change_subdomain
 from whitelabel.models import WhitelabelSettings
 
+logger = logging.getLogger(__name__)
+
+
+def _pop_message_class_and_language(kwargs):
+    language = kwargs.pop('lang', 'en')
+    # make sure the language is something, else set to English
+    if not language:
+        language = 'en'
+    msg_cls = kwargs.pop('msg_cls', messages.AscribeEmailMessage)
+    if isinstance(msg_cls, basestring):
+        msg_cls = getattr(messages, msg_cls)
+    return msg_cls, language
+
 
 @app.task
 def send_ascribe_email(*args, **kwargs):
@@ -24,17 +41,48 @@ def send_ascribe_email(*args, **kwargs):
     # is being written here because the problem is not fully understood, and it
     # is therefore not ruled out that the observed problem could be handled
     # differently.
-    language = kwargs.pop('lang', 'en')
-    # make sure the language is something, else set to English
-    if not language:
-        language = 'en'
+    msg_cls, language = _pop_message_class_and_language(kwargs)
     activate(language)
-    msg_cls = kwargs.pop('msg_cls', messages.AscribeEmailMessage)
-    if isinstance(msg_cls, basestring):
-        msg_cls = getattr(messages, msg_cls)
     msg_cls(*args, **kwargs).send()
 
 
+@app.task
+def send_ascribe_emails(emails):
+    """
+    Sends the messages of a multi-recipient action (e.g. a share with many emails) at once.
+    emails is a list of the keyword arguments of send_ascribe_email, one per message.
+
+    The messages are rendered grouped per message class and language, so that a language is
+    activated once, and are all sent through one connection. The linked stylesheets are fetched
+    once per EMAIL_STYLESHEET_CACHE_TIMEOUT (see messages.inline_css_cached).
+    Returns the number of messages sent.
+    """
+    groups = OrderedDict()
+    for kwargs in emails:
+        kwargs = dict(kwargs)
+        msg_cls, language = _pop_message_class_and_language(kwargs)
+        groups.setdefault((msg_cls, language), []).append(kwargs)
+
+    sent = 0
+    connection = get_connection()
+    connection.open()
+    try:
+        for (msg_cls, language), group in groups.iteritems():
+            activate(language)
+            email_messages = []
+            for kwargs in group:
+                message = msg_cls(**kwargs)
+                # TODO move this elsewhere, e.g.: email backend?
+                if messages.is_blacklisted((message.to,)):
+                    logger.warn('Email is blacklisted on non-live environments')
+                    continue
+                email_messages.append(message.render_to_message(connection=connection))
+            sent += connection.send_messages(email_messages) or 0
+    finally:
+        connection.close()
+    return sent
+
+
 ############################################
 # Loan
 ############################################
@@ -100,10 +148,22 @@ def email_submit_prize(receiver, piece, subdomain):
 ############################################
 # Prize judge email endpoints
 ############################################
+def _prize_display_name(subdomain):
+    """
+    The name of the whitelabel of subdomain, kept by the process for WHITELABEL_NAME_CACHE_TIMEOUT
+    so that inviting a jury does not look it up for every judge
+    """
+    key = 'whitelabel-name:{}'.format(subdomain)
+    name = cache.get(key)
+    if name is None:
+        name = WhitelabelSettings.objects.get(subdomain=subdomain).name
+        cache.set(key, name, settings.WHITELABEL_NAME_CACHE_TIMEOUT)
+    return name
+
+
 @app.task
 def email_signup_judge(user, token, subdomain):
-    wl_settings = WhitelabelSettings.objects.get(subdomain=subdomain)
-    prize_display_name = wl_settings.name
+    prize_display_name = _prize_display_name(subdomain)
     subject = u'Invitation to judge for %s.' % prize_display_name
     redirect_url = insert_or_change_subdomain(settings.ASCRIBE_URL_FRONTEND + 'signup', subdomain)
 
@@ -129,14 +189,13 @@ def email_signup_judge(user, token, subdomain):
     else:
         htmly = get_template('emails/email_signup_judge.html')
 
-    html_content = inline_css(htmly.render(context))
+    html_content = messages.inline_css_cached(htmly.render(context))
     send_mail(subject, text_content, user.email, html_message=html_content)
 
 
 @app.task
 def email_invite_judge(user, subdomain):
-    wl_settings = WhitelabelSettings.objects.get(subdomain=subdomain)
-    prize_display_name = wl_settings.name
+    prize_display_name = _prize_display_name(subdomain)
     subject = u'Invitation to judge for %s' % prize_display_name
     redirect_url = insert_or_change_subdomain(settings.ASCRIBE_URL_FRONTEND + 'login', subdomain)
 
@@ -158,7 +217,7 @@ def email_invite_judge(user, subdomain):
         htmly = get_template('emails/sluice/email_invite_judge.html')
     elif subdomain == 'portfolioreview':
         htmly = get_template('emails/portfolioreview/email_invite_judge.html')
-    html_content = inline_css(htmly.render(context))
+    html_content = messages.inline_css_cached(htmly.render(context))
     send_mail(subject, text_content, user.email, html_message=html_content)
 
 
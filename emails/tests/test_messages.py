@@ -5,7 +5,9 @@ from __future__ import unicode_literals
 from urlparse import urlparse
 
 from django.core import mail
-from django.test import TestCase
+from django.test import TestCase, override_settings
+
+from mock import patch
 
 
 class OwnershipSenderEmailMessageTests(TestCase):
@@ -45,3 +47,60 @@ class TransferEmailMessageWhitelabelMarketTests(TestCase):
                                               editions=(edition,), subdomain='lumenus')
         parsed_url = urlparse(message.redirect_url)
         self.assertEqual(parsed_url.netloc.split('.')[0], 'www')
+
+
+class InlineCssCachedTests(TestCase):
+
+    HTML = ('<html><head>'
+            '<link rel="stylesheet" type="text/css" href="http://localhost/email.css" />'
+            '<style>.big {font-size: 2em; color: blue}</style></head>'
+            '<body><p class="big" style="margin: 0">%s</p></body></html>')
+    CSS = 'p {color: red} .big {font-size: 1em}'
+
+    def setUp(self):
+        import requests
+        self.fetched = []
+
+        def get(url, timeout=None):
+            self.fetched.append((url, timeout))
+            response = requests.Response()
+            response.status_code = 200
+            response._content = self.CSS.encode('utf-8')
+            response.encoding = 'utf-8'
+            return response
+        self.patch = patch('requests.get', get)
+        self.patch.start()
+        self.addCleanup(self.patch.stop)
+
+    def test_same_as_inline_css(self):
+        from inlinestyler.utils import inline_css
+        from ..messages import inline_css_cached
+        html = self.HTML % 'alice'
+        self.assertEqual(inline_css_cached(html), inline_css(html))
+        self.assertIn('color: blue', inline_css_cached(html))
+
+    @override_settings(EMAIL_STYLESHEET_TIMEOUT=3)
+    def test_stylesheet_fetched_once(self):
+        from ..messages import inline_css_cached
+        inline_css_cached(self.HTML % 'alice')
+        self.assertIn('bob', inline_css_cached(self.HTML % 'bob'))
+        self.assertEqual(self.fetched, [('http://localhost/email.css', 3)])
+
+    def test_stylesheet_fetched_again_once_expired(self):
+        from django.core.cache import cache
+        from ..messages import inline_css_cached
+        inline_css_cached(self.HTML % 'alice')
+        self.CSS = 'p {color: green}'
+        cache.clear()
+        self.assertIn('color: green', inline_css_cached(self.HTML % 'bob'))
+        self.assertEqual(len(self.fetched), 2)
+
+    def test_stylesheet_not_found(self):
+        import requests
+        from ..messages import inline_css_cached
+
+        def get(url, timeout=None):
+            raise requests.Timeout()
+        with patch('requests.get', get):
+            with self.assertRaises(IOError):
+                inline_css_cached(self.HTML % 'alice')
@@ -155,6 +155,27 @@ class EmailTasksTest(TestCase):
         self.assertIsNone(result.get())
         self.assertEqual(len(mail.outbox), 1)
 
+    def test_send_ascribe_emails_to_many_recipients(self):
+        from ..tasks import send_ascribe_emails
+        sender = self._sender()
+        editions = (self._edition(),)
+        for i in range(3):
+            User.objects.create(email='sharee{}@test.com'.format(i), username='sharee{}'.format(i))
+        emails = [dict(msg_cls='ShareEditionsEmailMessage',
+                       to='sharee{}@test.com'.format(i),
+                       sender=sender,
+                       editions=editions,
+                       message='',
+                       subdomain='www',
+                       lang=lang) for i, lang in enumerate(['en', 'fr', 'en'])]
+        result = send_ascribe_emails.delay(emails)
+        self.assertEqual(result.get(), 3)
+        # grouped per language
+        self.assertEqual([sent_mail.to[0] for sent_mail in mail.outbox],
+                         ['sharee0@test.com', 'sharee2@test.com', 'sharee1@test.com'])
+        self.assertEqual(mail.outbox[0].alternatives[0][0].count('style='),
+                         mail.outbox[1].alternatives[0][0].count('style='))
+
     def test_send_email_to_new_owner_on_transfer(self):
         from ..tasks import send_ascribe_email
         sender, receiver = self._sender(), self._receiver()
@@ -462,6 +483,17 @@ class EmailTasksTest(TestCase):
         email_signup_judge(alice, token, subdomain='sluice')
         self.assertEqual(len(mail.outbox), 1)
 
+    def test_send_invite_judge_emails_look_up_the_whitelabel_once(self):
+        from ..tasks import email_invite_judge
+        from whitelabel.test.util import APIUtilWhitelabel
+        alice = User.objects.create(email='alice@test.com', username='alice')
+        bob = User.objects.create(email='bob@test.com', username='bob')
+        APIUtilWhitelabel.create_whitelabel_market(alice, subdomain='sluice')
+        email_invite_judge(alice, 'sluice')
+        with self.assertNumQueries(0):
+            email_invite_judge(bob, 'sluice')
+        self.assertEqual(len(mail.outbox), 2)
+
     def test_send_submit_prize_sluice_email(self):
         from ..tasks import email_submit_prize
         receiver = self._receiver()
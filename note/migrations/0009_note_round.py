@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from datetime import datetime
+
+import pytz
+
+from django.db import models, migrations
+
+# the second round of the portfolioreview prize was told apart from the first one by this date
+PORTFOLIO_REVIEW_ROUND_TWO_STARTTIME = datetime(2016, 1, 5, 23, 0, 0, tzinfo=pytz.UTC)
+
+
+def forwards_func(apps, schema_editor):
+    Note = apps.get_model("note", "Note")
+    PrizePiece = apps.get_model("prize", "PrizePiece")
+    ratings = Note.objects.filter(type='Rating')
+    portfolioreview_pieces = PrizePiece.objects.filter(prize__whitelabel_settings__subdomain='portfolioreview')\
+        .values('piece_id')
+    ratings.filter(piece_id__in=portfolioreview_pieces, datetime__gte=PORTFOLIO_REVIEW_ROUND_TWO_STARTTIME)\
+        .update(round=2)
+    ratings.filter(round=None).update(round=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('note', '0008_auto_20150820_1711'),
+        ('prize', '0024_prizeuser_index_together'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='round',
+            field=models.IntegerField(null=True, blank=True),
+        ),
+        migrations.RunPython(
+            forwards_func,
+        ),
+    ]
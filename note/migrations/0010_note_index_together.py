@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('note', '0009_note_round'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='note',
+            index_together=set([('piece', 'user', 'type')]),
+        ),
+    ]
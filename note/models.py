@@ -9,6 +9,12 @@ class Note(models.Model):
     piece = models.ForeignKey("piece.Piece", related_name='note_at_piece', blank=True, null=True)
     note = models.TextField(blank=True, null=True)
     type = models.CharField(max_length=30, blank=True, null=True)
+    # round of the prize in which a rating was given
+    round = models.IntegerField(blank=True, null=True)
+
+    class Meta:
+        # the notes and ratings of a user on the pieces of a prize
+        index_together = ("piece", "user", "type")
 
     @classmethod
     def create(cls, owner, edition, note):
@@ -69,7 +69,7 @@ class EditionNotificationEndpoint(PieceNotificationEndpoint):
 
     def retrieve(self, request, pk=None):
         try:
-            edition = Edition.objects.get(bitcoin_path__contains=pk)
+            edition = Edition.objects.get(bitcoin_address=pk)
         except Edition.DoesNotExist:
             # TODO Log something perhaps
             # TODO Possibly, return more informative message, e.g.:
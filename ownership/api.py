@@ -12,9 +12,10 @@ from rest_framework.decorators import detail_route, list_route
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated, AllowAny
 from rest_framework.response import Response
 
-from bitcoin.models import BitcoinWallet
+from bitcoin.models import BitcoinTransaction, BitcoinWallet
 from blobs.models import OtherData
 from core.api import ModelViewSetKpi
+from core.pagination import NamedCursorPagination
 
 from .filters import ContractFilter, ContractAgreementFilter
 from ownership.license_serializer import LicenseSerializer
@@ -80,11 +81,13 @@ from ownership.signals import (
 from users.api import createOrGetUser
 from users.models import UserNeedsToRegisterRole
 
+from util import util
 from util.util import extract_subdomain
 from web.api_util import PaginatedGenericViewSetKpi, GenericViewSetKpi
 from emails import messages
 from emails.tasks import (
     send_ascribe_email,
+    send_ascribe_emails,
     email_contract_agreement_decision,
     email_send_contract_agreement,
 )
@@ -103,6 +106,7 @@ class RegistrationEndpoint(PaginatedGenericViewSetKpi):
     # create custom permission classes
     permission_classes = [IsAuthenticatedOrReadOnly]
     json_name = 'registrations'
+    cursor_pagination_class = NamedCursorPagination
 
     def retrieve(self, request, pk=None):
         queryset = self.get_queryset()
@@ -168,9 +172,17 @@ class TransferEndpoint(RegistrationEndpoint):
             transferee = createOrGetUser(data['transferee'])
             editions = data['bitcoin_id']
             extra_data = data.get('extra_data')
-            for edition in editions:
-                transfer_pk = TransferEndpoint._transfer(
-                    data['password'], edition, transferee, extra_data)
+            # the refills of all editions are pushed in batches once every transfer is created,
+            # the transfers saved before a failure wait for their refills as well
+            refills = []
+            transfers = []
+            try:
+                for edition in editions:
+                    transfer_pk = TransferEndpoint._transfer(
+                        data['password'], edition, transferee, extra_data, refills=refills)
+                    transfers.append({'bitcoin_id': edition.bitcoin_id, 'transfer_pk': transfer_pk})
+            finally:
+                BitcoinTransaction.push_refills(refills, util.mainAdminPassword())
 
             subdomain = extract_subdomain(request.META['HTTP_ORIGIN']) if request.META.has_key(
                 'HTTP_ORIGIN') else 'www'
@@ -200,6 +212,7 @@ class TransferEndpoint(RegistrationEndpoint):
             return Response({'success': True,
                              'notification': msg,
                              'transfer_pk': transfer_pk,
+                             'transfers': transfers,
                              },
                             status=status.HTTP_201_CREATED)
         else:
@@ -224,7 +237,7 @@ class TransferEndpoint(RegistrationEndpoint):
             return Response({'success': False, 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
     @staticmethod
-    def _transfer(password, edition, transferee, extra_data):
+    def _transfer(password, edition, transferee, extra_data, refills=None):
         try:
             assert password, "password not provided"
             # if consignment, consignment = dependent tx and consignee is prev_owner
@@ -245,7 +258,7 @@ class TransferEndpoint(RegistrationEndpoint):
             transfer.ciphertext_wif = BitcoinWallet.encoded_wif_for_path(transfer, password)
             transfer.extra_data = extra_data
             transfer.save()
-            transfer_created.send(sender=TransferEndpoint, instance=transfer, password=password)
+            transfer_created.send(sender=TransferEndpoint, instance=transfer, password=password, refills=refills)
 
             if UserNeedsToRegisterRole.objects.filter(
                 user=transferee, type='UserNeedsToRegisterRole').exists():
@@ -1278,18 +1291,20 @@ class ShareEndpoint(RegistrationEndpoint):
 
     @staticmethod
     def _share_and_email(user, editions, sharees, message, subdomain):
+        emails = []
         for sharee in sharees:
             for edition in editions:
                 s = Share.create(sharee=sharee, edition=edition, prev_owner=user)
                 s.save()
-            send_ascribe_email.delay(
+            emails.append(dict(
                 msg_cls=messages.ShareEditionsEmailMessage,
                 to=sharee.email,
                 sender=user,
                 editions=editions,
                 message=message,
                 subdomain=subdomain,
-            )
+            ))
+        send_ascribe_emails.delay(emails)
 
     def get_serializer_class(self):
         if self.action == "create":
@@ -1341,19 +1356,21 @@ class SharePieceEndpoint(ShareEndpoint):
 
     @staticmethod
     def _share_and_email(user, pieces, sharees, message, subdomain):
+        emails = []
         for sharee in sharees:
             for piece in pieces:
                 s = SharePiece.create(sharee=sharee, piece=piece)
                 s.save()
 
-            send_ascribe_email.delay(
+            emails.append(dict(
                 msg_cls=messages.SharePiecesEmailMessage,
                 sender=user,
                 to=sharee.email,
                 pieces=pieces,
                 message=message,
                 subdomain=subdomain,
-            )
+            ))
+        send_ascribe_emails.delay(emails)
 
     def get_serializer_class(self):
         if self.action == "create":
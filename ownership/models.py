@@ -1,6 +1,7 @@
 import pytz
 
 from django.core.exceptions import ValidationError
+from django.db import transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import HStoreField
@@ -82,12 +83,39 @@ class Ownership(WebhookModel):
     def save(self, *args, **kwargs):
         on_create = self.id is None
 
-        super(Ownership, self).save(*args, **kwargs)
+        with transaction.atomic():
+            super(Ownership, self).save(*args, **kwargs)
+            self._refresh_latest_ownership()
+        # after the commit, delete_safe goes through here as well
+        self._invalidate_history()
 
         # trigger webhook to new_owner (if any) on creation of ownership action
         if on_create and self.webhook_event:
             self.send_webhook(self.new_owner)
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            super(Ownership, self).delete(*args, **kwargs)
+            self._refresh_latest_ownership()
+        self._invalidate_history()
+
+    def _refresh_latest_ownership(self):
+        from piece.models import Edition
+
+        if self.edition_id is None or self.type not in Edition.LATEST_OWNERSHIP_FIELDS:
+            return
+        latest = Edition.refresh_latest_ownership(self.edition_id, self.type)
+        # keep the edition instance in memory (if any) in sync
+        edition = getattr(self, self._meta.get_field('edition').get_cache_name(), None)
+        if edition is not None:
+            setattr(edition, Edition.LATEST_OWNERSHIP_FIELDS[self.type], latest)
+
+    def _invalidate_history(self):
+        from piece.models import Edition
+
+        if self.edition_id is not None:
+            Edition.invalidate_history(self.edition_id)
+
     @property
     def gettype(self):
         return self.__class__.__name__
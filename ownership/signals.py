@@ -43,7 +43,8 @@ loan_piece_confirm = Signal(providing_args=["instance"])
 # custom signal to be sent when a transfer is created
 # we use this signal instead of the post_save on OwnershipTransfer
 # when we need access to the user password
-transfer_created = Signal(providing_args=["instance", "password"])
+# bulk transfers pass a `refills` list to collect the refills and push them in batches
+transfer_created = Signal(providing_args=["instance", "password", "refills"])
 
 # custom signal to be sent when a consignment is created
 # we use this signal instead of the post_save on Consignment
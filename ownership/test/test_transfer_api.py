@@ -34,6 +34,8 @@ def test_create_transfer(alice, bob, registered_edition_alice, alice_password):
     transfer = OwnershipTransfer.objects.get(pk=transfer_pk)
     assert transfer.edition.bitcoin_id == data['bitcoin_id']
     assert transfer.new_owner == bob
+    assert response.data['transfers'] == [
+        {'bitcoin_id': data['bitcoin_id'], 'transfer_pk': transfer_pk}]
 
 
 @pytest.mark.usefixtures('djroot_user', 'bob_bitcoin_wallet', 's3_bucket')
@@ -1,4 +1,5 @@
 import os
+import urlparse
 from urllib2 import URLError
 
 from django.conf import settings
@@ -11,6 +12,7 @@ from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticate
 from rest_framework.response import Response
 
 from blobs.models import DigitalWork, File, Thumbnail
+from core.pagination import NamedCursorPagination
 from piece.models import PieceFactory, Piece, Edition
 from piece.serializers import PieceSerializer, PieceDeleteForm, BasicEditionSerializer, \
     BasicPieceSerializerWithFirstEdition, PieceForm, PieceExtraDataForm, EditionDeleteForm, EditionRegister, \
@@ -44,11 +46,7 @@ class PieceEndpoint(PaginatedGenericViewSetKpi, AclFilterView):
     ordering = ('artist_name',)
 
     json_name = 'pieces'
-
-    def list(self, request, *args, **kwargs):
-        unfiltered_count = kwargs.pop('unfiltered_count',
-                                      len(PieceEndpoint.get_list_queryset(self.request.user)))
-        return super(PieceEndpoint, self).list(request,  unfiltered_count=unfiltered_count, *args, **kwargs)
+    cursor_pagination_class = NamedCursorPagination
 
     def retrieve(self, request, pk=None):
         queryset = self.get_queryset()
@@ -59,7 +57,7 @@ class PieceEndpoint(PaginatedGenericViewSetKpi, AclFilterView):
                 piece = queryset.get(id=pk)
             else:
                 # bitcoin ID
-                piece = queryset.get(bitcoin_path__regex=r'^\S+?:{}$'.format(pk))
+                piece = queryset.get(bitcoin_address=pk)
         except (Piece.DoesNotExist, ValueError):
             piece = None
 
@@ -156,13 +154,17 @@ class PieceEndpoint(PaginatedGenericViewSetKpi, AclFilterView):
         if hasattr(request.auth, 'token'):
             # API User: needs to generate digital work first from url
             url = data['digital_work_key']
+            if urlparse.urlparse(url).scheme not in ['http', 'https']:
+                raise ValueError('The digital work {} is not a valid url'.format(url))
             filename = os.path.split(url)[1]
             key = File.create_key("/".join([filename, "digitalwork"]), filename, request.user)
             digital_work = DigitalWork(user=request.user, digital_work_file=key)
             digital_work.save()
-            digital_work.upload(url)
+            # the file is uploaded in the background, the thumbnail is made from the url meanwhile
+            digital_work.ingest(url)
         else:
             # WEB User: file created by fineuploader
+            url = None
             digital_work = DigitalWork.objects.filter(user=request.user,
                                                       digital_work_file=data['digital_work_key']).order_by('-id')[0]
         if 'thumbnail_file' in data and data['thumbnail_file']:
@@ -170,7 +172,7 @@ class PieceEndpoint(PaginatedGenericViewSetKpi, AclFilterView):
             thumbnail = data['thumbnail_file']
         else:
             # Create thumbnail from digital_work
-            thumbnail = digital_work.create_thumbnail()
+            thumbnail = digital_work.create_thumbnail(url)
 
         if thumbnail is None:
             # Thumbnail fallback
@@ -197,11 +199,15 @@ class PieceEndpoint(PaginatedGenericViewSetKpi, AclFilterView):
             return PieceEndpoint.get_list_queryset(self.request.user, acl_filter=self.get_acl_filter())
         return self.queryset
 
+    def get_unfiltered_queryset(self):
+        return PieceEndpoint.get_list_queryset(self.request.user)
+
     @staticmethod
     def get_list_queryset(user, acl_filter={}):
         if user == AnonymousUser():
             return Piece.objects.none()
-        return ActionControl.get_items_for_user(user, acl_filter=acl_filter)
+        return ActionControl.get_items_for_user(user, acl_filter=acl_filter)\
+            .select_related('thumbnail', 'license_type', 'user_registered')
 
 
 class EditionEndpoint(PaginatedGenericViewSetKpi, AclFilterView):
@@ -218,6 +224,7 @@ class EditionEndpoint(PaginatedGenericViewSetKpi, AclFilterView):
     ordering_fields = ('edition_number',)
 
     json_name = 'editions'
+    cursor_pagination_class = NamedCursorPagination
 
     def create(self, request):
         """
@@ -247,7 +254,7 @@ class EditionEndpoint(PaginatedGenericViewSetKpi, AclFilterView):
                 edition = queryset.get(id=pk)
             else:
                 # bitcoin ID
-                edition = queryset.get(bitcoin_path__contains=pk)
+                edition = queryset.get(bitcoin_address=pk)
         except (Edition.DoesNotExist, Edition.MultipleObjectsReturned):
             edition = None
 
@@ -0,0 +1,54 @@
+"""
+Benchmark the creation of editions for an existing piece. For every size the
+editions are created in a transaction that is rolled back afterwards, so the
+piece is left untouched. The addresses are not imported into the bitcoin daemon
+(import_edition_addresses does not run).
+
+usage:
+    python manage.py benchmark_editions <piece_id> --sizes 10 100 1000
+"""
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from piece.models import Piece
+from piece.tasks import init_editions, bulk_create_and_freeze_editions
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('piece_id', type=int)
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10, 100, 1000],
+                            help="number of editions to create in each run")
+
+    def handle(self, *args, **options):
+        if settings.BTC_ENABLED:
+            raise CommandError('Disable BTC_ENABLED: the benchmark must not push transactions')
+
+        piece = Piece.objects.get(pk=options['piece_id'])
+        user = piece.user_registered
+        self.stdout.write('editions\taddresses (s)\tdb (s)\tqueries')
+        for num_editions in options['sizes']:
+            try:
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.time()
+                        editions = init_editions(piece.id, user.id, num_editions)
+                        derived = time.time()
+                        bulk_create_and_freeze_editions(editions, piece.id, user.id)
+                        end = time.time()
+                    self.stdout.write('{}\t{:.3f}\t{:.3f}\t{}'.format(num_editions, derived - start,
+                                                                     end - derived, len(queries)))
+                    raise Rollback()
+            except Rollback:
+                pass
@@ -0,0 +1,29 @@
+"""
+Check that the latest transfer, consignment and loan stored on the editions
+match their ownerships. With --fix the stale editions are updated.
+
+usage:
+    python manage.py check_edition_ownerships [--fix]
+"""
+
+from django.core.management.base import BaseCommand
+
+from piece.models import Edition
+from piece.sql import get_stale_latest_ownerships
+
+
+class Command(BaseCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', default=False,
+                            help="store the latest ownerships on the stale editions")
+
+    def handle(self, *args, **options):
+        for ownership_type, field in sorted(Edition.LATEST_OWNERSHIP_FIELDS.iteritems()):
+            stale = get_stale_latest_ownerships(Edition._meta.get_field(field).column, ownership_type)
+            for edition_id, stored_id, latest_id in stale:
+                self.stdout.write('edition {}: {} is {}, expected {}'.format(edition_id, field, stored_id, latest_id))
+                if options['fix']:
+                    Edition.refresh_latest_ownership(edition_id, ownership_type)
+            self.stdout.write('{}: {} stale editions{}'.format(field, len(stale), ', fixed' if options['fix'] and stale else ''))
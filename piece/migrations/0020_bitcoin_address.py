@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+BACKFILL_SQL = """
+    UPDATE {table}
+    SET bitcoin_address = CASE WHEN position(':' in bitcoin_path) > 0
+                               THEN split_part(bitcoin_path, ':', 2)
+                               ELSE bitcoin_path END
+    WHERE bitcoin_path IS NOT NULL AND bitcoin_path <> ''
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('piece', '0019_auto_20151207_1558'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='edition',
+            name='bitcoin_address',
+            field=models.CharField(db_index=True, max_length=100, null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='piece',
+            name='bitcoin_address',
+            field=models.CharField(db_index=True, max_length=100, null=True, blank=True),
+        ),
+        migrations.RunSQL(BACKFILL_SQL.format(table='piece_edition'), migrations.RunSQL.noop),
+        migrations.RunSQL(BACKFILL_SQL.format(table='piece_piece'), migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+import django.db.models.deletion
+
+
+BACKFILL_SQL = """
+    UPDATE piece_edition
+    SET {column} = latest.id
+    FROM (
+        SELECT DISTINCT ON (edition_id) id, edition_id
+        FROM ownership_ownership
+        WHERE edition_id IS NOT NULL AND type = '{type}' AND {condition}
+        ORDER BY edition_id, datetime DESC, id DESC
+    ) AS latest
+    WHERE piece_edition.id = latest.edition_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ownership', '0029_ownership_extra_data'),
+        ('piece', '0020_bitcoin_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='edition',
+            name='latest_consignment',
+            field=models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, to='ownership.Consignment', null=True),
+        ),
+        migrations.AddField(
+            model_name='edition',
+            name='latest_loan',
+            field=models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, to='ownership.Loan', null=True),
+        ),
+        migrations.AddField(
+            model_name='edition',
+            name='latest_transfer',
+            field=models.ForeignKey(related_name='+', on_delete=django.db.models.deletion.SET_NULL, blank=True, to='ownership.OwnershipTransfer', null=True),
+        ),
+        migrations.RunSQL(BACKFILL_SQL.format(column='latest_transfer_id', type='OwnershipTransfer',
+                                              condition='btc_tx_id IS NOT NULL'),
+                          migrations.RunSQL.noop),
+        migrations.RunSQL(BACKFILL_SQL.format(column='latest_consignment_id', type='Consignment',
+                                              condition='status IS DISTINCT FROM 0'),
+                          migrations.RunSQL.noop),
+        migrations.RunSQL(BACKFILL_SQL.format(column='latest_loan_id', type='Loan',
+                                              condition='status IS DISTINCT FROM 0'),
+                          migrations.RunSQL.noop),
+    ]
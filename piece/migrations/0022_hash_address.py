@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('piece', '0021_edition_latest_ownerships'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='edition',
+            name='hash_address',
+            field=models.CharField(max_length=50, null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='edition',
+            name='hash_address_no_metadata',
+            field=models.CharField(max_length=50, null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='piece',
+            name='hash_address',
+            field=models.CharField(max_length=50, null=True, blank=True),
+        ),
+        migrations.AddField(
+            model_name='piece',
+            name='hash_address_no_metadata',
+            field=models.CharField(max_length=50, null=True, blank=True),
+        ),
+    ]
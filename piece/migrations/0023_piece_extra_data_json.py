@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import ast
+
+from django.db import models, migrations
+import util.fields
+
+
+def forwards_func(apps, schema_editor):
+    Piece = apps.get_model('piece', 'Piece')
+    # the extra data was stored as str() of a dict
+    pieces = Piece.objects.exclude(extra_data_string='').exclude(extra_data_string='None')
+    for piece in pieces.only('id', 'extra_data_string').iterator():
+        Piece.objects.filter(id=piece.id).update(extra_data_json=ast.literal_eval(piece.extra_data_string))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('piece', '0022_hash_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='piece',
+            name='extra_data_json',
+            field=util.fields.JSONBField(default=dict, blank=True),
+        ),
+        migrations.RunPython(
+            forwards_func,
+        ),
+        migrations.RemoveField(
+            model_name='piece',
+            name='extra_data_string',
+        ),
+    ]
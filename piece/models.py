@@ -6,10 +6,10 @@ import urllib
 from django.conf import settings
 from django.utils import timezone
 from django.contrib.auth.models import User, AnonymousUser
+from django.core.cache import caches
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import models, transaction
 
-import ast
 import pybitcointools
 
 from acl.models import ActionControl
@@ -28,6 +28,7 @@ from ownership.models import (
 )
 from users.models import UserNeedsToRegisterRole
 from util import util
+from util.fields import JSONBField
 
 
 class Piece(models.Model):
@@ -40,7 +41,7 @@ class Piece(models.Model):
     datetime_registered = models.DateTimeField(auto_now_add=True)
 
     datetime_deleted = models.DateTimeField(blank=True, null=True)
-    extra_data_string = models.TextField(blank=True, default="")
+    extra_data_json = JSONBField(blank=True, default=dict)
 
     # the files themselves
     thumbnail = models.ForeignKey("blobs.Thumbnail", blank=True, null=True,
@@ -50,23 +51,58 @@ class Piece(models.Model):
                                         related_name='otherdata_at_piece')
 
     bitcoin_path = models.CharField(max_length=100, null=True, blank=True)  # genesis bitcoin address, with prefix
+    bitcoin_address = models.CharField(max_length=100, null=True, blank=True, db_index=True)  # without prefix
 
     license_type = models.ForeignKey(License, blank=True, null=True, related_name='license_at_piece',
                                      on_delete=models.SET_NULL)
 
+    # digests of hash_as_address and hash_as_address_no_metada, computed on first use
+    hash_address = models.CharField(max_length=50, null=True, blank=True)
+    hash_address_no_metadata = models.CharField(max_length=50, null=True, blank=True)
+
+    # the fields hashed by hash_as_address, the editions hash the number of editions as well
+    HASH_FIELDS = ('title', 'artist_name', 'date_created', 'bitcoin_path', 'digital_work_id')
+    EDITION_HASH_FIELDS = HASH_FIELDS + ('num_editions',)
+
     @property
     def extra_data(self):
-        return ast.literal_eval(self.extra_data_string) if (
-            self.extra_data_string and self.extra_data_string != 'None') else {}
+        return self.extra_data_json if self.extra_data_json is not None else {}
 
     @extra_data.setter
     def extra_data(self, value):
-        self.extra_data_string = str(value)
+        self.extra_data_json = value
 
     @property
     def bitcoin_id(self):
         return self.bitcoin_path.split(':')[1]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Piece, cls).from_db(db, field_names, values)
+        # deferred fields are left out, they count as changed
+        instance._hashed_values = tuple(instance.__dict__.get(field) for field in Piece.EDITION_HASH_FIELDS)
+        return instance
+
+    def _hash_changed(self, fields=EDITION_HASH_FIELDS):
+        # whether the given hashed fields differ from the ones loaded from the database
+        hashed = getattr(self, '_hashed_values', None)
+        if hashed is None:
+            return True
+        return any(getattr(self, field) != hashed[Piece.EDITION_HASH_FIELDS.index(field)] for field in fields)
+
+    def save(self, *args, **kwargs):
+        # keep the indexed bitcoin id in sync for the lookups
+        self.bitcoin_address = util.remove_btc_prefix(self.bitcoin_path) if self.bitcoin_path else None
+        edition_hash_changed = self.pk is not None and self._hash_changed()
+        if self.pk is not None and self._hash_changed(Piece.HASH_FIELDS):
+            self.hash_address = self.hash_address_no_metadata = None
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = list(kwargs['update_fields']) + ['hash_address', 'hash_address_no_metadata']
+        super(Piece, self).save(*args, **kwargs)
+        if edition_hash_changed:
+            Edition.objects.filter(parent_id=self.pk).update(hash_address=None, hash_address_no_metadata=None)
+        self._hashed_values = tuple(getattr(self, field) for field in Piece.EDITION_HASH_FIELDS)
+
     def acl(self, user):
         return ActionControl.objects.get(user=user, piece=self, edition=None)
 
@@ -83,30 +119,47 @@ class Piece(models.Model):
         return urllib.quote_plus(self.url)
 
     def first_edition(self, user, acl_query_params):
-        queryset = ActionControl.get_items_for_user(user, acl_query_params, 'edition') \
-            .filter(parent_id=self.id) \
-            .order_by('edition_number')
+        return Piece.first_editions([self.id], user, acl_query_params).get(self.id)
 
-        if not len(queryset):
-            return None
-        return {'bitcoin_id': queryset[0].bitcoin_id,
-                'edition_number': queryset[0].edition_number,
-                'num_editions_available': len(queryset)}
+    @staticmethod
+    def first_editions(piece_ids, user, acl_query_params):
+        """
+        Bulk version of first_edition: returns the first edition visible to the user
+        and the number of editions available for each piece, keyed by piece id,
+        using a single grouped query. Pieces without visible editions are left out.
+        """
+        from piece.sql import get_first_editions
+
+        return {piece_id: {'bitcoin_id': bitcoin_id,
+                           'edition_number': edition_number,
+                           'num_editions_available': num_editions_available}
+                for piece_id, edition_number, bitcoin_id, num_editions_available
+                in get_first_editions(piece_ids, user.id, acl_query_params)}
 
     def hash_as_address(self):
-        data = str([
-            unicode(self.title),
-            unicode(self.artist_name),
-            unicode(self.date_created),
-            unicode(self.bitcoin_path),
-            unicode(self.digital_work.hash),
-        ])
-        address = unicode(pybitcointools.bin_to_b58check(pybitcointools.bin_hash160(data)))
-        return address
+        if self.hash_address is None:
+            data = str([
+                unicode(self.title),
+                unicode(self.artist_name),
+                unicode(self.date_created),
+                unicode(self.bitcoin_path),
+                unicode(self.digital_work.hash),
+            ])
+            address = unicode(pybitcointools.bin_to_b58check(pybitcointools.bin_hash160(data)))
+            self._store_hash_address('hash_address', address, Piece.HASH_FIELDS)
+        return self.hash_address
 
     def hash_as_address_no_metada(self):
-        address = unicode(pybitcointools.bin_to_b58check(pybitcointools.bin_hash160(self.digital_work.hash)))
-        return address
+        if self.hash_address_no_metadata is None:
+            address = unicode(pybitcointools.bin_to_b58check(pybitcointools.bin_hash160(self.digital_work.hash)))
+            self._store_hash_address('hash_address_no_metadata', address, ('digital_work_id',))
+        return self.hash_address_no_metadata
+
+    def _store_hash_address(self, field, address, hashed_fields):
+        setattr(self, field, address)
+        # only persist the digests of saved values and of an uploaded digital work
+        if self.pk is not None and not self._hash_changed(hashed_fields) and self.digital_work.digital_work_hash:
+            Piece.objects.filter(pk=self.pk).update(**{field: address})
 
     def delete_safe(self):
         self.datetime_deleted = timezone.now()
@@ -192,6 +245,7 @@ class Edition(models.Model):
 
     # bitcoin
     bitcoin_path = models.CharField(max_length=100)  # genesis bitcoin address, with prefix
+    bitcoin_address = models.CharField(max_length=100, null=True, blank=True, db_index=True)  # without prefix
     datetime_deleted = models.DateTimeField(blank=True, null=True)
     # the files themselves
     coa = models.ForeignKey("coa.CoaFile", blank=True, null=True, related_name='coafile_at_piece',
@@ -207,6 +261,27 @@ class Edition(models.Model):
 
     consign_status = models.IntegerField(choices=settings.CONSIGN_STATUS_CHOICES, default=settings.NOT_CONSIGNED)
 
+    # latest ownership actions, denormalized from the ownerships by Ownership.save and Ownership.delete
+    latest_transfer = models.ForeignKey('ownership.OwnershipTransfer', blank=True, null=True, related_name='+',
+                                        on_delete=models.SET_NULL)
+    latest_consignment = models.ForeignKey('ownership.Consignment', blank=True, null=True, related_name='+',
+                                           on_delete=models.SET_NULL)
+    latest_loan = models.ForeignKey('ownership.Loan', blank=True, null=True, related_name='+',
+                                    on_delete=models.SET_NULL)
+
+    # digests of hash_as_address and hash_as_address_no_metada, computed on first use
+    # and dropped by Piece.save when one of the hashed fields of the piece changes
+    hash_address = models.CharField(max_length=50, null=True, blank=True)
+    hash_address_no_metadata = models.CharField(max_length=50, null=True, blank=True)
+
+    HASH_ADDRESS_FIELDS = ['hash_address', 'hash_address_no_metadata']
+
+    LATEST_OWNERSHIP_FIELDS = {
+        OwnershipTransfer.__name__: 'latest_transfer',
+        Consignment.__name__: 'latest_consignment',
+        Loan.__name__: 'latest_loan',
+    }
+
     @property
     def artist_name(self):
         return self.parent.artist_name
@@ -257,6 +332,57 @@ class Edition(models.Model):
             return self.bitcoin_path.split(':')[1]
         return self.bitcoin_path
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Edition, cls).from_db(db, field_names, values)
+        instance._hashed_values = (instance.__dict__.get('bitcoin_path'), instance.__dict__.get('parent_id'))
+        return instance
+
+    def _hash_changed(self):
+        # whether the hashed fields of the edition or of its piece differ from the stored ones
+        if getattr(self, '_hashed_values', None) != (self.bitcoin_path, self.parent_id):
+            return True
+        return self.parent._hash_changed()
+
+    def save(self, *args, **kwargs):
+        # keep the indexed bitcoin id in sync for the lookups, bulk_create callers set it themselves
+        self.bitcoin_address = util.remove_btc_prefix(self.bitcoin_path) if self.bitcoin_path else None
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            # never write back the latest ownerships or the digests of a stale instance
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key
+                                       and field.name not in Edition.LATEST_OWNERSHIP_FIELDS.values()
+                                       and field.name not in Edition.HASH_ADDRESS_FIELDS]
+            if getattr(self, '_hashed_values', None) != (self.bitcoin_path, self.parent_id):
+                self.hash_address = self.hash_address_no_metadata = None
+                kwargs['update_fields'] += Edition.HASH_ADDRESS_FIELDS
+        super(Edition, self).save(*args, **kwargs)
+        self._hashed_values = (self.bitcoin_path, self.parent_id)
+
+    @staticmethod
+    def refresh_latest_ownership(edition_id, ownership_type):
+        """
+        Stores the latest ownership of the given type on the edition and returns it.
+        Called by Ownership.save and Ownership.delete within their transaction.
+        """
+        with transaction.atomic():
+            # lock the edition first so that concurrent writers see each other's ownerships
+            list(Edition.objects.select_for_update().filter(pk=edition_id).values_list('pk'))
+            latest = Edition.latest_ownership(edition_id, ownership_type)
+            Edition.objects.filter(pk=edition_id).update(**{Edition.LATEST_OWNERSHIP_FIELDS[ownership_type]: latest})
+        return latest
+
+    @staticmethod
+    def latest_ownership(edition_id, ownership_type):
+        if ownership_type == OwnershipTransfer.__name__:
+            # TODO: do we need the exclude? A: yes for btc_owner_address, but might miss some transfers
+            ownerships = OwnershipTransfer.objects.filter(edition_id=edition_id).exclude(btc_tx=None)
+        elif ownership_type == Consignment.__name__:
+            ownerships = Consignment.objects.filter(edition_id=edition_id).exclude(status=0)
+        else:
+            ownerships = Loan.objects.filter(edition_id=edition_id).exclude(status=0)
+        return ownerships.order_by('-datetime', '-id').first()
+
     @property
     def btc_owner_address(self):
         t = self._most_recent_transfer
@@ -269,51 +395,83 @@ class Edition(models.Model):
     def btc_owner_address_noprefix(self):
         return util.remove_btc_prefix(self.btc_owner_address)
 
-    @property
-    def ownership_history(self):
-        """@return -- list of (date, action_str)"""
-        history = []
-        history.append((self.datetime_registered.strftime('%b. %d, %Y, %X'),
-                  u"Registered by {}".format(self.user_registered)))
-        transfers = OwnershipTransfer.objects.filter(edition=self, datetime_deleted=None).order_by("datetime")
+    @staticmethod
+    def history_cache_key(edition_id):
+        return 'edition_history:{}'.format(edition_id)
 
-        for t in transfers:
-            history.append((t.datetime.strftime('%b. %d, %Y, %X'),
-                      u'Transferred to {}'.format(t.new_owner.username)))
+    @staticmethod
+    def invalidate_history(edition_id):
+        caches[settings.HISTORY_CACHE].delete(Edition.history_cache_key(edition_id))
 
-        try:
-            UserNeedsToRegisterRole.objects.get(user=transfers.last().new_owner, type="UserNeedsToRegisterRole")
-        except (UserNeedsToRegisterRole.DoesNotExist, AttributeError):
-            # If the user is either fully registered or there are no
-            # transfers for the edition yet, we just return the
-            # registration action as the only element of the history
-            pass
-        else:
-            date, action_str = history[-1]
-            history[-1] = (date, ''.join([action_str, ' (pending)']))
+    @property
+    def history(self):
+        """
+        The rendered ownership, consignment and loan histories of the edition.
+        Cached until an ownership of the edition is written, see Ownership.save and Ownership.delete.
+        """
+        cache = caches[settings.HISTORY_CACHE]
+        key = Edition.history_cache_key(self.id)
+        history = cache.get(key)
+        if history is None:
+            history = self._render_history()
+            cache.set(key, history)
         return history
 
-    @property
-    def consign_history(self):
-        """@return -- list of (date, action_str)"""
-        h = []
-        consigns = Consignment.objects.filter(edition=self).exclude(status=0)
-        unconsigns = UnConsignment.objects.filter(edition=self).exclude(status=0)
+    def _render_history(self):
+        transfers = list(OwnershipTransfer.objects.filter(edition=self, datetime_deleted=None)
+                         .select_related('new_owner').order_by("datetime"))
+        ownership_history = [(self.datetime_registered.strftime('%b. %d, %Y, %X'),
+                              u"Registered by {}".format(self.user_registered))]
+        for t in transfers:
+            ownership_history.append((t.datetime.strftime('%b. %d, %Y, %X'),
+                                      u'Transferred to {}'.format(t.new_owner.username)))
+
+        consign_history = []
+        consigns = Consignment.objects.filter(edition=self).exclude(status=0).select_related('new_owner')
+        unconsigns = UnConsignment.objects.filter(edition=self).exclude(status=0).select_related('new_owner')
         result_list = sorted(
             chain(consigns, unconsigns),
             key=attrgetter('datetime'))
         for c in result_list:
             pending = "(pending)" if c.status is None else ""
             type = "Consigned" if c.type == "Consignment" else "Unconsigned"
-            h.append((c.datetime.strftime('%b. %d, %Y, %X'),
-                      u"{} to {} {}".format(type, c.new_owner.username, pending)))
-        return h
+            consign_history.append((c.datetime.strftime('%b. %d, %Y, %X'),
+                                    u"{} to {} {}".format(type, c.new_owner.username, pending)))
+
+        loans = [l for l in Loan.objects.filter(edition=self).select_related('new_owner').order_by("datetime")
+                 if l.status != 0]
+        return {
+            'ownership_history': ownership_history,
+            # whether the last transferee still has to register is checked on every read
+            'last_transferee_id': transfers[-1].new_owner_id if transfers else None,
+            'consign_history': consign_history,
+            'loan_history': Piece.render_loan_history(loans),
+            'pending_loan': any(l.status is None for l in loans),
+        }
+
+    @property
+    def ownership_history(self):
+        """@return -- list of (date, action_str)"""
+        history = self.history
+        ownership_history = list(history['ownership_history'])
+        # If the user is either fully registered or there are no
+        # transfers for the edition yet, the history is returned as is
+        if history['last_transferee_id'] is not None and \
+                UserNeedsToRegisterRole.objects.filter(user_id=history['last_transferee_id'],
+                                                       type="UserNeedsToRegisterRole").exists():
+            date, action_str = ownership_history[-1]
+            ownership_history[-1] = (date, ''.join([action_str, ' (pending)']))
+        return ownership_history
+
+    @property
+    def consign_history(self):
+        """@return -- list of (date, action_str)"""
+        return self.history['consign_history']
 
     @property
     def loan_history(self):
         """@return -- list of (date, action_str)"""
-        loans = [l for l in Loan.objects.filter(edition=self).order_by("datetime") if l.status != 0]
-        return Piece.render_loan_history(loans)
+        return self.history['loan_history']
 
     @property
     def shared_users(self):
@@ -335,7 +493,7 @@ class Edition(models.Model):
             status += ["pending_consign"]
         if self.consign_status == settings.PENDING_UNCONSIGN:
             status += ["pending_unconsign"]
-        if self.loans(status=None):
+        if self.history['pending_loan']:
             status += ["pending_loan"]
         return status
 
@@ -355,24 +513,15 @@ class Edition(models.Model):
     def _most_recent_transfer(self):
         # could also calculate this via the chain of bitcoin addresses
         # (and that could be done independently of the DB, using the blockchain)
-        # TODO: do we need the exclude? A: yes for btc_owner_address, but might miss some transfers
-        transfers = OwnershipTransfer.objects.filter(edition=self).exclude(btc_tx=None).order_by("datetime")
-        n_transfers = len(transfers)
-        if n_transfers > 0:
-            return transfers[n_transfers - 1]
-        else:
-            return None
+        return self.latest_transfer
 
     @property
     def _most_recent_consignment(self):
-        # could also calculate this via the chain of bitcoin addresses
-        # (and that could be done independently of the DB, using the blockchain)
-        consignments = Consignment.objects.filter(edition=self).exclude(status=0).order_by("datetime")
-        n_consignments = len(consignments)
-        if n_consignments > 0:
-            return consignments[n_consignments - 1]
-        else:
-            return None
+        return self.latest_consignment
+
+    @property
+    def _most_recent_loan(self):
+        return self.latest_loan
 
     def acl(self, user):
         return ActionControl.objects.get(user=user, edition=self)
@@ -406,20 +555,30 @@ class Edition(models.Model):
          transaction to register > 1 pieces, all with the same hash.
         """
         assert 'placeholder' not in self.bitcoin_path
-        data = str([
-            unicode(self.title),
-            unicode(self.artist_name),
-            unicode(self.date_created),
-            unicode(self.num_editions),
-            unicode(self.bitcoin_path),
-            unicode(self.digital_work.hash),
-        ])
-        address = unicode(pybitcointools.bin_to_b58check(pybitcointools.bin_hash160(data)))
-        return address
+        if self.hash_address is None:
+            data = str([
+                unicode(self.title),
+                unicode(self.artist_name),
+                unicode(self.date_created),
+                unicode(self.num_editions),
+                unicode(self.bitcoin_path),
+                unicode(self.digital_work.hash),
+            ])
+            address = unicode(pybitcointools.bin_to_b58check(pybitcointools.bin_hash160(data)))
+            self._store_hash_address('hash_address', address)
+        return self.hash_address
 
     def hash_as_address_no_metada(self):
-        address = unicode(pybitcointools.bin_to_b58check(pybitcointools.bin_hash160(self.digital_work.hash)))
-        return address
+        if self.hash_address_no_metadata is None:
+            address = unicode(pybitcointools.bin_to_b58check(pybitcointools.bin_hash160(self.digital_work.hash)))
+            self._store_hash_address('hash_address_no_metadata', address)
+        return self.hash_address_no_metadata
+
+    def _store_hash_address(self, field, address):
+        setattr(self, field, address)
+        # only persist the digests of saved values and of an uploaded digital work
+        if self.pk is not None and not self._hash_changed() and self.digital_work.digital_work_hash:
+            Edition.objects.filter(pk=self.pk).update(**{field: address})
 
     def loans(self, user=None, status=-1):
         # status ==-1 to skip because status None has a meaning
@@ -502,7 +661,8 @@ class PieceFactory(object):
         if param['num_editions'] and param['num_editions'] > 0:
             register_editions(rootPiece, rootPiece.user_registered, param['num_editions']).delay()
 
-        if rootPiece.digital_work.mime == 'video':
+        # an ingested video is encoded by the job once it is uploaded
+        if rootPiece.digital_work.mime == 'video' and not rootPiece.digital_work.is_ingested:
             zencoder_api.encode(user, rootPiece.digital_work)
 
         return rootPiece
@@ -539,7 +699,7 @@ class PieceFactory(object):
 def editableSiblingEditionsFromID(user, bitcoin_id):
     # all editions
     try:
-        edition = Edition.objects.get(owner=user, bitcoin_id=bitcoin_id)
+        edition = Edition.objects.get(owner=user, bitcoin_address=bitcoin_id)
         if edition and edition.canEdit(user):
             return edition.siblings
     except ObjectDoesNotExist as e:
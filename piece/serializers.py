@@ -3,12 +3,14 @@ import operator
 
 from django.core.exceptions import ObjectDoesNotExist
 from django.conf import settings
+from django.db import models
 from django.db.models import Q
 from django.utils import timezone
 from django.utils.datetime_safe import datetime
 
 from rest_framework import serializers
 
+from acl.models import ActionControl
 from blobs.serializers import DigitalWorkSerializer, FileSerializer, ThumbnailSerializer
 from blobs.models import Thumbnail
 from notifications.models import EditionNotification, PieceNotification
@@ -107,6 +109,10 @@ class BasicPieceSerializer(MinimalPieceSerializer):
             from acl.serializers import ActionControlSerializer
 
             request = self.context.get('request', None)
+            acls = self.context.get('acls', None)
+            if acls is not None:
+                # loaded for the whole page by BasicPieceListSerializer
+                return ActionControlSerializer(acls[obj.id]).data
             return ActionControlSerializer(obj.acl(request.user)).data
         except Exception as e:
             return {'acl_view_editions': True}
@@ -117,22 +123,50 @@ class BasicPieceSerializer(MinimalPieceSerializer):
                   'license_type', 'acl')
 
 
+class BasicPieceListSerializer(serializers.ListSerializer):
+    """
+    Loads the acls and first editions of all the pieces of a page up front,
+    so that listing pieces costs a constant number of queries.
+    The thumbnails, licenses and registrees are expected to be joined
+    in the queryset (see PieceEndpoint.get_list_queryset).
+    """
+
+    def to_representation(self, data):
+        pieces = list(data.all() if isinstance(data, models.Manager) else data)
+        request = self.context.get('request', None)
+        if request is not None and request.user.is_authenticated():
+            self.load_page([piece.id for piece in pieces], request)
+        return super(BasicPieceListSerializer, self).to_representation(pieces)
+
+    def load_page(self, ids, request):
+        """
+        Puts what the pieces with the given ids need in the context.
+        """
+        self.load_acls(ids, request)
+        self.context['first_editions'] = Piece.first_editions(ids, request.user,
+                                                              acl_query_params(request))
+
+    def load_acls(self, ids, request):
+        self.context['acls'] = {acl.piece_id: acl for acl in
+                                ActionControl.objects.filter(user=request.user, piece_id__in=ids, edition=None)}
+
+
 class BasicPieceSerializerWithFirstEdition(BasicPieceSerializer):
     first_edition = serializers.SerializerMethodField()
 
     def get_first_edition(self, obj):
-        # filter for queryParams that contain 'acl_' in their key
-        acl_query_params = {key: value for (key, value)
-                            in self.context["request"].query_params.iteritems()
-                            if 'acl_' in key}
+        first_editions = self.context.get('first_editions', None)
+        if first_editions is not None:
+            return first_editions.get(obj.id)
         try:
-            return obj.first_edition(self.context["request"].user, acl_query_params)
+            return obj.first_edition(self.context["request"].user, acl_query_params(self.context["request"]))
         except TypeError as e:
             return None
 
     class Meta(BasicPieceSerializer.Meta):
         fields = BasicPieceSerializer.Meta.fields + \
                  ('first_edition',)
+        list_serializer_class = BasicPieceListSerializer
 
 
 class PieceSerializer(BasicPieceSerializer):
@@ -242,9 +276,16 @@ class EditionRegister(serializers.Serializer):
         return value
 
 
+def acl_query_params(request):
+    # filter for queryParams that contain 'acl_' in their key
+    return {key: value for (key, value)
+            in request.query_params.iteritems()
+            if 'acl_' in key}
+
+
 def get_edition_or_raise_error(bitcoin_id):
     try:
-        return Edition.objects.get(bitcoin_path__contains=bitcoin_id, datetime_deleted=None)
+        return Edition.objects.get(bitcoin_address=bitcoin_id, datetime_deleted=None)
     except Edition.DoesNotExist:
         raise serializers.ValidationError('Edition with ID {} not found'.format(bitcoin_id))
 
@@ -256,15 +297,12 @@ def get_editions_or_raise_errors(bitcoin_ids):
     """
     bitcoin_ids = bitcoin_ids.split(',')
 
-    # Source: http://stackoverflow.com/a/4824810/1263876
-    editions_query = reduce(operator.or_, (Q(bitcoin_path__contains=bitcoin_id) & Q(datetime_deleted=None)
-                                           for bitcoin_id in bitcoin_ids))
-    editions = Edition.objects.filter(editions_query)
+    editions = Edition.objects.filter(bitcoin_address__in=bitcoin_ids, datetime_deleted=None)
 
     editions_missing = set(bitcoin_ids) - set(edition.bitcoin_id for edition in editions)
     try:
         missing_edition = editions_missing.pop()
-        raise serializers.ValidationError('Edition with ID {} not found'.format(missing_edition.bitcoin_id))
+        raise serializers.ValidationError('Edition with ID {} not found'.format(missing_edition))
     except KeyError:
         pass
     return editions
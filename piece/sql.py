@@ -0,0 +1,107 @@
+from django.db import connection
+
+from acl.models import ActionControlFieldsMixin
+
+
+ACL_FIELDS = [field.name for field in ActionControlFieldsMixin._meta.fields]
+
+
+def get_first_editions(piece_ids, user_id, acl_filter):
+    """
+    Aggregates the editions of the given pieces that are visible to the user:
+    returns one (piece id, first edition number, bitcoin id of the first edition,
+    number of editions available) row per piece with at least one edition.
+    The acl filter takes the same keys as ActionControl.get_items_for_user,
+    unknown keys are ignored.
+    """
+    SQL = """
+        SELECT
+            piece_edition.parent_id,
+            min(piece_edition.edition_number),
+            (array_agg(piece_edition.bitcoin_address ORDER BY piece_edition.edition_number))[1],
+            count(DISTINCT piece_edition.id)
+
+        FROM
+            piece_edition
+            INNER JOIN acl_actioncontrol
+                ON (piece_edition.id = acl_actioncontrol.edition_id)
+
+        WHERE
+            piece_edition.parent_id IN %s
+            AND piece_edition.datetime_deleted IS NULL
+            AND acl_actioncontrol.user_id = %s
+            {acl_filter}
+
+        GROUP BY
+            piece_edition.parent_id
+    """
+    if not piece_ids:
+        return []
+
+    # extend optional acl with default view filter, as get_items_for_user does
+    acl_filter = dict({'acl_view': True}, **acl_filter)
+    acl_filter = {k: ActionControlFieldsMixin._meta.get_field(k).to_python(v)
+                  for k, v in acl_filter.iteritems() if k in ACL_FIELDS}
+    acl_sql = ''.join('AND acl_actioncontrol.{} = %s\n'.format(k) for k in acl_filter)
+
+    cursor = connection.cursor()
+    cursor.execute(SQL.format(acl_filter=acl_sql), [tuple(piece_ids), user_id] + acl_filter.values())
+    l = cursor.fetchall()
+    cursor.close()
+    return l
+
+
+# the ownerships that count as the latest of their type, see Edition.latest_ownership
+LATEST_OWNERSHIP_CONDITIONS = {
+    'OwnershipTransfer': 'ownership_ownership.btc_tx_id IS NOT NULL',
+    'Consignment': 'ownership_ownership.status IS DISTINCT FROM 0',
+    'Loan': 'ownership_ownership.status IS DISTINCT FROM 0',
+}
+
+
+def get_stale_latest_ownerships(column, ownership_type):
+    """
+    Compares the latest ownership of the given type stored on the editions in `column`
+    with the one computed from the ownerships: returns the (edition id, stored id, latest id)
+    rows that differ.
+    """
+    SQL = """
+        WITH latest AS (
+            SELECT DISTINCT ON (ownership_ownership.edition_id)
+                ownership_ownership.id,
+                ownership_ownership.edition_id
+
+            FROM
+                ownership_ownership
+
+            WHERE
+                ownership_ownership.edition_id IS NOT NULL
+                AND ownership_ownership.type = %s
+                AND {condition}
+
+            ORDER BY
+                ownership_ownership.edition_id,
+                ownership_ownership.datetime DESC,
+                ownership_ownership.id DESC
+        )
+
+        SELECT
+            piece_edition.id,
+            piece_edition.{column},
+            latest.id
+
+        FROM
+            piece_edition
+            LEFT OUTER JOIN latest
+                ON (piece_edition.id = latest.edition_id)
+
+        WHERE
+            piece_edition.{column} IS DISTINCT FROM latest.id
+    """
+
+    cursor = connection.cursor()
+    cursor.execute(SQL.format(column=column, condition=LATEST_OWNERSHIP_CONDITIONS[ownership_type]),
+                   [ownership_type])
+    l = cursor.fetchall()
+    cursor.close()
+    return l
@@ -2,19 +2,25 @@ from __future__ import absolute_import
 
 import logging
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from celery import chain, group
+from celery import chain
 
 from util.celery import app
+from util.models import JobMonitor
 from bitcoin.models import BitcoinWallet
-from bitcoin.tasks import import_address
+from bitcoin.tasks import import_address_batch
 from ownership.models import OwnershipEditions
 from piece.signals import editions_bulk_create
 from piece.models import Edition, Piece, PieceFactory
+from util import util
 
 
 logger = logging.getLogger('tasks')
 
+# number of addresses derived between two progress updates of the JobMonitor
+EDITIONS_PROGRESS_STEP = 100
+
 
 @app.task(bind=True)
 def handle_edition_creation_error(self, uuid):
@@ -26,28 +32,27 @@ def handle_edition_creation_error(self, uuid):
 def register_editions(root_piece, user, num_editions):
     root_piece.num_editions = num_editions
     root_piece.save()
+
+    # The progress of the edition creation can be followed through the JobMonitor
+    job = JobMonitor(description=settings.JOB_CREATE_EDITIONS,
+                     object_id=root_piece.id,
+                     percent_done=0,
+                     user=user)
+    job.save()
+
     # To keep compatibility with the old edition creation, we first
     # set the number of editions to 0 for the piece.
     return chain(init_edition_creation.si(root_piece.id),
-                 # In this group, we then create each edition
-                 # individually and return the actual edition
-                 # object back to the group.
-                 group(
-                     chain(
-                         # To create an edition, we first generate a
-                         # blockchain address and pass it in a callback
-                         create_address.si(user.id),
-                         # to import_address to import it into the blockchain
-                         # daemon.
-                         import_address.s(user.email),
-                         init_edition.s(root_piece.id, edition_number + 1, user.id)
-                     )
-                     for edition_number in range(num_editions)
-                 ),
-                 # Once the group finishes, all editions created are passed
-                 # to finish_edition_creation to bulk_save them into the
+                 # We then derive the blockchain addresses of all editions
+                 # in one pass and return the edition objects.
+                 init_editions.si(root_piece.id, user.id, num_editions, job.id),
+                 # All editions created are passed to
+                 # bulk_create_and_freeze_editions to bulk_save them into the
                  # database.
-                 bulk_create_and_freeze_editions.s(root_piece.id, user.id))
+                 bulk_create_and_freeze_editions.s(root_piece.id, user.id, job.id),
+                 # The addresses of the editions are finally imported into the
+                 # blockchain daemon with a single task.
+                 import_edition_addresses.s(user.id, job.id))
 
 
 @app.task(ignore_result=True)
@@ -61,21 +66,24 @@ def init_edition_creation(piece_id):
 
 
 @app.task(ignore_result=False)
-def create_address(user_id):
+def init_editions(piece_id, user_id, num_editions, job_id=None):
+    root_piece = Piece.objects.get(pk=piece_id)
     user = get_user_model().objects.get(pk=user_id)
-    return BitcoinWallet.walletForUser(user).create_new_address()
+    wallet = BitcoinWallet.walletForUser(user)
 
+    addresses = []
+    while len(addresses) < num_editions:
+        addresses += wallet.create_new_addresses(min(EDITIONS_PROGRESS_STEP, num_editions - len(addresses)))
+        if job_id is not None:
+            # deriving the addresses is the bulk of the work, the database insert is the last 10%
+            JobMonitor.objects.filter(id=job_id).update(percent_done=90 * len(addresses) / num_editions)
 
-@app.task(ignore_result=False)
-def init_edition(address, piece_id, edition_number, user_id):
-    root_piece = Piece.objects.get(pk=piece_id)
-    user = get_user_model().objects.get(pk=user_id)
-    address = BitcoinWallet.walletForUser(user).create_new_address()
-    return Edition(parent=root_piece, edition_number=edition_number, bitcoin_path=address, owner=user)
+    return [Edition(parent=root_piece, edition_number=edition_number + 1, bitcoin_path=address, owner=user)
+            for edition_number, address in enumerate(addresses)]
 
 
 @app.task(ignore_result=False)
-def bulk_create_and_freeze_editions(editions, piece_id, user_id):
+def bulk_create_and_freeze_editions(editions, piece_id, user_id, job_id=None):
     root_piece = Piece.objects.get(pk=piece_id)
     user = get_user_model().objects.get(pk=user_id)
 
@@ -87,6 +95,9 @@ def bulk_create_and_freeze_editions(editions, piece_id, user_id):
     # Depending on how many editions we're creating, bulk_create could potentially be blocking.
     # As we're not delivering the editions to the user right away anyways, we can put this in
     # a task to not block other users of our service.
+    # bulk_create bypasses Edition.save, which fills in the indexed bitcoin address
+    for edition in editions:
+        edition.bitcoin_address = util.remove_btc_prefix(edition.bitcoin_path)
     Edition.objects.bulk_create(editions)
     # As Django's bulk_create doesn't trigger a post_save signal, we trigger it here
     # manually to trigger setting the ACLs of the editions
@@ -103,5 +114,27 @@ def bulk_create_and_freeze_editions(editions, piece_id, user_id):
     ownership_editions = OwnershipEditions.create(edition=root_piece, new_owner=user)
     ownership_editions.save()
 
+    if job_id is not None:
+        JobMonitor.objects.filter(id=job_id).update(percent_done=95)
+
     logger.info('created {} editions in db'.format(num_editions))
     return editions
+
+
+@app.task(bind=True, ignore_result=False, max_retries=5, default_retry_delay=100)
+def import_edition_addresses(self, editions, user_id, job_id=None):
+    user = get_user_model().objects.get(pk=user_id)
+
+    # Runs the import in this task, so that a failure stops the chain before the
+    # JobMonitor reports the edition creation as done.
+    try:
+        import_address_batch([edition.bitcoin_path for edition in editions], user.email)
+    except Exception as e:
+        logger.warning('Could not import the addresses of {} editions: {}'.format(len(editions), e))
+        raise self.retry(exc=e)
+
+    if job_id is not None:
+        JobMonitor.objects.filter(id=job_id).update(percent_done=100)
+
+    logger.info('imported the addresses of {} editions'.format(len(editions)))
+    return editions
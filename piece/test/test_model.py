@@ -209,7 +209,9 @@ def test_register_editions(registered_piece_alice):
     from bitcoin.bitcoin_service import BitcoinService
     from bitcoin.models import BitcoinTransaction, BitcoinWallet, TX_PENDING
     from ownership.models import OwnershipEditions
+    from django.conf import settings
     from acl.models import ActionControl
+    from util.models import JobMonitor
     from ..models import Edition
     from ..tasks import register_editions
 
@@ -235,6 +237,11 @@ def test_register_editions(registered_piece_alice):
     assert piece_alice.num_editions == num_editions
     assert len(editions) == num_editions
 
+    # The progress of the edition creation is reported in the JobMonitor
+    job = JobMonitor.objects.get(object_id=piece_alice.id,
+                                 description=settings.JOB_CREATE_EDITIONS)
+    assert job.percent_done == 100
+
     # We test if the ACLs for the respective user
     # and their editions have been set appropriately
     acls = ActionControl.objects.filter(
@@ -273,6 +280,27 @@ def test_register_editions(registered_piece_alice):
     assert btc_tx.status == TX_PENDING
 
 
+@pytest.mark.usefixtures('license',
+                         'djroot_bitcoin_wallet',
+                         'alice_bitcoin_wallet')
+def test_register_editions_fails_when_the_addresses_are_not_imported(registered_piece_alice, monkeypatch):
+    from django.conf import settings
+    from util.models import JobMonitor
+    from ..tasks import register_editions
+
+    def import_address_batch(addresses, account):
+        raise IOError('the bitcoin daemon is down')
+    monkeypatch.setattr('piece.tasks.import_address_batch', import_address_batch)
+    piece_alice = registered_piece_alice
+
+    editions_tasks = register_editions(piece_alice, piece_alice.user_registered, 1).delay()
+
+    assert editions_tasks.failed()
+    job = JobMonitor.objects.get(object_id=piece_alice.id,
+                                 description=settings.JOB_CREATE_EDITIONS)
+    assert job.percent_done < 100
+
+
 @pytest.mark.usefixtures('djroot_user')
 def test_empty_ownership_history(registered_edition_alice):
     ownership_history = registered_edition_alice.ownership_history
@@ -327,3 +355,124 @@ def test_pending_state_in_ownership_history(alice,
 
     assert '(pending)' not in transfer_bob_str
     assert '(pending)' in transfer_invited_dan_str
+
+
+@pytest.mark.usefixtures('djroot_user')
+def test_first_editions(registered_edition_alice, bob, django_assert_num_queries):
+    piece = registered_edition_alice.parent
+    alice = registered_edition_alice.owner
+    with django_assert_num_queries(1):
+        first_editions = Piece.first_editions([piece.id], alice, {})
+    assert first_editions == {piece.id: {'bitcoin_id': registered_edition_alice.bitcoin_id,
+                                         'edition_number': 1,
+                                         'num_editions_available': 1}}
+    assert piece.first_edition(alice, {}) == first_editions[piece.id]
+    # the acl filters come as query params
+    assert Piece.first_editions([piece.id], alice, {'acl_transfer': 'true'}) == first_editions
+    assert Piece.first_editions([piece.id], alice, {'acl_transfer': 'false'}) == {}
+    assert Piece.first_editions([piece.id], bob, {}) == {}
+    assert Piece.first_editions([], alice, {}) == {}
+
+
+@pytest.mark.usefixtures('djroot_user')
+def test_latest_ownerships(registered_edition_alice, alice, bob):
+    from django.core.management import call_command
+    from django.utils.six import StringIO
+    from bitcoin.models import BitcoinTransaction
+    from ownership.models import Consignment, OwnershipTransfer
+    from ..models import Edition
+
+    edition = registered_edition_alice
+    transfer = OwnershipTransfer.create(edition=edition, transferee=bob, prev_owner=alice)
+    transfer.save()
+    # only the transfers with a bitcoin transaction count
+    assert edition._most_recent_transfer is None
+    transfer.btc_tx = BitcoinTransaction.objects.create(user=alice, from_address=edition.bitcoin_path)
+    transfer.save()
+    assert edition._most_recent_transfer == transfer
+    assert Edition.objects.get(pk=edition.pk)._most_recent_transfer == transfer
+
+    consignment = Consignment.create(edition=edition, consignee=alice, owner=bob)
+    consignment.save()
+    assert Edition.objects.get(pk=edition.pk)._most_recent_consignment == consignment
+    # a denied consignment is not the latest anymore
+    consignment.status = 0
+    consignment.save()
+    assert Edition.objects.get(pk=edition.pk)._most_recent_consignment is None
+
+    # saving a stale edition does not overwrite the latest ownerships
+    stale = Edition.objects.get(pk=edition.pk)
+    transfer.delete()
+    stale.save()
+    assert Edition.objects.get(pk=edition.pk)._most_recent_transfer is None
+
+    Edition.objects.filter(pk=edition.pk).update(latest_consignment=consignment)
+    out = StringIO()
+    call_command('check_edition_ownerships', stdout=out)
+    assert 'latest_consignment: 1 stale editions' in out.getvalue()
+    assert 'latest_transfer: 0 stale editions' in out.getvalue()
+    call_command('check_edition_ownerships', fix=True, stdout=out)
+    assert Edition.objects.get(pk=edition.pk).latest_consignment is None
+
+
+def test_history_is_cached_until_an_ownership_is_written(registered_edition_alice, alice, bob,
+                                                        django_assert_num_queries):
+    from ownership.models import Consignment, OwnershipTransfer
+    from users.models import UserNeedsToRegisterRole
+    from ..models import Edition
+
+    edition = Edition.objects.get(pk=registered_edition_alice.pk)
+    assert len(edition.ownership_history) == 1
+    with django_assert_num_queries(0):
+        assert edition.consign_history == []
+        assert edition.loan_history == []
+
+    transfer = OwnershipTransfer.create(edition=edition, transferee=bob, prev_owner=alice)
+    transfer.save()
+    history = edition.ownership_history
+    assert history[-1][1] == u'Transferred to {}'.format(bob.username)
+    # only the registration of the last transferee is checked on a cached read
+    UserNeedsToRegisterRole.create(user=bob, role=None).save()
+    with django_assert_num_queries(1):
+        assert edition.ownership_history[-1][1] == u'Transferred to {} (pending)'.format(bob.username)
+
+    consignment = Consignment.create(edition=edition, consignee=alice, owner=bob)
+    consignment.save()
+    assert len(edition.consign_history) == 1
+    consignment.status = 0
+    consignment.save()
+    assert edition.consign_history == []
+
+    transfer.delete()
+    assert len(edition.ownership_history) == 1
+
+
+def test_hash_as_address_is_stored_until_a_hashed_field_changes(registered_edition_alice,
+                                                                django_assert_num_queries):
+    from ..models import Edition, Piece
+
+    edition = Edition.objects.get(pk=registered_edition_alice.pk)
+    address = edition.hash_as_address()
+    address_no_metadata = edition.hash_as_address_no_metada()
+    piece_address = edition.parent.hash_as_address()
+
+    edition = Edition.objects.select_related('parent').get(pk=edition.pk)
+    with django_assert_num_queries(0):
+        assert edition.hash_as_address() == address
+        assert edition.hash_as_address_no_metada() == address_no_metadata
+        assert edition.parent.hash_as_address() == piece_address
+
+    # editing the extra data keeps the digests
+    piece = Piece.objects.get(pk=edition.parent_id)
+    piece.extra_data = {'medium': 'oil'}
+    piece.save()
+    assert Piece.objects.get(pk=piece.pk).hash_address == piece_address
+
+    # editing the title drops the digests of the piece and its editions
+    piece.title = 'wonderbob'
+    piece.save()
+    edition = Edition.objects.get(pk=edition.pk)
+    assert edition.hash_address is None
+    assert edition.hash_as_address() != address
+    assert edition.hash_as_address_no_metada() == address_no_metadata
+    assert Piece.objects.get(pk=piece.pk).hash_as_address() != piece_address
@@ -48,6 +48,90 @@ def test_list_one(registered_piece_alice):
     assert 'license_type' in piece_data
 
 
+@pytest.mark.usefixtures('license',
+                         'djroot_bitcoin_wallet',
+                         'alice_bitcoin_wallet')
+def test_list_query_count_does_not_grow_with_the_page(alice, digital_work_alice, thumbnail_alice):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from ..api import PieceEndpoint
+    from .util import APIUtilPiece
+    view = PieceEndpoint.as_view({'get': 'list'})
+    url = reverse('api:piece-list')
+
+    def list_pieces():
+        request = APIRequestFactory().get(url)
+        force_authenticate(request, alice)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+        assert response.status_code == status.HTTP_200_OK
+        return response.data['pieces'], len(queries)
+
+    APIUtilPiece.create_piece(alice, digital_work_alice, thumbnail_alice, num_editions=2)
+    pieces, num_queries = list_pieces()
+    assert len(pieces) == 1
+
+    for i in range(3):
+        APIUtilPiece.create_piece(alice, digital_work_alice, thumbnail_alice,
+                                  title='title{}'.format(i), num_editions=i)
+    pieces, num_queries_page = list_pieces()
+    assert len(pieces) == 4
+    assert num_queries_page == num_queries
+
+    first_editions = {piece['title']: piece['first_edition'] for piece in pieces}
+    assert first_editions['title0'] is None
+    assert first_editions['title1']['edition_number'] == 1
+    assert first_editions['title1']['num_editions_available'] == 1
+    assert first_editions['title']['num_editions_available'] == 2
+    assert all(piece['acl']['acl_view'] for piece in pieces)
+
+
+@pytest.mark.usefixtures('license',
+                         'djroot_bitcoin_wallet',
+                         'alice_bitcoin_wallet')
+def test_list_with_cursor(alice, digital_work_alice, thumbnail_alice):
+    from urlparse import parse_qs, urlparse
+    from ..api import PieceEndpoint
+    from .util import APIUtilPiece
+    view = PieceEndpoint.as_view({'get': 'list'})
+    url = reverse('api:piece-list')
+
+    def list_pieces(**params):
+        request = APIRequestFactory().get(url, dict(params, page_size=2))
+        force_authenticate(request, alice)
+        response = view(request)
+        assert response.status_code == status.HTTP_200_OK
+        return response.data
+
+    def cursor(link):
+        return parse_qs(urlparse(link).query, keep_blank_values=True)['cursor'][0]
+
+    # same artist name for all, the pk breaks the ties
+    for title in ('a', 'b', 'c'):
+        APIUtilPiece.create_piece(alice, digital_work_alice, thumbnail_alice, title=title, num_editions=0)
+
+    first_page = list_pieces(cursor='', ordering='artist_name')
+    assert first_page['count'] == 3
+    assert first_page['unfiltered_count'] == 3
+    assert first_page['previous'] is None
+    assert [piece['title'] for piece in first_page['pieces']] == ['a', 'b']
+
+    second_page = list_pieces(cursor=cursor(first_page['next']), ordering='artist_name')
+    assert [piece['title'] for piece in second_page['pieces']] == ['c']
+    assert second_page['next'] is None
+
+    previous_page = list_pieces(cursor=cursor(second_page['previous']), ordering='artist_name')
+    assert previous_page['pieces'] == first_page['pieces']
+
+    descending = list_pieces(cursor='', ordering='-title', count='false')
+    assert descending['count'] is None
+    assert descending['unfiltered_count'] is None
+    assert [piece['title'] for piece in descending['pieces']] == ['c', 'b']
+
+    response = view(APIRequestFactory().get(url, {'cursor': 'invalid'}))
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
 @pytest.mark.parametrize('pk_attr', ('pk', 'bitcoin_id'))
 def test_retrieve_for_owner(registered_piece_alice, pk_attr):
     from ..api import PieceEndpoint
@@ -110,7 +194,7 @@ def test_create(digital_work_alice, num_editions, thumbnail, monkeypatch):
     from ..api import PieceEndpoint
     from ..models import Piece
     monkeypatch.setattr(
-        'blobs.models.DigitalWork.create_thumbnail', lambda s: thumbnail)
+        'blobs.models.DigitalWork.create_thumbnail', lambda s, url=None: thumbnail)
     alice = digital_work_alice.user
     title, artist_name, date_created = 'green', 'alice', 2000
     data = {
@@ -183,6 +267,49 @@ def test_create_with_thumbnail(digital_work_alice, thumbnail_alice):
     assert piece.thumbnail.pk == thumbnail_alice.pk
 
 
+@pytest.mark.usefixtures('license',
+                         'djroot_bitcoin_wallet',
+                         'alice_bitcoin_wallet')
+def test_create_from_url_registers_the_hash_of_the_upload(alice, oauth_application_token, thumbnail,
+                                                         s3_bucket, monkeypatch):
+    import hashlib
+    import pybitcointools
+    from blobs.tasks import ingest_digital_work
+    from ownership.models import OwnershipPiece
+    from s3.test.mocks import Response
+    from ..api import PieceEndpoint
+    content = b'digital work'
+    monkeypatch.setattr('s3.aws.urllib2.urlopen', lambda url: Response(content))
+    monkeypatch.setattr(
+        'blobs.models.DigitalWork.create_thumbnail', lambda s, url=None: thumbnail)
+    # the upload runs after the request
+    ingests = []
+    monkeypatch.setattr(ingest_digital_work, 'delay', lambda *args: ingests.append(args))
+    data = {
+        'title': 'green',
+        'artist_name': 'alice',
+        'date_created': 2000,
+        'file_url': 'http://example.com/work.gif',
+    }
+    view = PieceEndpoint.as_view({'post': 'create'})
+    factory = APIRequestFactory()
+    url = reverse('api:piece-list')
+    request = factory.post(url, data)
+    force_authenticate(request, alice, token=oauth_application_token)
+    response = view(request)
+    assert response.status_code == status.HTTP_201_CREATED
+    registration = OwnershipPiece.objects.get(piece_id=response.data['piece']['id'])
+    assert registration.btc_tx is None
+
+    ingest_digital_work(*ingests[0])
+
+    registration = OwnershipPiece.objects.get(id=registration.id)
+    etag = hashlib.md5(content).hexdigest()
+    assert registration.piece.digital_work.digital_work_hash == etag
+    hash_address = pybitcointools.bin_to_b58check(pybitcointools.bin_hash160(etag))
+    assert registration.btc_tx.outputs[0][1] == hash_address
+
+
 def test_create_unauthenticated():
     from ..api import PieceEndpoint
     view = PieceEndpoint.as_view({'post': 'create'})
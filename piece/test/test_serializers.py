@@ -5,6 +5,8 @@ Serializer tests
 
 from django.test import TestCase
 
+import pytest
+
 from piece.serializers import PieceForm
 
 
@@ -52,4 +54,21 @@ class PieceFormSerializerTest(TestCase):
             'thumbnail_file': 'media/thumbnails/ascribe_spiral.png'}
 
         serializer = PieceForm(data=data)
-        self.assertTrue(serializer.is_valid())
\ No newline at end of file
+        self.assertTrue(serializer.is_valid())
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('djroot_user')
+def test_get_editions_or_raise_errors(registered_edition_alice, django_assert_num_queries):
+    from rest_framework.serializers import ValidationError
+    from piece.serializers import get_editions_or_raise_errors
+    bitcoin_id = registered_edition_alice.bitcoin_id
+    assert registered_edition_alice.bitcoin_address == bitcoin_id
+    with django_assert_num_queries(1):
+        editions = list(get_editions_or_raise_errors(bitcoin_id))
+    assert editions == [registered_edition_alice]
+    with pytest.raises(ValidationError):
+        get_editions_or_raise_errors(','.join([bitcoin_id, 'missing']))
+    # a part of a bitcoin id no longer matches
+    with pytest.raises(ValidationError):
+        get_editions_or_raise_errors(bitcoin_id[:-1])
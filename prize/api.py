@@ -1,10 +1,5 @@
-from datetime import datetime
-
-import pytz
-
-from django.conf import settings
 from django.contrib.auth.models import User, AnonymousUser
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 
 from rest_framework.decorators import detail_route, list_route
@@ -13,7 +8,7 @@ from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticate
 from rest_framework.response import Response
 from rest_framework import status
 
-from .models import Rating
+from .models import Rating, RatingAggregate
 from core.api import AscribeModelViewSet
 from note.api import NoteEndpoint
 from acl.models import ActionControl
@@ -54,28 +49,31 @@ class RatingOrdeningFilter(filters.OrderingFilter):
             if 'note_at_piece' in ordering or 'selected' in ordering:
                 prize = Prize.objects.get(whitelabel_settings__subdomain=request.parser_context['kwargs']['domain_pk'])
                 prize_user = PrizeUser.objects.get(user=request.user, prize=prize)
+                # the key is looked up per piece in a subquery, the pieces without one come last
                 # order by personal rating
                 if prize_user.is_jury and not prize_user.is_judge and 'note_at_piece' in ordering:
-                    user_ratings = Rating.objects.filter(user=request.user).order_by('-note')
-                    pk_list = [r.piece.id for r in user_ratings]
+                    key = '''COALESCE((SELECT max(note_note.note) FROM note_note
+                                       WHERE note_note.piece_id = piece_piece.id
+                                           AND note_note.user_id = %s
+                                           AND note_note.type = 'Rating'), '')'''
+                    params = [request.user.id]
                 # order by average rating
                 elif prize_user.is_jury and prize_user.is_judge and 'note_at_piece' in ordering:
-                    average_ratings = PrizePiece.objects.filter(prize=prize).order_by('-average_rating')
-                    pk_list = [r.piece.id for r in average_ratings if r.average_rating is not None]
+                    key = '''COALESCE((SELECT max(prize_prizepiece.average_rating) FROM prize_prizepiece
+                                       WHERE prize_prizepiece.piece_id = piece_piece.id
+                                           AND prize_prizepiece.prize_id = %s), -1)'''
+                    params = [prize.id]
                 # order by selected
                 elif (prize_user.is_jury or prize_user.is_judge or prize_user.is_admin) and 'selected' in ordering:
-                    selected = PrizePiece.objects.filter(prize=prize).order_by('is_selected')
-                    pk_list = [r.piece.id for r in selected if r.is_selected is True]
+                    key = '''EXISTS (SELECT 1 FROM prize_prizepiece
+                                     WHERE prize_prizepiece.piece_id = piece_piece.id
+                                         AND prize_prizepiece.prize_id = %s
+                                         AND prize_prizepiece.is_selected)'''
+                    params = [prize.id]
                 else:
                     return queryset.order_by(*ordering)
-                if pk_list:
-                    clauses = ' '.join(['WHEN id=%s THEN %s' % (pk, i) for i, pk in enumerate(pk_list)])
-                    ordering = 'CASE %s END' % clauses
-                    queryset_rated = queryset.filter(pk__in=pk_list) \
-                        .extra(select={'ordering': ordering}, order_by=('ordering', 'title'))
-                    return queryset_rated | queryset
-                else:
-                    return queryset
+                return queryset.extra(select={'ordering': key}, select_params=params,
+                                      order_by=('-ordering', 'title'))
             return queryset.order_by(*ordering)
         return queryset
 
@@ -118,6 +116,9 @@ class PrizeEndpoint(AscribeModelViewSet):
                 if prizepiece.is_selected:
                     prizepiece.round += 1
                     prizepiece.is_selected = False
+                    # the piece has not been rated in its new round yet
+                    prizepiece.average_rating = None
+                    prizepiece.num_ratings = None
                     prizepiece.save()
             # TODO send email(s) ?
 
@@ -290,7 +291,7 @@ class PrizePieceEndpoint(PieceEndpoint):
     ordering = ('note_at_piece',)
 
     def list(self, request, domain_pk=None):
-        unfiltered_count = len(PrizePieceEndpoint.get_list_queryset(domain_pk, self.request.user))
+        unfiltered_count = PrizePieceEndpoint.get_list_queryset(domain_pk, self.request.user).count()
         return super(PrizePieceEndpoint, self).list(request, unfiltered_count=unfiltered_count)
 
     def retrieve(self, request, pk=None, domain_pk=None):
@@ -377,8 +378,9 @@ class PrizePieceEndpoint(PieceEndpoint):
             return PieceEndpoint.get_list_queryset(user)
 
         if prize_user and (prize_user.is_admin or prize_user.is_jury or prize_user.is_judge):
-            prize_pieces = PrizePiece.objects.filter(prize=prize, round=prize.active_round).select_related('piece')
-            return Piece.objects.filter(id__in=[p.piece.id for p in prize_pieces])
+            prize_pieces = PrizePiece.objects.filter(prize=prize, round=prize.active_round)
+            return Piece.objects.filter(id__in=prize_pieces.values('piece_id'))\
+                .select_related('thumbnail', 'license_type', 'user_registered')
         return Piece.objects.none()
 
 
@@ -419,20 +421,25 @@ class RatingEndpoint(NoteEndpoint):
 
         if serializer.is_valid():
             piece = serializer.validated_data['piece_id']
-            try:
-                db_note = queryset.get(user=request.user, piece=piece)
-                db_note.note = serializer.validated_data['note']
-                db_note.save()
-            except ObjectDoesNotExist:
-                db_note = queryset.create(user=request.user,
-                                          edition=None,
-                                          piece=piece,
-                                          note=serializer.validated_data['note'],
-                                          type=queryset.model.__name__)
-                db_note.save()
             prize = Prize.objects.get(whitelabel_settings__subdomain=self.kwargs['domain_pk'])
             prize_piece = PrizePiece.objects.get(piece=piece, prize=prize)
-            prize_piece.set_average()
+            # the jury rates the pieces once per round
+            with transaction.atomic():
+                try:
+                    db_note = queryset.select_for_update().get(user=request.user, piece=piece,
+                                                               round=prize.active_round)
+                    old_rating = db_note.rating
+                    db_note.note = serializer.validated_data['note']
+                    db_note.save()
+                except ObjectDoesNotExist:
+                    old_rating = None
+                    db_note = queryset.create(user=request.user,
+                                              edition=None,
+                                              piece=piece,
+                                              note=serializer.validated_data['note'],
+                                              type=queryset.model.__name__,
+                                              round=prize.active_round)
+                RatingAggregate.add(prize_piece.id, prize.active_round, old_rating, db_note.rating)
             self.action = 'list'
             serializer = self.get_serializer(db_note)
             return Response({'success': True, self.json_name[:-1]: serializer.data}, status.HTTP_201_CREATED)
@@ -466,22 +473,13 @@ class RatingEndpoint(NoteEndpoint):
         subdomain = self.kwargs['domain_pk']
         prize_round = self.request.query_params.get('prize_round')
 
-        # TODO HACK ALERT! Will be changed asap.
-        if prize_round is not None and subdomain == 'portfolioreview':
-            round_two_starttime = datetime.strptime(
-                settings.PORTFOLIO_REVIEW_ROUND_TWO_STARTTIME,
-                settings.PORTFOLIO_REVIEW_ROUND_TIMEFORMAT,
-            ).replace(tzinfo=pytz.UTC)
-            if prize_round == '1':
-                filter_kwargs['datetime__lt'] = round_two_starttime
-            elif prize_round == '2':
-                filter_kwargs['datetime__gte'] = round_two_starttime
+        if prize_round is not None and prize_round.isdigit():
+            filter_kwargs['round'] = int(prize_round)
 
         if self.action in ['list']:
-            prize = Prize.objects.get(whitelabel_settings__subdomain=subdomain)
-            prize_pieces = PrizePiece.objects.filter(prize=prize).select_related('piece')
+            prize_pieces = PrizePiece.objects.filter(prize__whitelabel_settings__subdomain=subdomain)
             filter_kwargs.update(
-                piece_id__in=[p.piece.id for p in prize_pieces],
+                piece_id__in=prize_pieces.values('piece_id'),
                 user=self.request.user,
             )
         elif self.action == 'average':
@@ -509,9 +507,8 @@ class PrizeNoteEndpoint(RatingEndpoint):
 
     def get_queryset(self):
         if self.action in ['list']:
-            prize = Prize.objects.get(whitelabel_settings__subdomain=self.kwargs['domain_pk'])
-            prize_pieces = PrizePiece.objects.filter(prize=prize).select_related('piece')
-            return PrivateNote.objects.filter(piece_id__in=[p.piece.id for p in prize_pieces], user=self.request.user)
+            prize_pieces = PrizePiece.objects.filter(prize__whitelabel_settings__subdomain=self.kwargs['domain_pk'])
+            return PrivateNote.objects.filter(piece_id__in=prize_pieces.values('piece_id'), user=self.request.user)
         return PrivateNote.objects.all()
 
     def get_serializer_class(self):
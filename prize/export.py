@@ -0,0 +1,252 @@
+"""
+Export of the submissions of a prize as a tar archive.
+
+Every submission is a directory `<submission id>-<title>/` holding the files of its piece
+(`digital_work.<ext>`, `other_data-<n>.<ext>`) followed by `info.json`, its metadata.
+
+The submissions are read with a server-side cursor, `chunk_size` at a time. The files of a chunk
+are downloaded concurrently by `workers` threads into temporary files and appended to the archive
+in order, so that the memory used does not depend on the size of the prize.
+
+The archive is written as a stream, to a pipe or to a file. An archive file cut short (e.g. by a
+restart) is resumed after its last complete submission, the one of its last `info.json`.
+"""
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import time
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from s3 import aws
+
+logger = logging.getLogger(__name__)
+
+
+INFO = 'info.json'
+
+SQL = """
+    SELECT
+        prize_prizepiece.id,
+        prize_prizepiece.round,
+        prize_prizepiece.is_selected,
+        prize_prizepiece.average_rating,
+        prize_prizepiece.num_ratings,
+        prize_prizepiece.extra_data,
+        auth_user.email,
+        piece_piece.id,
+        piece_piece.title,
+        piece_piece.artist_name,
+        piece_piece.date_created,
+        piece_piece.num_editions,
+        piece_piece.bitcoin_address,
+        piece_piece.extra_data_json,
+        blobs_digitalwork.digital_work_file,
+        ARRAY(
+            SELECT blobs_otherdata.other_data_file
+            FROM piece_piece_other_data
+                INNER JOIN blobs_otherdata
+                    ON (blobs_otherdata.id = piece_piece_other_data.otherdata_id)
+            WHERE piece_piece_other_data.piece_id = piece_piece.id
+            ORDER BY blobs_otherdata.id
+        )
+
+    FROM
+        prize_prizepiece
+        INNER JOIN piece_piece
+            ON (piece_piece.id = prize_prizepiece.piece_id)
+        INNER JOIN auth_user
+            ON (auth_user.id = prize_prizepiece.user_id)
+        LEFT OUTER JOIN blobs_digitalwork
+            ON (blobs_digitalwork.id = piece_piece.digital_work_id)
+
+    WHERE
+        prize_prizepiece.prize_id = %s
+        AND prize_prizepiece.id > %s
+
+    ORDER BY
+        prize_prizepiece.id
+"""
+
+
+def _json_or_raw(value):
+    try:
+        return json.loads(value) if value else {}
+    except ValueError:
+        return value
+
+
+def submission_dir(submission_id, title):
+    return u'{:05d}-{}'.format(submission_id, slugify(title)[:50] or 'untitled')
+
+
+def resume_point(fileobj):
+    """
+    Returns the (offset, submission id) of the end of the last complete submission of an
+    archive, (0, 0) for an empty or unreadable one.
+    """
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    offset, submission_id = 0, 0
+    try:
+        archive = tarfile.open(fileobj=fileobj, mode='r:')
+    except tarfile.ReadError:
+        return offset, submission_id
+    while True:
+        member = archive.next()
+        if member is None:
+            break
+        # the members are not needed afterwards, keep the memory constant
+        archive.members = []
+        end = member.offset_data + -(-member.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+        if os.path.basename(member.name) == INFO and end <= size:
+            offset, submission_id = end, int(member.name.split('-', 1)[0])
+    return offset, submission_id
+
+
+class PrizeExport(object):
+    """
+    Writes the submissions of a prize to `fileobj`, downloading their files from `bucket`.
+    """
+
+    def __init__(self, prize, bucket=None, workers=None, chunk_size=None):
+        self.prize = prize
+        self.bucket = bucket
+        self.workers = workers or settings.PRIZE_EXPORT_WORKERS
+        self.chunk_size = chunk_size or settings.PRIZE_EXPORT_CHUNK_SIZE
+
+    def _download(self, download):
+        """
+        Returns the (name, temporary file) of a (name, S3 key), a None file if it could not be downloaded.
+        """
+        name, key = download
+        try:
+            s3_key = self.bucket.get_key(key)
+            if s3_key is None:
+                raise IOError('no such key')
+            f = tempfile.TemporaryFile()
+            s3_key.get_contents_to_file(f)
+            f.seek(0)
+            return name, f
+        except Exception as e:
+            logger.warning('Could not download {}: {}'.format(key, e))
+            return name, None
+
+    @staticmethod
+    def _files(digital_work_key, other_data_keys):
+        files = []
+        if digital_work_key:
+            files.append(('digital_work' + os.path.splitext(digital_work_key)[1].lower(), digital_work_key))
+        for n, key in enumerate(other_data_keys or [], 1):
+            files.append(('other_data-{}{}'.format(n, os.path.splitext(key)[1].lower()), key))
+        return files
+
+    @staticmethod
+    def _add(archive, name, f):
+        f.seek(0, os.SEEK_END)
+        member = tarfile.TarInfo(name.encode('utf-8'))
+        member.size = f.tell()
+        member.mtime = time.time()
+        f.seek(0)
+        archive.addfile(member, f)
+
+    def _write_chunk(self, archive, rows, pool):
+        submissions = []
+        downloads = []
+        for (submission_id, round, is_selected, average_rating, num_ratings, prize_extra_data, email,
+             piece_id, title, artist_name, date_created, num_editions, bitcoin_address, extra_data,
+             digital_work_key, other_data_keys) in rows:
+            directory = submission_dir(submission_id, title)
+            files = self._files(digital_work_key, other_data_keys)
+            downloads += [(u'/'.join([directory, name]), key) for name, key in files]
+            submissions.append((directory, {
+                'submission_id': submission_id,
+                'round': round,
+                'is_selected': is_selected,
+                'average_rating': average_rating,
+                'num_ratings': num_ratings,
+                'submitted_by': email,
+                'piece_id': piece_id,
+                'title': title,
+                'artist_name': artist_name,
+                'year': date_created.year,
+                'num_editions': num_editions,
+                'bitcoin_address': bitcoin_address,
+                'extra_data': _json_or_raw(extra_data),
+                'prize_extra_data': _json_or_raw(prize_extra_data),
+                'files': dict(files),
+                'missing_files': [],
+            }))
+
+        downloaded = dict(pool.map(self._download, downloads))
+        try:
+            for directory, info in submissions:
+                for name in sorted(info['files']):
+                    f = downloaded[u'/'.join([directory, name])]
+                    if f is None:
+                        info['missing_files'].append(name)
+                    else:
+                        self._add(archive, u'/'.join([directory, name]), f)
+                info_file = tempfile.TemporaryFile()
+                json.dump(info, info_file, indent=2, default=str)
+                # written last, it marks the submission as complete
+                self._add(archive, u'/'.join([directory, INFO]), info_file)
+                info_file.close()
+        finally:
+            for f in downloaded.values():
+                if f is not None:
+                    f.close()
+
+    def write(self, fileobj, after_id=0):
+        """
+        Appends the submissions after the submission `after_id` to `fileobj` at its current
+        position, returns the number of submissions written.
+        """
+        if self.bucket is None:
+            self.bucket = aws.get_bucket()
+        count = 0
+        archive = tarfile.open(fileobj=fileobj, mode='w|', format=tarfile.PAX_FORMAT)
+        pool = ThreadPool(self.workers)
+        try:
+            # a named cursor is a server-side cursor, it only lives in a transaction
+            with transaction.atomic():
+                connection.ensure_connection()
+                cursor = connection.connection.cursor(name='prize_export_{}'.format(self.prize.id))
+                cursor.itersize = self.chunk_size
+                cursor.execute(SQL, [self.prize.id, after_id])
+                while True:
+                    rows = cursor.fetchmany(self.chunk_size)
+                    if not rows:
+                        break
+                    self._write_chunk(archive, rows, pool)
+                    count += len(rows)
+                    logger.info('Exported {} submissions of prize {}'.format(count, self.prize.id))
+                cursor.close()
+        finally:
+            pool.close()
+            pool.join()
+        archive.close()
+        return count
+
+    def write_file(self, path, restart=False):
+        """
+        Writes the archive to the file `path`, resuming after the last complete submission
+        of an existing archive unless `restart`. Returns the number of submissions written.
+        """
+        mode = 'r+b' if os.path.exists(path) and not restart else 'wb'
+        with open(path, mode) as f:
+            after_id = 0
+            if mode == 'r+b':
+                offset, after_id = resume_point(f)
+                if after_id:
+                    logger.info('Resuming the export of prize {} after submission {}'.format(self.prize.id,
+                                                                                             after_id))
+                f.seek(offset)
+                f.truncate()
+            return self.write(f, after_id)
@@ -0,0 +1,72 @@
+"""
+Export the submissions of a prize, their metadata and files, as a tar archive (see prize.export).
+An existing archive is resumed after its last complete submission.
+
+usage:
+    python manage.py export_prize <subdomain> --output sluice.tar
+    python manage.py export_prize <subdomain> --output - | gzip > sluice.tar.gz
+
+The files are read from AWS_S3_ENDPOINT when it is set, e.g. a local stand-in as moto_server.
+With --output -, the log messages printed to the standard output go to the standard error.
+"""
+
+import logging
+import os
+import sys
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prize.export import PrizeExport
+from prize.models import Prize
+
+
+@contextmanager
+def logging_to_stderr():
+    """
+    Points the logging handlers writing to the standard output to the standard error, so that
+    their messages do not end up in an archive written to the standard output
+    """
+    loggers = [logging.getLogger()] + [logger for logger in logging.Logger.manager.loggerDict.values()
+                                       if isinstance(logger, logging.Logger)]
+    handlers = set(handler for logger in loggers for handler in logger.handlers
+                   if isinstance(handler, logging.StreamHandler) and handler.stream is sys.stdout)
+    for handler in handlers:
+        handler.flush()
+        handler.stream = sys.stderr
+    try:
+        yield
+    finally:
+        for handler in handlers:
+            handler.stream = sys.stdout
+
+
+class Command(BaseCommand):
+    help = __doc__
+
+    def add_arguments(self, parser):
+        parser.add_argument('subdomain', help="subdomain of the prize")
+        parser.add_argument('--output', required=True,
+                            help="path of the archive, - writes it to the standard output")
+        parser.add_argument('--restart', action='store_true', default=False,
+                            help="overwrite the archive instead of resuming it")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="number of concurrent downloads")
+        parser.add_argument('--chunk-size', type=int, default=None,
+                            help="number of submissions read and archived at a time")
+
+    def handle(self, *args, **options):
+        try:
+            prize = Prize.objects.get(whitelabel_settings__subdomain=options['subdomain'])
+        except Prize.DoesNotExist:
+            raise CommandError('The prize {} does not exist'.format(options['subdomain']))
+
+        export = PrizeExport(prize, workers=options['workers'], chunk_size=options['chunk_size'])
+        if options['output'] == '-':
+            sys.stdout.flush()
+            # the raw file descriptor, sys.stdout may be a text stream
+            with logging_to_stderr(), os.fdopen(os.dup(sys.stdout.fileno()), 'wb') as stdout:
+                export.write(stdout)
+            return
+        count = export.write_file(options['output'], restart=options['restart'])
+        self.stdout.write('Exported {} submissions to {}'.format(count, options['output']))
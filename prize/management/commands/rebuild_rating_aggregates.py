@@ -0,0 +1,18 @@
+"""
+Recompute the rating aggregates of the prize pieces from the ratings in note_note
+
+usage:
+    python manage.py rebuild_rating_aggregates
+"""
+
+from django.core.management.base import NoArgsCommand
+
+from prize.models import RatingAggregate
+
+
+class Command(NoArgsCommand):
+    help = __doc__
+
+    def handle_noargs(self, **options):
+        RatingAggregate.rebuild()
+        self.stdout.write('Rebuilt {} rating aggregates'.format(RatingAggregate.objects.count()))
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import ast
+
+from django.db import models, migrations
+import util.fields
+
+
+def forwards_func(apps, schema_editor):
+    PieceAtPrize = apps.get_model('prize', 'PieceAtPrize')
+    # the extra data was stored as str() of a dict
+    for piece_at_prize in PieceAtPrize.objects.exclude(extra_data_str='').only('id', 'extra_data_str').iterator():
+        PieceAtPrize.objects.filter(id=piece_at_prize.id)\
+            .update(extra_data_json=ast.literal_eval(piece_at_prize.extra_data_str))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prize', '0022_prizepiece_round'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pieceatprize',
+            name='extra_data_json',
+            field=util.fields.JSONBField(null=True, blank=True),
+        ),
+        migrations.RunPython(
+            forwards_func,
+        ),
+        migrations.RemoveField(
+            model_name='pieceatprize',
+            name='extra_data_str',
+        ),
+    ]
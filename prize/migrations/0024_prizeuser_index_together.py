@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prize', '0023_pieceatprize_extra_data_json'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='prizeuser',
+            index_together=set([('prize', 'is_jury')]),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+REBUILD_SQL = """
+    INSERT INTO prize_ratingaggregate (prize_piece_id, round, rating_sum, num_ratings)
+    SELECT prize_prizepiece.id, note_note.round, sum(note_note.note::float), count(*)
+    FROM prize_prizepiece
+        INNER JOIN note_note ON (prize_prizepiece.piece_id = note_note.piece_id)
+    WHERE note_note.type = 'Rating' AND note_note.note <> '' AND note_note.round IS NOT NULL
+    GROUP BY prize_prizepiece.id, note_note.round;
+
+    UPDATE prize_prizepiece
+    SET average_rating = aggregate.rating_sum / aggregate.num_ratings,
+        num_ratings = aggregate.num_ratings
+    FROM (
+        SELECT prize_prizepiece.id, prize_ratingaggregate.rating_sum, prize_ratingaggregate.num_ratings
+        FROM prize_prizepiece
+            LEFT OUTER JOIN prize_ratingaggregate
+                ON (prize_ratingaggregate.prize_piece_id = prize_prizepiece.id
+                    AND prize_ratingaggregate.round = prize_prizepiece.round)
+    ) aggregate
+    WHERE prize_prizepiece.id = aggregate.id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('note', '0009_note_round'),
+        ('prize', '0024_prizeuser_index_together'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingAggregate',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('round', models.IntegerField()),
+                ('rating_sum', models.FloatField(default=0)),
+                ('num_ratings', models.IntegerField(default=0)),
+                ('prize_piece', models.ForeignKey(related_name='rating_aggregates', to='prize.PrizePiece')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='ratingaggregate',
+            unique_together=set([('prize_piece', 'round')]),
+        ),
+        migrations.RunSQL(REBUILD_SQL),
+    ]
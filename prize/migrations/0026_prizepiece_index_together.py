@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prize', '0025_ratingaggregate'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='prizepiece',
+            index_together=set([('prize', 'round')]),
+        ),
+    ]
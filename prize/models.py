@@ -1,11 +1,10 @@
-import ast
-
 from django.utils import timezone
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
 from django.contrib.auth.models import User
 
 from note.models import PrivateNote
 from piece.models import Piece
+from util.fields import JSONBField
 from whitelabel.models import WhitelabelSettings
 
 
@@ -47,6 +46,7 @@ class PrizeUser(models.Model):
 
     class Meta:
         unique_together = ("prize", "user", "is_jury", "round")
+        index_together = ("prize", "is_jury")
 
     def delete_safe(self):
         self.datetime_deleted = timezone.now()
@@ -61,14 +61,120 @@ class PrizePiece(models.Model):
     extra_data = models.TextField(blank=True, default="")
     is_selected = models.BooleanField(default=False, blank=True)
     round = models.IntegerField(blank=True, null=True, default=1)
+    # ratings of the round the piece is in, copied from its RatingAggregate
     average_rating = models.FloatField(default=None, blank=True, null=True)
     num_ratings = models.IntegerField(default=None, blank=True, null=True)
 
-    def set_average(self):
-        ratings = Rating.objects.filter(piece=self.piece, type="Rating")
-        self.average_rating = Rating.average(ratings)
-        self.num_ratings = len(ratings)
-        self.save()
+    class Meta:
+        index_together = ("prize", "round")
+
+
+class RatingAggregate(models.Model):
+    """
+    Running sum and count of the ratings of a submission in a round of the prize
+    """
+    prize_piece = models.ForeignKey(PrizePiece, related_name='rating_aggregates')
+    round = models.IntegerField()
+    rating_sum = models.FloatField(default=0)
+    num_ratings = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('prize_piece', 'round')
+
+    @property
+    def average(self):
+        return self.rating_sum / self.num_ratings if self.num_ratings else None
+
+    @classmethod
+    def add(cls, prize_piece_id, round, old_rating, new_rating):
+        """
+        Replace `old_rating` (None for a new rating) by `new_rating` in the aggregate of the round.
+
+        The aggregate is updated in place, so concurrent ratings of the same piece do not
+        overwrite each other: an UPDATE, or an INSERT when the round has no aggregate yet, which
+        falls back to the UPDATE if a concurrent rating inserted it first. The average of the
+        prize piece is then copied from the aggregate when the piece is in that round.
+        """
+        rating_delta = (new_rating or 0) - (old_rating or 0)
+        count_delta = (new_rating is not None) - (old_rating is not None)
+
+        update = """
+        UPDATE prize_ratingaggregate
+        SET rating_sum = rating_sum + %s,
+            num_ratings = num_ratings + %s
+        WHERE prize_piece_id = %s AND round = %s
+        """
+        insert = """
+        INSERT INTO prize_ratingaggregate (prize_piece_id, round, rating_sum, num_ratings)
+        VALUES (%s, %s, %s, %s)
+        """
+        copy = """
+        UPDATE prize_prizepiece
+        SET average_rating = aggregate.rating_sum / NULLIF(aggregate.num_ratings, 0),
+            num_ratings = aggregate.num_ratings
+        FROM prize_ratingaggregate aggregate
+        WHERE aggregate.prize_piece_id = %s
+            AND aggregate.round = %s
+            AND prize_prizepiece.id = aggregate.prize_piece_id
+            AND prize_prizepiece.round = aggregate.round
+        """
+
+        cursor = connection.cursor()
+        cursor.execute(update, [rating_delta, count_delta, prize_piece_id, round])
+        if cursor.rowcount == 0:
+            try:
+                with transaction.atomic():
+                    cursor.execute(insert, [prize_piece_id, round, rating_delta, count_delta])
+            except IntegrityError:
+                # inserted by a concurrent rating meanwhile
+                cursor.execute(update, [rating_delta, count_delta, prize_piece_id, round])
+        cursor.execute(copy, [prize_piece_id, round])
+        cursor.close()
+
+    @classmethod
+    def rebuild(cls):
+        """
+        Recompute all the aggregates and the averages of the prize pieces from the ratings
+        """
+        with transaction.atomic():
+            cursor = connection.cursor()
+            cursor.execute("""DELETE FROM prize_ratingaggregate""")
+            cursor.execute("""
+            INSERT INTO prize_ratingaggregate (prize_piece_id, round, rating_sum, num_ratings)
+            SELECT
+                prize_prizepiece.id,
+                note_note.round,
+                sum(note_note.note::float),
+                count(*)
+
+            FROM
+                prize_prizepiece
+                INNER JOIN note_note
+                    ON (prize_prizepiece.piece_id = note_note.piece_id)
+
+            WHERE
+                note_note.type = 'Rating'
+                AND note_note.note <> ''
+                AND note_note.round IS NOT NULL
+
+            GROUP BY
+                prize_prizepiece.id,
+                note_note.round
+            """)
+            cursor.execute("""
+            UPDATE prize_prizepiece
+            SET average_rating = aggregate.rating_sum / aggregate.num_ratings,
+                num_ratings = aggregate.num_ratings
+            FROM (
+                SELECT prize_prizepiece.id, prize_ratingaggregate.rating_sum, prize_ratingaggregate.num_ratings
+                FROM prize_prizepiece
+                    LEFT OUTER JOIN prize_ratingaggregate
+                        ON (prize_ratingaggregate.prize_piece_id = prize_prizepiece.id
+                            AND prize_ratingaggregate.round = prize_prizepiece.round)
+            ) aggregate
+            WHERE prize_prizepiece.id = aggregate.id
+            """)
+            cursor.close()
 
 
 class PieceAtPrize(models.Model):
@@ -77,15 +183,15 @@ class PieceAtPrize(models.Model):
     piece = models.ForeignKey("piece.Edition")
     prize = models.ForeignKey(Prize)
     round = models.IntegerField(blank=True, null=True)
-    extra_data_str = models.TextField(blank=True, default="")
+    extra_data_json = JSONBField(blank=True, null=True)
 
     @property
     def extra_data(self):
-        return ast.literal_eval(self.extra_data_str)
+        return self.extra_data_json
 
     @extra_data.setter
     def extra_data(self, value):
-        self.extra_data_str = str(value)
+        self.extra_data_json = value
 
     def export(self):
         from piece.serializers import PieceSerializer
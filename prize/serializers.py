@@ -1,10 +1,6 @@
 import json
 import re
-from datetime import datetime
 
-import pytz
-
-from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
 
@@ -12,12 +8,11 @@ from rest_framework import serializers
 
 from acl.util import merge_acl_dict_with_object
 from note.models import PrivateNote
-from piece.serializers import get_edition_or_raise_error, PieceForm, BasicPieceSerializer, PieceSerializer, get_piece_or_raise_error
+from piece.serializers import get_edition_or_raise_error, PieceForm, BasicPieceSerializer, BasicPieceListSerializer, PieceSerializer, get_piece_or_raise_error
 from prize.models import Prize, PrizeUser, PrizePiece, Rating
 from users.models import UserProfile
 from users.serializers import WebUserSerializer, BaseUserSerializer, UserProfileSerializer
 from util.util import hash_string
-from whitelabel.models import WhitelabelSettings
 
 
 class PrizeSerializer(serializers.ModelSerializer):
@@ -55,6 +50,11 @@ class SelectedSerializer(serializers.Serializer):
         except KeyError:
             piece_id = obj.id
 
+        prize_pieces = self.context.get('prize_pieces', None)
+        if prize_pieces is not None and int(piece_id) in prize_pieces:
+            prize_piece = prize_pieces[int(piece_id)]
+            return prize_piece.is_selected if prize_piece is not None else None
+
         try:
             prize_piece = PrizePiece.objects.get(piece_id=piece_id, prize__whitelabel_settings__subdomain=domain)
         except ObjectDoesNotExist:
@@ -214,47 +214,101 @@ class PrizePieceSubmitForm(serializers.Serializer):
         return data
 
 
+class WebPrizeBasicPieceListSerializer(BasicPieceListSerializer):
+    """
+    Loads the acls, the prize, the role of the user in the prize, the submissions
+    and the ratings of the user for all the pieces of a page up front, so that
+    listing the pieces of a prize costs a constant number of queries.
+    """
+
+    def load_page(self, ids, request):
+        self.load_acls(ids, request)
+        try:
+            subdomain = request.parser_context['kwargs']['domain_pk']
+            prize = Prize.objects.select_related('whitelabel_settings').get(
+                whitelabel_settings__subdomain=subdomain)
+        except (KeyError, ObjectDoesNotExist):
+            return
+        prize_user = PrizeUser.objects.filter(user=request.user, prize=prize).first()
+
+        prize_pieces = dict.fromkeys(ids)
+        prize_pieces.update({prize_piece.piece_id: prize_piece for prize_piece in
+                             PrizePiece.objects.filter(prize=prize, piece_id__in=ids)})
+        ratings = dict.fromkeys(ids)
+        if prize_user is not None and prize_user.is_jury and not prize_user.is_judge:
+            ratings.update({rating.piece_id: rating for rating in
+                            Rating.objects.filter(user=request.user, piece_id__in=ids,
+                                                  round=prize.active_round)})
+        self.context.update({'prize': prize,
+                             'prize_user': prize_user,
+                             'prize_pieces': prize_pieces,
+                             'ratings': ratings})
+
+
 class WebPrizeBasicPieceSerializer(BasicPieceSerializer, SelectedSerializer):
     prize = serializers.SerializerMethodField()
     ratings = serializers.SerializerMethodField()
 
+    # The prize, prize user, submissions and ratings are loaded for the whole page by
+    # WebPrizeBasicPieceListSerializer, a single piece looks them up once and keeps them
+    # in the context for the other fields.
+
+    def _prize(self):
+        if 'prize' not in self.context:
+            subdomain = self.context['request'].parser_context['kwargs']['domain_pk']
+            self.context['prize'] = Prize.objects.select_related('whitelabel_settings').get(
+                whitelabel_settings__subdomain=subdomain)
+        return self.context['prize']
+
+    def _prize_user(self):
+        if 'prize_user' not in self.context:
+            self.context['prize_user'] = PrizeUser.objects.filter(user=self.context['request'].user,
+                                                                  prize=self._prize()).first()
+        return self.context['prize_user']
+
+    def _prize_piece(self, obj):
+        prize_pieces = self.context.setdefault('prize_pieces', {})
+        if obj.id not in prize_pieces:
+            prize_pieces[obj.id] = PrizePiece.objects.filter(piece=obj, prize=self._prize()).first()
+        return prize_pieces[obj.id]
+
+    def _rating(self, obj):
+        ratings = self.context.setdefault('ratings', {})
+        if obj.id not in ratings:
+            ratings[obj.id] = Rating.objects.filter(piece=obj, user=self.context['request'].user,
+                                                    round=self._prize().active_round).first()
+        return ratings[obj.id]
+
     def get_ratings(self, obj):
         try:
-            request = self.context.get('request', None)
-            user = request.user
-            subdomain = request.parser_context['kwargs']['domain_pk']
-            prize = Prize.objects.get(whitelabel_settings__subdomain=subdomain)
-            prize_user = PrizeUser.objects.get(user=user, prize=prize)
+            prize_user = self._prize_user()
+            if prize_user is None:
+                return None
             if prize_user.is_jury and not prize_user.is_judge:
-                filter_kwargs = dict(piece=obj, user=user)
-                if subdomain == 'portfolioreview':
-                    round_two_starttime = datetime.strptime(
-                        settings.PORTFOLIO_REVIEW_ROUND_TWO_STARTTIME,
-                        settings.PORTFOLIO_REVIEW_ROUND_TIMEFORMAT,
-                    ).replace(tzinfo=pytz.UTC)
-                    if prize.active_round == 2:
-                        filter_kwargs['datetime__gte'] = round_two_starttime
-                    else:
-                        filter_kwargs['datetime__lt'] = round_two_starttime
-                rating = Rating.objects.get(**filter_kwargs)
-                return RatingSerializer(rating).data
+                rating = self._rating(obj)
+                return RatingSerializer(rating).data if rating is not None else None
             elif prize_user.is_judge:
-                prize_piece = PrizePiece.objects.get(piece=obj, prize=prize)
+                prize_piece = self._prize_piece(obj)
+                if prize_piece is None:
+                    return None
                 return {'average': prize_piece.average_rating, 'num_ratings': prize_piece.num_ratings}
-                # request.parser_context['kwargs']['pk'] = obj.id
-                # return RatingAverageSerializer(Rating.objects.filter(piece=obj), context={'request': request}).data
             return None
         except (ObjectDoesNotExist, ValueError, TypeError):
             return None
 
     def get_prize(self, obj):
         try:
-            return PrizeSerializer(PrizePiece.objects.get(piece=obj).prize).data
-        except ObjectDoesNotExist:
+            if self._prize_piece(obj) is None:
+                return None
+            if 'prize_data' not in self.context:
+                self.context['prize_data'] = PrizeSerializer(self._prize()).data
+            return self.context['prize_data']
+        except (ObjectDoesNotExist, KeyError, AttributeError):
             return None
 
     class Meta(BasicPieceSerializer.Meta):
         fields = BasicPieceSerializer.Meta.fields + ('prize', 'ratings', 'selected')
+        list_serializer_class = WebPrizeBasicPieceListSerializer
 
 
 class WebPrizePieceSerializer(WebPrizeBasicPieceSerializer, PieceSerializer):
@@ -265,7 +319,9 @@ class WebPrizePieceSerializer(WebPrizeBasicPieceSerializer, PieceSerializer):
 
     def get_extra_data(self, obj):
         try:
-            prize_piece = PrizePiece.objects.get(piece=obj)
+            prize_piece = self._prize_piece(obj)
+            if prize_piece is None:
+                return {}
             # merging `extra_data` of Piece and PrizePiece
             extra_data = obj.extra_data.copy()
             extra_data.update(json.loads(prize_piece.extra_data))
@@ -274,7 +330,7 @@ class WebPrizePieceSerializer(WebPrizeBasicPieceSerializer, PieceSerializer):
             if 'thumbnail_file' in extra_data: del extra_data['thumbnail_file']
             if 'digital_work_key' in extra_data: del extra_data['digital_work_key']
             return extra_data
-        except (ObjectDoesNotExist, ValueError):
+        except (ObjectDoesNotExist, ValueError, KeyError, AttributeError):
             return {}
 
     def get_user_registered(self, obj):
@@ -292,9 +348,8 @@ class WebPrizePieceSerializer(WebPrizeBasicPieceSerializer, PieceSerializer):
             from acl.serializers import ActionControlSerializer
 
             request = self.context.get('request', None)
-            subdomain = request.parser_context['kwargs']['domain_pk']
-            prize = Prize.objects.get(whitelabel_settings__subdomain=subdomain)
-            settings = WhitelabelSettings.objects.get(subdomain=subdomain)
+            prize = self._prize()
+            settings = prize.whitelabel_settings
             acl = obj.acl(request.user).__dict__
             acl['acl_wallet_submit'] = (obj.user_registered == request.user and prize.active)
             # override the users acl with the whitelabel settings
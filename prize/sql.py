@@ -1,30 +1,40 @@
 from django.db import connection
 
 
-
-def get_jury_count(prize_id, round_id):
-    SQL = """
-        WITH roles AS (
+# The jury of a prize are its PrizeUsers with is_jury, looked up through the
+# (prize, is_jury) index instead of parsing every users_role row. The submissions
+# of a round are the PrizePieces that reached it.
+# This is always the current jury: PrizeUser.round is not maintained (the jury
+# are invited in round 0) and PrizeEndpoint.perform_update clears is_jury when
+# the round changes. The ratings of a past round are those of the current jury,
+# past rounds cannot be reproduced.
+JURY = """
+        jury AS (
             SELECT
-                user_id,
-                (replace(role_str, '''', '"')::json->>'prize')::int as prize,
-                (replace(role_str, '''', '"')::json->>'round')::int as round
+                user_id
 
             FROM
-                users_role
+                prize_prizeuser
 
             WHERE
-                role_str LIKE '{%%'
+                prize_id = %s
+                AND is_jury
+                AND datetime_deleted IS NULL
         )
+"""
+
 
-        SELECT count(*)
-        FROM roles
-        WHERE prize = %s
-            AND round = %s
+def get_jury_count(prize_id):
+    SQL = """
+        SELECT count(DISTINCT user_id)
+        FROM prize_prizeuser
+        WHERE prize_id = %s
+            AND is_jury
+            AND datetime_deleted IS NULL
     """
 
     cursor = connection.cursor()
-    cursor.execute(SQL, [prize_id, round_id])
+    cursor.execute(SQL, [prize_id])
     row = cursor.fetchone()
     cursor.close()
     return row[0]
@@ -32,32 +42,34 @@ def get_jury_count(prize_id, round_id):
 
 def get_ratings_for_pieces(prize_id, round_id):
     SQL = """
+        WITH {jury}
+
         SELECT
-            piece_piece.id,
-            prize_pieceatprize.round,
+            prize_prizepiece.piece_id,
+            prize_prizepiece.round,
             avg(note_note.note::float),
             count(note_note.note)
 
         FROM
-            prize_pieceatprize
-            INNER JOIN piece_piece
-                ON (prize_pieceatprize.piece_id = piece_piece.id)
+            prize_prizepiece
             INNER JOIN note_note
-                ON (piece_piece.id = note_note.piece_id)
+                ON (prize_prizepiece.piece_id = note_note.piece_id)
+            INNER JOIN jury
+                ON (note_note.user_id = jury.user_id)
 
         WHERE
-            prize_pieceatprize.prize_id = %s
-            AND prize_pieceatprize.round = %s
-            AND note_note.type LIKE 'Rating'
-            AND note_note.note NOT LIKE ''
+            prize_prizepiece.prize_id = %s
+            AND prize_prizepiece.round = %s
+            AND note_note.type = 'Rating'
+            AND note_note.note <> ''
 
         GROUP BY
-            piece_piece.id,
-            prize_pieceatprize.round
-    """
+            prize_prizepiece.piece_id,
+            prize_prizepiece.round
+    """.format(jury=JURY)
 
     cursor = connection.cursor()
-    cursor.execute(SQL, [prize_id, round_id])
+    cursor.execute(SQL, [prize_id, prize_id, round_id])
     l = cursor.fetchall()
     cursor.close()
     return l
@@ -65,124 +77,85 @@ def get_ratings_for_pieces(prize_id, round_id):
 
 def get_pieces(prize_id, round_id):
     SQL = """
-        WITH user_role AS (
-            SELECT
-                user_id,
-                (replace(role_str, '''', '"')::json->>'prize')::int as prize,
-                (replace(role_str, '''', '"')::json->>'round')::int as round
-
-            FROM
-                users_role
-
-            WHERE
-                role_str LIKE '{%%'
-        ),
+        WITH {jury},
 
         ratings AS (
             SELECT
-                piece_piece.id piece_id,
-                prize_pieceatprize.round,
-                user_role.round user_round,
+                note_note.piece_id,
                 avg(note_note.note::float) average,
                 count(note_note.note) num_ratings
 
             FROM
                 note_note
-                INNER JOIN auth_user
-                    ON (note_note.user_id = auth_user.id
-                        AND note_note.type LIKE 'Rating'
-                        AND note_note.note NOT LIKE '')
-                INNER JOIN user_role
-                    ON (auth_user.id = user_role.user_id AND
-                        user_role.prize = %s AND
-                        user_role.round = %s)
-                INNER JOIN piece_piece
-                    ON (note_note.piece_id = piece_piece.id)
-                INNER JOIN prize_pieceatprize
-                    ON (piece_piece.id = prize_pieceatprize.piece_id)
+                INNER JOIN jury
+                    ON (note_note.user_id = jury.user_id)
+
+            WHERE
+                note_note.type = 'Rating'
+                AND note_note.note <> ''
 
             GROUP BY
-                piece_piece.id,
-                prize_pieceatprize.round,
-                user_role.round
+                note_note.piece_id
         )
 
         SELECT
             piece_piece.id,
             piece_piece.title,
             piece_piece.artist_name,
-            LPAD(users_role.id::text, 5, '0'),
-            piece_piece.edition_number,
+            LPAD(prize_prizepiece.id::text, 5, '0'),
             piece_piece.num_editions,
-            format('%%s, %%s/%%s',
-                   EXTRACT(YEAR FROM piece_piece.datetime_registered),
-                   piece_piece.edition_number, piece_piece.num_editions),
-            piece_piece."bitcoin_id",
+            format('%%s, %%s', EXTRACT(YEAR FROM piece_piece.date_created), piece_piece.num_editions),
+            piece_piece.bitcoin_address,
             blobs_thumbnail.thumbnail_file,
             ratings.average,
             ratings.num_ratings,
-            prize_pieceatprize.round
+            prize_prizepiece.round
 
         FROM
-            piece_piece
-            INNER JOIN prize_pieceatprize
-                ON (prize_pieceatprize.piece_id = piece_piece.id AND
-                    prize_pieceatprize.prize_id = %s AND
-                    prize_pieceatprize.round >= %s)
-            INNER JOIN users_role
-                ON (users_role.user_id = piece_piece.owner_id)
+            prize_prizepiece
+            INNER JOIN piece_piece
+                ON (prize_prizepiece.piece_id = piece_piece.id)
             LEFT OUTER JOIN blobs_thumbnail
                 ON (blobs_thumbnail.id = piece_piece.thumbnail_id)
             LEFT OUTER JOIN ratings
-                ON (piece_piece.id = ratings.piece_id AND
-                    ratings.user_round = %s)
-    """
+                ON (piece_piece.id = ratings.piece_id)
+
+        WHERE
+            prize_prizepiece.prize_id = %s
+            AND prize_prizepiece.round >= %s
+    """.format(jury=JURY)
 
     cursor = connection.cursor()
-    cursor.execute(SQL, [prize_id, round_id, prize_id, round_id, round_id])
+    cursor.execute(SQL, [prize_id, prize_id, round_id])
     l = cursor.fetchall()
     cursor.close()
     return l
 
 
-def get_ratings_for_piece_detail(prize_id, round_id, piece_id):
+def get_ratings_for_piece_detail(prize_id, piece_id):
     SQL = """
-        WITH roles AS (
-            SELECT
-                user_id,
-                (replace(role_str, '''', '"')::json->>'prize')::int as prize,
-                (replace(role_str, '''', '"')::json->>'round')::int as round
-
-            FROM
-                users_role
-
-            WHERE
-                role_str LIKE '{%%'
-        )
+        WITH {jury}
 
         SELECT
             auth_user.username,
             rating.note rating,
             note.note note
 
-        FROM roles
+        FROM jury
             INNER JOIN auth_user
-                ON (auth_user.id = roles.user_id)
+                ON (auth_user.id = jury.user_id)
             LEFT OUTER JOIN note_note note
-                ON (roles.user_id = note.user_id
-                    AND note.type LIKE 'Note'
+                ON (jury.user_id = note.user_id
+                    AND note.type = 'Note'
                     AND note.piece_id = %s)
             LEFT OUTER JOIN note_note rating
-                ON (roles.user_id = rating.user_id
-                    AND rating.type LIKE 'Rating'
+                ON (jury.user_id = rating.user_id
+                    AND rating.type = 'Rating'
                     AND rating.piece_id = %s)
-
-        WHERE prize = %s
-            AND round = %s
-    """
+    """.format(jury=JURY)
 
     cursor = connection.cursor()
-    cursor.execute(SQL, [piece_id, piece_id, prize_id, round_id])
+    cursor.execute(SQL, [prize_id, piece_id, piece_id])
     l = list(cursor.fetchall())
     cursor.close()
     return l
@@ -192,47 +165,41 @@ def get_pieces_with_my_ratings(prize_id, round_id, user_id):
     SQL = """
         WITH ratings AS (
             SELECT
-                piece_piece.id piece_id,
+                note_note.piece_id,
                 note_note.note::float rating
 
             FROM
                 note_note
-                INNER JOIN piece_piece
-                    ON (note_note.piece_id = piece_piece.id)
-                INNER JOIN prize_pieceatprize
-                    ON (piece_piece.id = prize_pieceatprize.piece_id)
+
             WHERE
                 note_note.user_id = %s
-                AND note_note.type LIKE 'Rating'
-                AND note_note.note NOT LIKE ''
+                AND note_note.type = 'Rating'
+                AND note_note.note <> ''
         )
 
         SELECT
             piece_piece.id,
             piece_piece.title,
             piece_piece.artist_name,
-            LPAD(users_role.id::text, 5, '0'),
-            piece_piece.edition_number,
+            LPAD(prize_prizepiece.id::text, 5, '0'),
             piece_piece.num_editions,
-            format('%%s, %%s/%%s',
-                   EXTRACT(YEAR FROM piece_piece.datetime_registered),
-                   piece_piece.edition_number, piece_piece.num_editions),
-            piece_piece."bitcoin_id",
+            format('%%s, %%s', EXTRACT(YEAR FROM piece_piece.date_created), piece_piece.num_editions),
+            piece_piece.bitcoin_address,
             blobs_thumbnail.thumbnail_file,
             ratings.rating
 
         FROM
-            piece_piece
-            INNER JOIN prize_pieceatprize
-                ON (prize_pieceatprize.piece_id = piece_piece.id AND
-                    prize_pieceatprize.prize_id = %s AND
-                    prize_pieceatprize.round >= %s)
-            INNER JOIN users_role
-                ON (users_role.user_id = piece_piece.owner_id)
+            prize_prizepiece
+            INNER JOIN piece_piece
+                ON (prize_prizepiece.piece_id = piece_piece.id)
             LEFT OUTER JOIN blobs_thumbnail
                 ON (blobs_thumbnail.id = piece_piece.thumbnail_id)
             LEFT OUTER JOIN ratings
                 ON (piece_piece.id = ratings.piece_id)
+
+        WHERE
+            prize_prizepiece.prize_id = %s
+            AND prize_prizepiece.round >= %s
     """
 
     cursor = connection.cursor()
@@ -240,4 +207,3 @@ def get_pieces_with_my_ratings(prize_id, round_id, user_id):
     l = cursor.fetchall()
     cursor.close()
     return l
-
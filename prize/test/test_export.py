@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import json
+import tarfile
+from io import BytesIO
+
+from boto.s3.key import Key
+
+import pytest
+
+
+def _submissions(s3_bucket):
+    from dynamicfixtures import _prize_piece_alice, _prize_piece_bob
+    prize_piece_alice = _prize_piece_alice()
+    prize_piece_bob = _prize_piece_bob()
+    k = Key(s3_bucket)
+    k.key = prize_piece_alice.piece.digital_work.digital_work_file
+    k.set_contents_from_string('alice work')
+    return prize_piece_alice, prize_piece_bob
+
+
+def _names(path):
+    with tarfile.open(path) as archive:
+        return archive.getnames()
+
+
+@pytest.mark.django_db
+def test_write(s3_bucket):
+    from ..export import PrizeExport, submission_dir
+    prize_piece_alice, prize_piece_bob = _submissions(s3_bucket)
+    alice_dir = submission_dir(prize_piece_alice.id, prize_piece_alice.piece.title)
+
+    out = BytesIO()
+    assert PrizeExport(prize_piece_alice.prize, bucket=s3_bucket, workers=2, chunk_size=1).write(out) == 2
+
+    out.seek(0)
+    with tarfile.open(fileobj=out) as archive:
+        assert archive.getnames() == [
+            '{}/digital_work.txt'.format(alice_dir),
+            '{}/info.json'.format(alice_dir),
+            '{}/info.json'.format(submission_dir(prize_piece_bob.id, prize_piece_bob.piece.title)),
+        ]
+        assert archive.extractfile('{}/digital_work.txt'.format(alice_dir)).read() == b'alice work'
+        info = json.load(archive.extractfile('{}/info.json'.format(alice_dir)))
+    assert info['submission_id'] == prize_piece_alice.id
+    assert info['title'] == prize_piece_alice.piece.title
+    assert info['missing_files'] == []
+
+
+@pytest.mark.django_db
+def test_write_file_resumes_after_the_last_complete_submission(s3_bucket, tmpdir):
+    from ..export import PrizeExport
+    prize_piece_alice, _ = _submissions(s3_bucket)
+    export = PrizeExport(prize_piece_alice.prize, bucket=s3_bucket, workers=2, chunk_size=1)
+    path = str(tmpdir.join('prize.tar'))
+    export.write_file(path)
+    names = _names(path)
+
+    # cut the archive in the middle of the last submission
+    with open(path, 'r+b') as f:
+        with tarfile.open(fileobj=f) as archive:
+            last = archive.getmembers()[-1]
+        f.truncate(last.offset_data + 10)
+
+    assert export.write_file(path) == 1
+    assert _names(path) == names
+    assert export.write_file(path) == 0
+    assert export.write_file(path, restart=True) == 2
+    assert _names(path) == names
+
+
+@pytest.mark.django_db
+def test_command_streams_the_archive_to_stdout_without_the_logs(s3_bucket, monkeypatch, tmpdir):
+    import logging
+    import sys
+    from django.core.management import call_command
+    prize_piece_alice, _ = _submissions(s3_bucket)
+    # a file descriptor as a pipe, and a handler printing the logs of the export to it
+    with open(str(tmpdir.join('stdout')), 'w+b') as stdout:
+        monkeypatch.setattr(sys, 'stdout', stdout)
+        handler = logging.StreamHandler(sys.stdout)
+        logger = logging.getLogger('prize')
+        monkeypatch.setattr(logger, 'level', logging.INFO)
+        logger.addHandler(handler)
+        try:
+            call_command('export_prize', prize_piece_alice.prize.whitelabel_settings.subdomain, '--output', '-')
+        finally:
+            logger.removeHandler(handler)
+        assert handler.stream is stdout
+
+        stdout.seek(0)
+        with tarfile.open(fileobj=stdout, mode='r|') as archive:
+            names = [member.name for member in archive]
+    assert len(names) == 3
+    assert all(name.split('/')[1] in ('digital_work.txt', 'info.json') for name in names)
@@ -1,10 +1,7 @@
-from datetime import datetime, timedelta
-
-import pytz
-
-from django.conf import settings
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from rest_framework import status
 from rest_framework.test import force_authenticate, APIRequestFactory
@@ -59,8 +56,45 @@ class PrizePieceEndpointTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['count'], 2)
 
-    # TODO HACK ALERT!!! This is a test for a hack!
-    def test_list_pieces_for_second_round_of_portfolioreview(self):
+    def test_list_pieces_resolves_the_prize_once_per_page(self):
+        from dynamicfixtures import (
+            _djroot_user,
+            _prize_juror,
+            _prize_piece_alice,
+            _prize_piece_bob,
+            _rating_piece_alice,
+            _rating_piece_bob,
+            _alice_bitcoin_wallet,
+            _bob_bitcoin_wallet,
+        )
+        from ..api import PrizePieceEndpoint
+        _djroot_user()
+        _alice_bitcoin_wallet()
+        _bob_bitcoin_wallet()
+        prize_juror = _prize_juror()
+        subdomain = prize_juror.prize.whitelabel_settings.subdomain
+        url = reverse('api:prize:prize-pieces-list',
+                      kwargs={'domain_pk': subdomain})
+        view = PrizePieceEndpoint.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+
+        def prize_queries():
+            request = factory.get(url)
+            force_authenticate(request, user=prize_juror.user)
+            with CaptureQueriesContext(connection) as context:
+                response = view(request, domain_pk=subdomain)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len([query for query in context.captured_queries
+                        if '"prize_' in query['sql'] or '"note_note"' in query['sql']])
+
+        _prize_piece_alice()
+        _rating_piece_alice()
+        num_queries = prize_queries()
+        _prize_piece_bob()
+        _rating_piece_bob()
+        self.assertEqual(prize_queries(), num_queries)
+
+    def test_list_pieces_for_second_round(self):
         from dynamicfixtures import (
             _djroot_user,
             _prize_juror,
@@ -80,16 +114,10 @@ class PrizePieceEndpointTests(TestCase):
         prize_piece_alice.round = 2
         prize_piece_alice.save()
         _prize_piece_bob(subdomain=subdomain)
-        round_two_starttime = datetime.strptime(
-            settings.PORTFOLIO_REVIEW_ROUND_TWO_STARTTIME,
-            settings.PORTFOLIO_REVIEW_ROUND_TIMEFORMAT,
-        ).replace(tzinfo=pytz.UTC)
         rating_piece_alice = _rating_piece_alice(subdomain=subdomain)
-        rating_piece_bob = _rating_piece_bob(subdomain=subdomain)
-        rating_piece_alice.datetime = round_two_starttime
+        _rating_piece_bob(subdomain=subdomain)
+        rating_piece_alice.round = 2
         rating_piece_alice.save()
-        rating_piece_bob.datetime = round_two_starttime - timedelta(seconds=1)
-        rating_piece_bob.save()
         prize_juror = _prize_juror(subdomain=subdomain)
         prize = prize_juror.prize
         prize.active_round = 2
@@ -1,8 +1,3 @@
-from datetime import datetime, timedelta
-
-import pytz
-
-from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.test import TestCase
 
@@ -57,8 +52,7 @@ class RatingEndpointTests(TestCase):
         self.assertIn(str(rating_piece_alice.rating), ratings)
         self.assertIn(str(rating_piece_bob.rating), ratings)
 
-    # TODO HACK ALERT!!! This is a test for a hack!
-    def test_list_ratings_for_second_round_of_portfolioreview(self):
+    def test_list_ratings_for_second_round(self):
         from dynamicfixtures import (
             _prize_juror,
             _prize_piece_alice,
@@ -67,19 +61,13 @@ class RatingEndpointTests(TestCase):
             _rating_piece_bob,
         )
         from ..api import RatingEndpoint
-        round_two_starttime = datetime.strptime(
-            settings.PORTFOLIO_REVIEW_ROUND_TWO_STARTTIME,
-            settings.PORTFOLIO_REVIEW_ROUND_TIMEFORMAT,
-        ).replace(tzinfo=pytz.UTC)
         subdomain = 'portfolioreview'
         _prize_piece_alice(subdomain=subdomain)
         _prize_piece_bob(subdomain=subdomain)
         rating_piece_alice = _rating_piece_alice(subdomain=subdomain)
-        rating_piece_bob = _rating_piece_bob(subdomain=subdomain)
-        rating_piece_alice.datetime = round_two_starttime
+        _rating_piece_bob(subdomain=subdomain)
+        rating_piece_alice.round = 2
         rating_piece_alice.save()
-        rating_piece_bob.datetime = round_two_starttime - timedelta(seconds=1)
-        rating_piece_bob.save()
         prize_juror = _prize_juror(subdomain=subdomain)
         url = reverse('api:prize:rating-list',
                       kwargs={'domain_pk': subdomain})
@@ -117,7 +105,6 @@ class RatingEndpointTests(TestCase):
         self.assertEqual(response.data['rating']['rating'],
                          str(rating_piece_alice.rating))
 
-    # TODO HACK ALERT!!! This is a test for a hack!
     def test_retrieve_rating_for_round_two(self):
         from dynamicfixtures import (
             _prize_juror,
@@ -126,18 +113,12 @@ class RatingEndpointTests(TestCase):
             _rating_two_piece_alice,
         )
         from ..api import RatingEndpoint
-        round_two_starttime = datetime.strptime(
-            settings.PORTFOLIO_REVIEW_ROUND_TWO_STARTTIME,
-            settings.PORTFOLIO_REVIEW_ROUND_TIMEFORMAT,
-        ).replace(tzinfo=pytz.UTC)
         subdomain = 'portfolioreview'
         prize_piece_alice = _prize_piece_alice()
         rating_one = _rating_one_piece_alice(subdomain=subdomain)
-        rating_one.datetime = round_two_starttime
+        rating_one.round = 2
         rating_one.save()
-        rating_two = _rating_two_piece_alice(subdomain=subdomain)
-        rating_two.datetime = round_two_starttime - timedelta(seconds=1)
-        rating_two.save()
+        _rating_two_piece_alice(subdomain=subdomain)
         prize_juror = _prize_juror(subdomain=subdomain)
         piece_pk = prize_piece_alice.piece.pk
         url = reverse('api:prize:rating-detail',
@@ -179,7 +160,6 @@ class RatingEndpointTests(TestCase):
         self.assertIn('average', response.data['data'])
         self.assertEqual(response.data['data']['average'], 4.0)
 
-    # TODO HACK ALERT!!! This is a test for a hack!
     def test_retrieve_average_rating_for_round_two(self):
         from dynamicfixtures import (
             _prize_juror,
@@ -189,22 +169,16 @@ class RatingEndpointTests(TestCase):
             _rating_three_piece_alice,
         )
         from ..api import RatingEndpoint
-        round_two_starttime = datetime.strptime(
-            settings.PORTFOLIO_REVIEW_ROUND_TWO_STARTTIME,
-            settings.PORTFOLIO_REVIEW_ROUND_TIMEFORMAT,
-        ).replace(tzinfo=pytz.UTC)
         subdomain = 'portfolioreview'
         prize_piece_alice = _prize_piece_alice(subdomain=subdomain)
         piece = prize_piece_alice.piece
         rating_one = _rating_one_piece_alice(subdomain=subdomain)
-        rating_one.datetime = round_two_starttime
+        rating_one.round = 2
         rating_one.save()
         rating_two = _rating_two_piece_alice(subdomain=subdomain)
-        rating_two.datetime = round_two_starttime
+        rating_two.round = 2
         rating_two.save()
-        rating_three = _rating_three_piece_alice(subdomain=subdomain)
-        rating_three.datetime = round_two_starttime - timedelta(seconds=1)
-        rating_three.save()
+        _rating_three_piece_alice(subdomain=subdomain)
         prize_juror = _prize_juror(subdomain=subdomain)
         url = reverse('api:prize:rating-average',
                       kwargs={'pk': piece.pk, 'domain_pk': subdomain})
@@ -244,6 +218,31 @@ class RatingEndpointTests(TestCase):
         self.assertTrue(Rating.objects.exists())
         self.assertEqual(Rating.objects.get().rating, float(data['note']))
 
+    def test_create_rating_updates_the_aggregates(self):
+        from dynamicfixtures import _prize_juror, _prize_juror_jane, _prize_piece_alice
+        from ..api import RatingEndpoint
+        from ..models import PrizePiece, RatingAggregate
+        prize_piece_alice = _prize_piece_alice()
+        subdomain = prize_piece_alice.prize.whitelabel_settings.subdomain
+        url = reverse('api:prize:rating-list', kwargs={'domain_pk': subdomain})
+        view = RatingEndpoint.as_view({'post': 'create'})
+        # a new rating, a second juror and a juror changing their rating
+        for juror, note in ((_prize_juror(), 8), (_prize_juror_jane(), 4), (_prize_juror(), 6)):
+            request = APIRequestFactory().post(url, data={'note': note, 'piece_id': prize_piece_alice.piece.pk})
+            force_authenticate(request, user=juror.user)
+            response = view(request, domain_pk=subdomain)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        aggregate = RatingAggregate.objects.get(prize_piece=prize_piece_alice, round=1)
+        self.assertEqual((aggregate.rating_sum, aggregate.num_ratings), (10.0, 2))
+        prize_piece_alice = PrizePiece.objects.get(pk=prize_piece_alice.pk)
+        self.assertEqual((prize_piece_alice.average_rating, prize_piece_alice.num_ratings), (5.0, 2))
+
+        # the rebuild recomputes the same aggregates from the ratings
+        RatingAggregate.objects.all().delete()
+        RatingAggregate.rebuild()
+        aggregate = RatingAggregate.objects.get(prize_piece=prize_piece_alice, round=1)
+        self.assertEqual((aggregate.rating_sum, aggregate.num_ratings), (10.0, 2))
+
     def test_select_piece(self):
         from dynamicfixtures import (_prize_juror, _prize_piece_alice,
                               _rating_one_piece_alice, _rating_two_piece_alice)
@@ -1,27 +1,122 @@
 import base64
+import hashlib
 import hmac
 import json
-import os.path
+import logging
+import mimetypes
+import os
+import sys
+import threading
 import time
 import urllib2
+import urlparse
+from collections import defaultdict, namedtuple
 from hashlib import sha1
 from StringIO import StringIO
 
 from django.conf import settings
 
-import boto
+from boto.s3.connection import OrdinaryCallingFormat, S3Connection
 from boto.s3.key import Key
 import pybitcointools
 
 import util.util as util
 
+logger = logging.getLogger(__name__)
+
+
+# number of requests and seconds spent in them per caller, see metrics()
+_metrics = defaultdict(lambda: [0, 0.0])
+_metrics_lock = threading.Lock()
+
+
+def _caller():
+    """
+    The first function up the stack outside of boto and of this module
+    """
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get('__name__', '')
+        if module != __name__ and module != 'boto' and not module.startswith('boto.'):
+            return '{}.{}'.format(module, frame.f_code.co_name)
+        frame = frame.f_back
+    return 'unknown'
+
+
+def metrics():
+    """
+    Returns {caller: (number of requests, seconds)} of the S3 requests made by the process
+    """
+    with _metrics_lock:
+        return {caller: tuple(measures) for caller, measures in _metrics.iteritems()}
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+class MeteredS3Connection(S3Connection):
+    """
+    S3Connection recording the number and duration of its requests per caller
+    """
+
+    def make_request(self, *args, **kwargs):
+        caller = _caller()
+        start = time.time()
+        try:
+            return super(MeteredS3Connection, self).make_request(*args, **kwargs)
+        finally:
+            seconds = time.time() - start
+            with _metrics_lock:
+                _metrics[caller][0] += 1
+                _metrics[caller][1] += seconds
+            logger.debug('S3 request of {} took {:.3f}s'.format(caller, seconds))
+
+
+# The connection of the process and its bucket. boto keeps a pool of http connections per
+# connection, shared by the threads. A forked process (celery prefork, gunicorn workers)
+# opens its own instead of writing to the sockets of its parent.
+_client = {'pid': None, 'connection': None, 'bucket': None}
+_client_lock = threading.Lock()
+
+
+def _connect():
+    if settings.AWS_S3_ENDPOINT:
+        # an S3 compatible service, e.g. moto_server or minio running locally
+        endpoint = urlparse.urlparse(settings.AWS_S3_ENDPOINT)
+        return MeteredS3Connection(settings.AWS_ACCESS_KEY_ID, settings.AWS_SECRET_ACCESS_KEY,
+                                   host=endpoint.hostname, port=endpoint.port,
+                                   is_secure=endpoint.scheme == 'https',
+                                   calling_format=OrdinaryCallingFormat())
+    return MeteredS3Connection(settings.AWS_ACCESS_KEY_ID, settings.AWS_SECRET_ACCESS_KEY)
+
 
 def get_client():
-    return boto.connect_s3(settings.AWS_ACCESS_KEY_ID, settings.AWS_SECRET_ACCESS_KEY)
+    pid = os.getpid()
+    if _client['pid'] != pid:
+        with _client_lock:
+            if _client['pid'] != pid:
+                _client.update(pid=pid, connection=_connect(), bucket=None)
+    return _client['connection']
 
 
 def get_bucket():
-    return get_client().get_bucket(settings.AWS_STORAGE_BUCKET_NAME)
+    """
+    The bucket is not validated with a request, a missing bucket fails the first request made on it
+    """
+    connection = get_client()
+    if _client['bucket'] is None:
+        _client['bucket'] = connection.get_bucket(settings.AWS_STORAGE_BUCKET_NAME, validate=False)
+    return _client['bucket']
+
+
+def reset():
+    """
+    Drops the connection of the process, e.g. when the settings or the S3 mock of the tests change
+    """
+    with _client_lock:
+        _client.update(pid=None, connection=None, bucket=None)
 
 
 def get_host(secure=False):
@@ -85,15 +180,98 @@ def rmkey(key='', bucket=None):
     bucket.delete_key(key)
 
 
-def upload(from_url, key, bucket=None):
+def _read_part(fileobj, size):
+    chunks = []
+    while size > 0:
+        chunk = fileobj.read(size)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        size -= len(chunk)
+    return ''.join(chunks)
+
+
+# What is known of an S3 object without listing its bucket: its size in bytes, its etag without
+# quotes and its content type
+S3Metadata = namedtuple('S3Metadata', ['size', 'etag', 'content_type'])
+
+
+def get_metadata(key, bucket=None):
+    """
+    Returns the S3Metadata of a key from a single HEAD request, None if the key does not exist.
+    """
+    if not bucket:
+        bucket = get_bucket()
+    k = bucket.get_key(key)
+    if k is None:
+        return None
+    return S3Metadata(k.size, k.etag.strip('"'), k.content_type)
+
+
+def stream_upload(fileobj, key, bucket=None, part_size=None, on_progress=None, content_type=None):
+    """
+    Uploads the file-like object to a public key part by part, holding at most two parts in memory
+    whatever the size of the file. A file larger than a part is sent as a multipart upload.
+
+    Returns the S3Metadata of the key computed on the way. Its etag is the md5 of the file, or for
+    a multipart upload the md5 of the md5s of the parts followed by the number of parts.
+    on_progress(uploaded) is called with the number of bytes uploaded after every part.
+    """
     if not bucket:
         bucket = get_bucket()
-    k = Key(bucket)
-    k.key = key
+    part_size = part_size or settings.AWS_UPLOAD_PART_SIZE
+    # guessed from the key as boto does for a single request, also for a multipart upload
+    content_type = content_type or mimetypes.guess_type(key)[0] or Key.DefaultContentType
+    headers = {'Content-Type': content_type}
+
+    part = _read_part(fileobj, part_size)
+    next_part = _read_part(fileobj, part_size) if len(part) == part_size else ''
+    if not next_part:
+        k = Key(bucket)
+        k.key = key
+        k.set_contents_from_string(part, headers=headers, policy='public-read')
+        if on_progress:
+            on_progress(len(part))
+        return S3Metadata(len(part), hashlib.md5(part).hexdigest(), content_type)
+
+    multipart_upload = bucket.initiate_multipart_upload(key, headers=headers, policy='public-read')
+    digests, uploaded = [], 0
+    try:
+        while part:
+            digests.append(hashlib.md5(part).digest())
+            multipart_upload.upload_part_from_file(StringIO(part), len(digests))
+            uploaded += len(part)
+            if on_progress:
+                on_progress(uploaded)
+            if next_part is not None:
+                part, next_part = next_part, None
+            else:
+                part = _read_part(fileobj, part_size)
+        multipart_upload.complete_upload()
+    except Exception:
+        multipart_upload.cancel_upload()
+        raise
+    return S3Metadata(uploaded,
+                      '{}-{}'.format(hashlib.md5(''.join(digests)).hexdigest(), len(digests)),
+                      content_type)
+
+
+def upload(from_url, key, bucket=None, on_progress=None):
+    """
+    Streams the file at from_url to the key with the content type sent by the server, see
+    stream_upload. Returns the S3Metadata of the key.
+    on_progress(uploaded, size) is called after every part, size is None when the server
+    does not send a Content-Length.
+    """
     file_object = urllib2.urlopen(from_url)
-    fp = StringIO(file_object.read())   # Wrap object
-    k.set_contents_from_file(fp)
-    k.make_public()
+    try:
+        size = file_object.info().getheader('Content-Length')
+        size = int(size) if size else None
+        return stream_upload(file_object, key, bucket,
+                             on_progress=(lambda uploaded: on_progress(uploaded, size)) if on_progress else None,
+                             content_type=file_object.info().getheader('Content-Type'))
+    finally:
+        file_object.close()
 
 
 def uniqueSavePathName(dirname, filename):
@@ -1,3 +1,5 @@
+from io import BytesIO
+
 from django.conf import settings
 from django.test import TestCase
 
@@ -17,3 +19,17 @@ class MockAwsTestCase(TestCase):
 
     def tearDown(self):
         self.mock.stop()
+
+
+class Response(BytesIO):
+    """
+    urllib2 response of a server sending a Content-Length
+    """
+
+    def info(self):
+        size = len(self.getvalue())
+
+        class Headers(object):
+            def getheader(self, name):
+                return str(size) if name == 'Content-Length' else None
+        return Headers()
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import hashlib
+from io import BytesIO
+
+import pytest
+
+from .mocks import Response
+
+
+PART_SIZE = 5 * 1024 * 1024
+
+
+def test_stream_upload_small_file(s3_bucket):
+    from ..aws import stream_upload
+    data = b'a' * 1000
+    metadata = stream_upload(BytesIO(data), 'small.txt', s3_bucket, part_size=PART_SIZE)
+    assert metadata.etag == hashlib.md5(data).hexdigest()
+    assert metadata.size == len(data)
+    assert metadata.content_type == 'text/plain'
+    key = s3_bucket.get_key('small.txt')
+    assert key.get_contents_as_string() == data
+    assert key.etag.strip('"') == metadata.etag
+
+
+def test_stream_upload_multipart(s3_bucket):
+    from ..aws import stream_upload
+    data = b'a' * PART_SIZE + b'b' * 10
+    progress = []
+    metadata = stream_upload(BytesIO(data), 'large', s3_bucket, part_size=PART_SIZE, on_progress=progress.append)
+    digests = hashlib.md5(b'a' * PART_SIZE).digest() + hashlib.md5(b'b' * 10).digest()
+    assert metadata.etag == '{}-2'.format(hashlib.md5(digests).hexdigest())
+    assert metadata.size == len(data)
+    assert progress == [PART_SIZE, len(data)]
+    assert s3_bucket.get_key('large').get_contents_as_string() == data
+
+
+@pytest.mark.django_db
+def test_ingest_digital_work(s3_bucket, monkeypatch):
+    from django.conf import settings
+    from dynamicfixtures import _alice
+    from blobs.models import DigitalWork
+    from blobs.tasks import ingest_digital_work
+    from util.models import JobMonitor
+    data = b'digital work'
+    monkeypatch.setattr('s3.aws.urllib2.urlopen', lambda url: Response(data))
+    digital_work = DigitalWork.objects.create(user=_alice(), digital_work_file='alice/work.txt')
+    job = JobMonitor.objects.create(description=settings.JOB_UPLOAD_AWS, object_id=digital_work.id,
+                                    percent_done=0, user=digital_work.user)
+
+    ingest_digital_work(job.id, 'http://example.com/work.txt')
+
+    assert s3_bucket.get_key('alice/work.txt').get_contents_as_string() == data
+    digital_work = DigitalWork.objects.get(id=digital_work.id)
+    assert digital_work.digital_work_hash == hashlib.md5(data).hexdigest()
+    assert digital_work.s3_size == len(data)
+    assert JobMonitor.objects.get(id=job.id).percent_done == 100
+    assert digital_work.is_ingested
+
+
+def test_get_bucket_reuses_the_connection(s3_bucket):
+    from .. import aws
+    aws.reset_metrics()
+    bucket = aws.get_bucket()
+    assert aws.get_bucket() is bucket
+    # the bucket is not validated
+    assert aws.metrics() == {}
+
+
+def test_get_client_reconnects_in_a_forked_process(s3_bucket, monkeypatch):
+    from .. import aws
+    client = aws.get_client()
+    assert aws.get_client() is client
+    monkeypatch.setattr('os.getpid', lambda: -1)
+    assert aws.get_client() is not client
+
+
+def test_metrics_per_caller(s3_bucket):
+    from .. import aws
+    aws.reset_metrics()
+    aws.stream_upload(BytesIO(b'data'), 'metered', part_size=PART_SIZE)
+    aws.etag_hash('metered')
+    calls, seconds = aws.metrics()['s3.test.test_aws.test_metrics_per_caller']
+    assert calls == 2
+    assert seconds > 0
+
+
+def test_get_metadata(s3_bucket):
+    from .. import aws
+    aws.stream_upload(BytesIO(b'data'), 'work.txt', s3_bucket, part_size=PART_SIZE)
+    assert aws.get_metadata('work.txt') == (4, hashlib.md5(b'data').hexdigest(), 'text/plain')
+    assert aws.get_metadata('missing') is None
+
+
+@pytest.mark.django_db
+def test_file_size_is_looked_up_once(s3_bucket):
+    from dynamicfixtures import _alice
+    from blobs.models import DigitalWork
+    from .. import aws
+    aws.stream_upload(BytesIO(b'data'), 'alice/work.txt', s3_bucket, part_size=PART_SIZE)
+    digital_work = DigitalWork.objects.create(user=_alice(), digital_work_file='alice/work.txt')
+    aws.reset_metrics()
+    assert digital_work.size == 4
+    assert DigitalWork.objects.get(id=digital_work.id).size == 4
+    assert DigitalWork.objects.get(id=digital_work.id).hash == hashlib.md5(b'data').hexdigest()
+    # a single HEAD request, no listing of the bucket
+    assert aws.metrics().keys() == ['blobs.models.set_s3_metadata']
+    assert aws.metrics()['blobs.models.set_s3_metadata'][0] == 1
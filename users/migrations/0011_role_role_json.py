@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import ast
+
+from django.db import models, migrations
+import util.fields
+
+# the roles holding a token in role_str instead of the str() of a python value
+TOKEN_ROLES = ('UserValidateEmailRole', 'UserRequestResetPasswordRole')
+
+
+def forwards_func(apps, schema_editor):
+    Role = apps.get_model('users', 'Role')
+    for role in Role.objects.exclude(role_str=None).exclude(role_str='').only('id', 'type', 'role_str').iterator():
+        if role.type in TOKEN_ROLES:
+            role_json = role.role_str
+        else:
+            role_json = ast.literal_eval(role.role_str)
+        Role.objects.filter(id=role.id).update(role_json=role_json)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_auto_20151119_1330'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='role',
+            name='role_json',
+            field=util.fields.JSONBField(null=True, blank=True),
+        ),
+        migrations.RunPython(
+            forwards_func,
+        ),
+        migrations.RemoveField(
+            model_name='role',
+            name='role_str',
+        ),
+    ]
@@ -4,10 +4,10 @@ from django.db import models
 from django.utils import timezone
 from django.utils.datetime_safe import datetime
 
-import ast
 from datetime import timedelta
 
 import pytz
+from util.fields import JSONBField
 from util.util import randomStr
 
 
@@ -25,23 +25,23 @@ class Role(models.Model):
     # django auto-creates a reverse relation from User to RoleAtUserModel
     user = models.ForeignKey(User, related_name='role_at_user', null=True)
 
-    role_str = models.TextField(blank=True, null=True)
+    role_json = JSONBField(blank=True, null=True)
 
     type = models.CharField(max_length=120, blank=True, null=True)
 
     @classmethod
     def create(cls, user, role):
-        r = cls(user=user, role_str=str(role))
+        r = cls(user=user, role_json=role)
         r.type = cls.__name__
         return r
 
     @property
     def role(self):
-        return ast.literal_eval(self.role_str) if self.role_str else None
+        return self.role_json
 
     @role.setter
     def role(self, value):
-        self.role_str = str(value)
+        self.role_json = value
 
 
 class UserNeedsToRegisterRole(Role):
@@ -60,13 +60,13 @@ class UserTokenRole(Role):
 
     @staticmethod
     def create(cls, user):
-        r = cls(user=user, role_str=str(cls.generateToken()))
+        r = cls(user=user, role_json=cls.generateToken())
         r.type = cls.__name__
         return r
 
     @property
     def token(self):
-        return self.role_str
+        return self.role_json
 
     @property
     def isConfirmed(self):
@@ -153,6 +153,6 @@ class UserResetPasswordRole(Role):
 
     @classmethod
     def create(cls, user):
-        r = cls(user=user, role_str="")
+        r = cls(user=user, role_json=None)
         r.type = cls.__name__
         return r
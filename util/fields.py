@@ -0,0 +1,48 @@
+"""Utility model fields."""
+import json
+
+import psycopg2.extensions
+from django.db.backends.signals import connection_created
+from django.db import models
+from django.dispatch import receiver
+
+
+# the values are parsed by JSONBField.from_db_value: make psycopg2 return jsonb
+# columns as text whatever its version (>= 2.5.4 would parse them itself)
+JSONB_OID = 3802
+JSONB_TEXT = psycopg2.extensions.new_type((JSONB_OID,), 'JSONB_TEXT', lambda value, cursor: value)
+
+
+@receiver(connection_created)
+def register_jsonb_text(sender, connection, **kwargs):
+    # only on the connections of django, other psycopg2 users still get parsed jsonb
+    if connection.vendor == 'postgresql':
+        psycopg2.extensions.register_type(JSONB_TEXT, connection.connection)
+
+
+class JSONBField(models.Field):
+    """JSON serializable value stored in a postgres ``jsonb`` column.
+
+    The value is parsed once when the instance is loaded from the
+    database and can be queried in SQL (e.g. ``role_json->>'prize'``).
+    Strings are values like any other, only the database returns JSON text.
+
+    """
+    description = 'JSON value stored as jsonb'
+
+    def db_type(self, connection):
+        return 'jsonb'
+
+    def from_db_value(self, value, expression, connection, context):
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        return json.dumps(value)
+
+    def value_to_string(self, obj):
+        # serialized as the value itself, so that deserializing does not need to parse it
+        return self._get_val_from_obj(obj)
@@ -56,6 +56,17 @@ def resize_single_image_with_ratio(image, desired_size):
     return image.resize(new_size, antialias)
 
 
+def resize_cascade(image, sizes):
+    """
+    Yields the (label, resized image) of the sizes {label: (width, height)}, the largest first.
+    Every size is resized from the previous one rather than from the original, which costs
+    a fraction of the full resolution resize for the smaller sizes.
+    """
+    for label, size in sorted(sizes.iteritems(), key=lambda (label, size): size[0] * size[1], reverse=True):
+        image = resize_single_image_with_ratio(image, size)
+        yield label, image
+
+
 def resize_gif_with_ratio(image, desired_size, destination):
     new_size = get_new_size_with_aspect_ratio(image.size, desired_size)
     with Image(filename=image.filename) as im:
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+
+import pytest
+
+
+@pytest.mark.parametrize('value', ('token', '{"prize": "sluice"}', {'prize': 'sluice'}, None))
+def test_jsonb_field_to_python_keeps_the_value(value):
+    from ..fields import JSONBField
+    assert JSONBField().to_python(value) == value
+
+
+@pytest.mark.django_db
+def test_jsonb_field_keeps_a_string(alice):
+    from users.models import UserValidateEmailRole
+    role = UserValidateEmailRole.create(user=alice)
+    role.full_clean()
+    role.save()
+    assert UserValidateEmailRole.objects.get(id=role.id).role == role.role
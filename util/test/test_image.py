@@ -13,3 +13,15 @@ def test_rotate_jpg_from_exif(monkeypatch):
 
     image_mock = ImageMock()
     assert rotate_jpg_from_exif(image_mock) == image_mock
+
+
+def test_resize_cascade():
+    from PIL import Image
+    from ..image import resize_cascade
+    image = Image.new('RGB', (1200, 800))
+    sizes = {'100x100': (100, 100), '600x600': (600, 600), '300x300': (300, 300)}
+    assert [(label, resized.size) for label, resized in resize_cascade(image, sizes)] == [
+        ('600x600', (600, 400)),
+        ('300x300', (300, 200)),
+        ('100x100', (100, 67)),
+    ]
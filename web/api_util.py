@@ -11,7 +11,7 @@ from oauth2_provider.ext.rest_framework.authentication import OAuth2Authenticati
 
 import json
 import logging
-from core.pagination import NamedPageNumberPagination
+from core.pagination import NamedCursorPagination, NamedPageNumberPagination
 
 
 def json_api(function):
@@ -48,6 +48,15 @@ def SuccessJsonResponse(serialized_dict=None):
 class PaginatedGenericViewset(viewsets.GenericViewSet):
     json_name = 'results'
     pagination_class = NamedPageNumberPagination
+    # set on the views that let the clients opt in to cursor pagination with ?cursor=
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and self.cursor_pagination_class is not None \
+                and NamedCursorPagination.cursor_query_param in self.request.query_params:
+            self._paginator = self.cursor_pagination_class()
+        return super(PaginatedGenericViewset, self).paginator
 
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
@@ -55,14 +64,19 @@ class PaginatedGenericViewset(viewsets.GenericViewSet):
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True, context={'request': request})
+            unfiltered_count = kwargs.get('unfiltered_count', None)
+            if unfiltered_count is None and self.paginator.display_counts:
+                unfiltered_count = self.get_unfiltered_queryset().count()
             return self.paginator.get_paginated_response(serializer.data,
                                                          name=self.json_name,
-                                                         unfiltered_count=kwargs.get('unfiltered_count',
-                                                                                     len(self.get_queryset())))
+                                                         unfiltered_count=unfiltered_count)
 
         serializer = self.get_serializer(queryset, many=True, context={'request': request})
         return Response({'success': True, self.json_name: serializer.data}, status=status.HTTP_200_OK)
 
+    def get_unfiltered_queryset(self):
+        return self.get_queryset()
+
 
 LOGGER = logging.getLogger('KPI')
 
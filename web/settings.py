@@ -239,6 +239,23 @@ BTC_FEE = 10000
 BTC_TOKEN = 3000
 BTC_CHUNK = 2160000
 
+# Seconds a worker may hold unspents claimed from the federation wallet before
+# they are returned to the pool
+BTC_RESERVATION_LEASE = 600
+
+# Maximum number of edition refills sent as a single bitcoin transaction in bulk actions
+BTC_REFILL_BATCH_SIZE = 20
+
+# Reconciliation of the transaction statuses with the blockchain (see bitcoin.reconciliation):
+# concurrent requests, requests per second and transactions written per chunk
+BTC_RECONCILE_WORKERS = 8
+BTC_RECONCILE_RATE = 5
+BTC_RECONCILE_CHUNK_SIZE = 100
+
+# Seconds a push task holds the transactions it claimed (see bitcoin.models.PushClaim) before they can
+# be pushed by another task, longer than the retries of a failed push
+BTC_PUSH_CLAIM_LEASE = 3600
+
 
 #####################################################################
 #  Payment Processing
@@ -301,6 +318,11 @@ AWS_SECRET_ACCESS_KEY = os.environ['AWS_SECRET_ACCESS_KEY']
 AWS_STORAGE_BUCKET_NAME = 'ascribe0'
 AWS_PRESIGNED_URL_EXPIRY_TIME = 3600
 AWS_S3_HOST = 's3-us-west-2.amazonaws.com'   # TODO put into env var
+# url of an S3 compatible service to use instead of S3, e.g. a local stand-in (http://localhost:5000)
+AWS_S3_ENDPOINT = os.environ.get('AWS_S3_ENDPOINT')
+# size of the parts of the multipart uploads made by the server (see s3.aws.stream_upload),
+# S3 requires at least 5MB
+AWS_UPLOAD_PART_SIZE = 8 * 1024 * 1024
 
 AWS_S3_SECURE_URLS = False  # use http instead of https
 AWS_QUERYSTRING_AUTH = False  # don't add complex authentication-related query parameters for requests
@@ -314,6 +336,11 @@ THUMBNAIL_DEFAULT = 'media/thumbnails/ascribe_spiral.png'
 THUMBNAIL_SIZES = {'100x100': (100, 100), '300x300': (300, 300), '600x600': (600, 600)}
 THUMBNAIL_SIZE_DEFAULT = '300x300'
 
+# Export of the submissions of a prize (see prize.export): concurrent downloads and
+# submissions read and archived per chunk
+PRIZE_EXPORT_WORKERS = 8
+PRIZE_EXPORT_CHUNK_SIZE = 20
+
 #####################################################################
 #  Celery
 #####################################################################
@@ -340,13 +367,48 @@ CELERY_ROUTES = ('util.routers.CeleryTaskRouter', )
 
 TEST_RUNNER = 'djcelery.contrib.test_runner.CeleryTestSuiteRunner'
 
+#####################################################################
+#  Caches
+#####################################################################
+
+# The rendered histories of the editions (see Edition.history) are shared by the web and celery
+# processes, which both write ownerships: they live in redis, next to the celery results.
+# A redis failure turns the cache into misses instead of errors.
+HISTORY_CACHE = 'histories'
+HISTORY_CACHE_TIMEOUT = 24 * 3600
+# the names of the whitelabels in the emails, cached by each process in the default cache
+WHITELABEL_NAME_CACHE_TIMEOUT = 5 * 60
+# the stylesheets linked by the html emails, fetched again by each process once they expire
+EMAIL_STYLESHEET_CACHE_TIMEOUT = 5 * 60
+EMAIL_STYLESHEET_TIMEOUT = 10
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    HISTORY_CACHE: {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': '{}/1'.format(CELERY_RESULT_BACKEND),
+        'TIMEOUT': HISTORY_CACHE_TIMEOUT,
+        'KEY_PREFIX': DEPLOYMENT,
+        'OPTIONS': {
+            'IGNORE_EXCEPTIONS': True,
+        },
+    },
+}
+if TESTING:
+    CACHES[HISTORY_CACHE] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': HISTORY_CACHE,
+    }
+
 
 #####################################################################
 #  Domain Constants
 #####################################################################
 
 # Jobs
-JOB_BTC_TX, JOB_CONVERTVIDEO = "bitcoin tx", "convert video"
+JOB_BTC_TX, JOB_CONVERTVIDEO, JOB_CREATE_EDITIONS = "bitcoin tx", "convert video", "create editions"
+JOB_UPLOAD_AWS = "upload aws"
 
 # Used for consign_status. http://www.b-list.org/weblog/2007/nov/02/handle-choices-right-way
 NOT_CONSIGNED, PENDING_CONSIGN, CONSIGNED, PENDING_UNCONSIGN = 0, 1, 2, 3
@@ -37,7 +37,3 @@ EMAIL_WHITELIST = [
 
 DEFAULT_FROM_EMAIL = ASCRIBE_EMAIL
 EMAIL_DEV_ALERT = 'devel@ascribe.io'
-
-# TODO HACK ALERT! This is for a hack. Will be changed/moved asap.
-PORTFOLIO_REVIEW_ROUND_TWO_STARTTIME = '2016-01-05T23:00:00'
-PORTFOLIO_REVIEW_ROUND_TIMEFORMAT = '%Y-%m-%dT%H:%M:%S'